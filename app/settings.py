@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 import environ
 
 
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,7 +48,8 @@ ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que mede o tempo de render para a instrumentação
+        'BACKEND': 'core.middleware.DjangoTemplatesInstrumentado',
         'DIRS': [BASE_DIR / 'app' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -54,6 +57,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.pendencias',
             ],
         },
     },
@@ -67,6 +71,30 @@ DATABASES = {
     "default": env.db()
 }
 
+# Cache (ex.: CACHE_URL=redis://localhost:6379/1); por padrão, memória local do processo
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://")
+}
+
+# Validade dos fragmentos em cache da página de detalhe do contrato (segundos)
+CACHE_DETALHE_SEGUNDOS = env.int("CACHE_DETALHE_SEGUNDOS", default=300)
+
+# Validade da carga das telas em cache, usada na checagem de capacidade (segundos)
+CACHE_CARGA_TELAS_SEGUNDOS = env.int("CACHE_CARGA_TELAS_SEGUNDOS", default=300)
+
+# Jobs de exportação (processar_exportacoes): um job "processando" sem progresso
+# há mais de EXPORTACAO_TRAVADA_MINUTOS (worker morto) volta para a fila; os
+# arquivos gerados são apagados EXPORTACAO_RETENCAO_DIAS depois de concluídos.
+EXPORTACAO_TRAVADA_MINUTOS = env.int("EXPORTACAO_TRAVADA_MINUTOS", default=30)
+EXPORTACAO_RETENCAO_DIAS = env.int("EXPORTACAO_RETENCAO_DIAS", default=7)
+
+# Download dos documentos dos contratos (core/downloads.py): vazio = o Django
+# envia o arquivo; "x-accel-redirect" (nginx) ou "x-sendfile" (Apache) = o
+# proxy envia, depois da checagem de login. No nginx, DOCUMENTOS_ACCEL_PREFIXO
+# é uma location `internal` com `alias` para o MEDIA_ROOT.
+DOCUMENTOS_SENDFILE = env("DOCUMENTOS_SENDFILE", default="")
+DOCUMENTOS_ACCEL_PREFIXO = env("DOCUMENTOS_ACCEL_PREFIXO", default="/media-protegida/")
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,4 +168,34 @@ CSRF_TRUSTED_ORIGINS = [
     "https://innovaled.com.br",
 ]
 
-SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
\ No newline at end of file
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+
+
+# Instrumentação por request (core.middleware.InstrumentacaoMiddleware): só
+# requests lentos ou com queries demais vão para o log (WARNING); os demais
+# saem em DEBUG, com LOG_LEVEL_INSTRUMENTACAO=DEBUG. Em `manage.py test` os
+# dois loggers ficam quietos.
+SLOW_QUERY_MS = env.float("SLOW_QUERY_MS", default=200)
+SLOW_REQUEST_MS = env.float("SLOW_REQUEST_MS", default=1000)
+MAX_QUERIES_REQUEST = env.int("MAX_QUERIES_REQUEST", default=50)
+TESTANDO = len(sys.argv) > 1 and sys.argv[1] == "test"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.instrumentacao": {
+            "handlers": ["console"],
+            "level": "CRITICAL" if TESTANDO else env("LOG_LEVEL_INSTRUMENTACAO", default="WARNING"),
+            "propagate": False,
+        },
+        "core.consultas_lentas": {
+            "handlers": ["console"],
+            "level": "CRITICAL" if TESTANDO else "WARNING",
+            "propagate": False,
+        },
+    },
+}
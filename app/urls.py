@@ -14,5 +14,4 @@ urlpatterns = [
     path('login/', CustomLoginView.as_view(), name='login'),  # Usa a CustomLoginView aqui
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 ]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
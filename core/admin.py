@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Contrato, Cliente, Banco, Vendedor, Video, Local, FormaPagamento, StatusContrato, Registro, DocumentoContrato
+from django.urls import reverse
+from .models import Contrato, Cliente, Banco, Vendedor, Video, Local, FormaPagamento, StatusContrato, Registro, DocumentoContrato, ExportacaoContratos, ImportacaoContratos
 
 
 class BaseAuditAdmin(admin.ModelAdmin):
@@ -28,7 +29,8 @@ class ContratoAdmin(BaseAuditAdmin):
 
 @admin.register(Cliente)
 class ClienteAdmin(BaseAuditAdmin):
-    list_display = ("razao_social", "cpf_cnpj", "email", "telefone")
+    list_display = ("razao_social", "cpf_cnpj", "email", "telefone", "renovacao_automatica")
+    list_filter = ("renovacao_automatica",)
     search_fields = ("razao_social", "cpf_cnpj")
     readonly_fields = ("created_at", "updated_at", "created_by", "updated_by")
 
@@ -54,7 +56,7 @@ class VideoAdmin(BaseAuditAdmin):
 
 @admin.register(Local)
 class LocalAdmin(BaseAuditAdmin):
-    list_display = ("nome",)
+    list_display = ("nome", "capacidade_segundos")
     readonly_fields = ("created_at", "updated_at", "created_by", "updated_by")
 
 
@@ -85,5 +87,19 @@ class DocumentoContratoAdmin(BaseAuditAdmin):
     readonly_fields = ("created_at", "updated_at", "created_by", "updated_by")
     def arquivo_link(self, obj):
         if obj.arquivo:
-            return f'<a href="{obj.arquivo.url}" target="_blank">Download</a>'
-        return "-"
\ No newline at end of file
+            return f'<a href="{reverse("documento_download", args=[obj.pk])}" target="_blank">Download</a>'
+        return "-"
+
+
+@admin.register(ExportacaoContratos)
+class ExportacaoContratosAdmin(BaseAuditAdmin):
+    list_display = ("id", "status", "formato", "processados", "total", "created_by", "created_at")
+    list_filter = ("status", "formato")
+    readonly_fields = ("created_at", "updated_at", "created_by", "updated_by", "iniciado_em", "concluido_em")
+
+
+@admin.register(ImportacaoContratos)
+class ImportacaoContratosAdmin(BaseAuditAdmin):
+    list_display = ("id", "status", "processados", "total", "contratos_criados", "linhas_com_erro", "created_by", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "updated_at", "created_by", "updated_by", "iniciado_em", "concluido_em")
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+from core.services.contadores import ler_contadores
+
+
+def pendencias(request):
+    """Contadores das filas de pendência para os badges da navegação (base.html)."""
+    if not getattr(request, "user", None) or not request.user.is_authenticated:
+        return {}
+    # só consulta (uma query na tabela de contadores) se o template usar
+    return {"contadores_pendencia": SimpleLazyObject(ler_contadores)}
@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+# Download de arquivos do storage local por uma view autenticada.
+#
+# - ETag/Last-Modified: no storage por conteúdo o nome já é o SHA-256, que vira
+#   o ETag sem ler o arquivo; nos demais, tamanho + mtime. If-None-Match e
+#   If-Modified-Since respondem 304.
+# - Range (um intervalo só, com If-Range): 206 com o trecho pedido, lido em
+#   blocos pelo FileResponse; intervalo fora do arquivo dá 416.
+# - DOCUMENTOS_SENDFILE: a view só confere o login e devolve X-Accel-Redirect
+#   (nginx) ou X-Sendfile (Apache); o proxy copia os bytes e trata o Range,
+#   sem prender o worker do Python durante a transferência.
+
+X_ACCEL_REDIRECT = "x-accel-redirect"
+X_SENDFILE = "x-sendfile"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class _Trecho:
+    """Arquivo limitado a `tamanho` bytes a partir de `inicio` (sem fileno: o file_wrapper lê por aqui)."""
+
+    def __init__(self, arquivo, inicio, tamanho):
+        arquivo.seek(inicio)
+        self.arquivo = arquivo
+        self.restante = tamanho
+
+    def read(self, tamanho=-1):
+        if self.restante <= 0:
+            return b""
+        if tamanho < 0 or tamanho > self.restante:
+            tamanho = self.restante
+        dados = self.arquivo.read(tamanho)
+        self.restante -= len(dados)
+        return dados
+
+    def close(self):
+        self.arquivo.close()
+
+
+def etag_do_arquivo(nome, info):
+    digest = os.path.splitext(os.path.basename(nome))[0]
+    if _SHA256.match(digest):
+        return f'"{digest}"'
+    return f'"{info.st_size:x}-{int(info.st_mtime):x}"'
+
+
+def intervalo(cabecalho, tamanho):
+    """
+    (inicio, fim) inclusivos de um Range de um intervalo só; None para servir o
+    arquivo inteiro (sem Range, sintaxe não suportada); ValueError se não
+    couber no arquivo.
+    """
+    encontrado = _RANGE.match(cabecalho or "")
+    if not encontrado or encontrado.groups() == ("", ""):
+        return None
+    inicio, fim = encontrado.groups()
+    if inicio == "":  # sufixo: os últimos N bytes
+        sufixo = int(fim)
+        if sufixo == 0:
+            raise ValueError
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        raise ValueError
+    return inicio, fim
+
+
+def _vale_o_range(request, etag, ultima_modificacao):
+    if_range = request.headers.get("If-Range")
+    return not if_range or if_range in (etag, http_date(ultima_modificacao))
+
+
+def _resposta_do_proxy(modo, arquivo, nome_download, content_type, as_attachment):
+    resposta = HttpResponse(content_type=content_type)
+    if modo == X_ACCEL_REDIRECT:
+        resposta["X-Accel-Redirect"] = settings.DOCUMENTOS_ACCEL_PREFIXO.rstrip("/") + "/" + quote(arquivo.name)
+    else:
+        resposta["X-Sendfile"] = arquivo.path
+    resposta["Content-Disposition"] = content_disposition_header(as_attachment, nome_download)
+    return resposta
+
+
+def _resposta_do_django(request, arquivo, tamanho, nome_download, content_type, as_attachment, etag, ultima_modificacao):
+    trecho = None
+    if request.method in ("GET", "HEAD") and _vale_o_range(request, etag, ultima_modificacao):
+        try:
+            trecho = intervalo(request.headers.get("Range"), tamanho)
+        except ValueError:
+            resposta = HttpResponse(status=416)
+            resposta["Content-Range"] = f"bytes */{tamanho}"
+            return resposta
+
+    aberto = open(arquivo.path, "rb")
+    if trecho is None:
+        resposta = FileResponse(aberto, as_attachment=as_attachment, filename=nome_download, content_type=content_type)
+    else:
+        inicio, fim = trecho
+        resposta = FileResponse(
+            _Trecho(aberto, inicio, fim - inicio + 1),
+            as_attachment=as_attachment, filename=nome_download, content_type=content_type, status=206,
+        )
+        resposta["Content-Length"] = str(fim - inicio + 1)
+        resposta["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    resposta["Accept-Ranges"] = "bytes"
+    return resposta
+
+
+def resposta_arquivo(request, arquivo, nome_download, as_attachment=False):
+    """Resposta de download para um FieldFile do storage local (FileSystemStorage)."""
+    if not arquivo:
+        raise Http404
+    try:
+        info = os.stat(arquivo.path)
+    except FileNotFoundError:
+        raise Http404
+    etag = etag_do_arquivo(arquivo.name, info)
+    ultima_modificacao = int(info.st_mtime)
+
+    resposta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if resposta is None:
+        content_type = mimetypes.guess_type(nome_download)[0] or "application/octet-stream"
+        modo = getattr(settings, "DOCUMENTOS_SENDFILE", "").lower()
+        if modo in (X_ACCEL_REDIRECT, X_SENDFILE):
+            resposta = _resposta_do_proxy(modo, arquivo, nome_download, content_type, as_attachment)
+        else:
+            resposta = _resposta_do_django(
+                request, arquivo, info.st_size, nome_download, content_type, as_attachment,
+                etag, ultima_modificacao,
+            )
+    resposta["ETag"] = etag
+    resposta["Last-Modified"] = http_date(ultima_modificacao)
+    resposta["Cache-Control"] = "private, no-cache"  # sempre revalida: o acesso depende do login
+    return resposta
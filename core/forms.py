@@ -1,6 +1,9 @@
+from collections import defaultdict
 from django import forms
-from django.forms import inlineformset_factory
-from .models import Cliente, Contrato, Video, Banco, Vendedor, Local, FormaPagamento, DocumentoContrato, Registro
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from core.services import capacidade
+from core.services.ocupacao import segundos_do_video
+from .models import Cliente, Contrato, Video, Banco, Vendedor, Local, FormaPagamento, DocumentoContrato, Registro, ImportacaoContratos
 import re
 import unicodedata
 
@@ -8,7 +11,10 @@ import unicodedata
 class ClienteForm(forms.ModelForm):
     class Meta:
         model = Cliente
-        fields = ["razao_social", "cpf_cnpj", "email", "telefone", "telefone_financeiro", "email_financeiro"]
+        fields = [
+            "razao_social", "cpf_cnpj", "email", "telefone", "telefone_financeiro", "email_financeiro",
+            "renovacao_automatica",
+        ]
         widgets = {
             'razao_social': forms.TextInput(attrs={'class': 'form-control'}),
             'cpf_cnpj': forms.TextInput(attrs={'class': 'form-control'}),
@@ -16,6 +22,10 @@ class ClienteForm(forms.ModelForm):
             'telefone': forms.TextInput(attrs={'class': 'form-control'}),
             'telefone_financeiro': forms.TextInput(attrs={'class': 'form-control'}),
             'email_financeiro': forms.EmailInput(attrs={'class': 'form-control'}),
+            'renovacao_automatica': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
+        labels = {
+            'renovacao_automatica': 'Renovação automática',
         }
 
 class VideoForm(forms.ModelForm):
@@ -32,11 +42,42 @@ class VideoForm(forms.ModelForm):
             },
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # opções a partir da carga das telas em cache, com o que resta em cada loop
+        # (sem uma query de locais por formulário do formset)
+        self.fields["local"].choices = [("", "---------")] + [
+            (tela["id"], capacidade.rotulo(tela)) for tela in capacidade.telas()
+        ]
+
+
+class BaseVideoFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+
+        # segundos a mais em cada tela (vídeos alterados saem da tela antiga)
+        acrescimos = defaultdict(int)
+        for form in self.forms:
+            dados = getattr(form, "cleaned_data", None)
+            if not dados or not form.has_changed():
+                continue
+            if form.instance.pk:
+                acrescimos[form.initial["local"]] -= segundos_do_video(form.initial["tempo_video"])
+            if not dados.get("DELETE") and dados.get("local"):
+                acrescimos[dados["local"].pk] += segundos_do_video(dados["tempo_video"])
+
+        erros = capacidade.excedentes(acrescimos)
+        if erros:
+            raise forms.ValidationError(erros)
+
         
 VideoFormSet = inlineformset_factory(
     Contrato,
     Video,
     form=VideoForm,
+    formset=BaseVideoFormSet,
     extra=1,           # começa com 1 formulário vazio
     can_delete=True    # permite remover vídeos
 )
@@ -133,4 +174,35 @@ class ContratoRegistroForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         for field_name, field in self.fields.items():
-            field.widget.attrs['class'] = 'form-control'
\ No newline at end of file
+            field.widget.attrs['class'] = 'form-control'
+
+class ContratoImportacaoForm(ContratoForm):
+    """
+    Regras do ContratoForm para a importação de planilha. Vendedor, banco e
+    forma de pagamento vêm por nome e são resolvidos pelo importador (com os
+    cadastros já carregados), sem uma query por linha.
+    """
+    vendedor = None
+    banco = None
+    forma_pagamento = None
+
+    class Meta(ContratoForm.Meta):
+        exclude = ContratoForm.Meta.exclude + ["vendedor", "banco", "forma_pagamento"]
+
+
+class ImportacaoContratosForm(forms.ModelForm):
+    class Meta:
+        model = ImportacaoContratos
+        fields = ["arquivo"]
+        widgets = {
+            'arquivo': forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.xlsx,.csv'}),
+        }
+        labels = {
+            'arquivo': 'Planilha (.xlsx ou .csv)',
+        }
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data["arquivo"]
+        if not arquivo.name.lower().endswith((".xlsx", ".csv")):
+            raise forms.ValidationError("Envie uma planilha .xlsx ou .csv.")
+        return arquivo
@@ -0,0 +1,118 @@
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from core.models import Contrato, Vendedor, Video
+from core.services import pendencias
+from core.services.dados_teste import popular_base
+
+# nomes de banco em que o comando roda sem --banco-descartavel
+MARCAS_BANCO_DESCARTAVEL = ("test", "bench")
+
+
+def fila(nome):
+    return pendencias.FILAS[nome]().order_by(*pendencias.ORDENACAO)[: pendencias.POR_PAGINA + 1]
+
+
+def banco_descartavel(nome):
+    return any(marca in str(nome).lower() for marca in MARCAS_BANCO_DESCARTAVEL)
+
+
+def consultas():
+    """Consultas das telas, montadas do mesmo jeito que nas views."""
+    hoje = date.today()
+    vendedor_id = Vendedor.objects.values_list("id", flat=True).first()
+    lista = Contrato.objects.select_related("cliente", "vendedor", "status")
+
+    return {
+        "contrato_list (1ª página)": lambda: lista.order_by("-data_assinatura", "-id_contrato")[:10],
+        "contrato_list (página profunda)": lambda: lista.filter(
+            Q(data_assinatura__lt=hoje - timedelta(days=4 * 365))
+        ).order_by("-data_assinatura", "-id_contrato")[:10],
+        "contrato_list (por vendedor)": lambda: lista.filter(vendedor_id=vendedor_id).order_by(
+            "-data_assinatura", "-id_contrato"
+        )[:10],
+        # filas como em pendencias.pagina_da_fila (1ª página do cursor)
+        "pendencias_pagamento (cobrança)": lambda: fila("cobranca"),
+        "pendencias_pagamento (pagamento)": lambda: fila("pagamento"),
+        "pendencias_video": lambda: fila("video"),
+        "contratos_vencendo": lambda: Contrato.objects.filter(
+            data_vencimento_contrato__isnull=False,
+            data_cancelamento_contrato__isnull=True,
+            data_vencimento_contrato__lte=hoje + timedelta(days=30),
+        ).order_by("data_vencimento_contrato", "id_contrato"),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula uma base sintética e mede (EXPLAIN + tempo) as consultas das telas "
+        "com e sem os índices de Contrato/Video. Tudo roda em uma transação desfeita no "
+        "final (dados sintéticos e DROP INDEX), mas que segura locks das tabelas enquanto "
+        "mede: só em banco descartável (nome com test/bench ou --banco-descartavel)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contratos", type=int, default=20000, help="Quantidade de contratos a criar (padrão: 20000).")
+        parser.add_argument("--sem-popular", action="store_true", help="Usa os dados que já estão no banco.")
+        parser.add_argument("--repeticoes", type=int, default=5, help="Execuções por consulta (padrão: 5).")
+        parser.add_argument("--explain", action="store_true", help="Imprime o plano de cada consulta.")
+        parser.add_argument("--banco-descartavel", action="store_true",
+                            help="Confirma que o banco configurado pode ser usado para o benchmark.")
+
+    def _medir(self, repeticoes, explain):
+        resultados = {}
+        for nome, montar in consultas().items():
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                list(montar())
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nome] = statistics.median(tempos)
+            if explain:
+                self.stdout.write(f"\n--- {nome}\n{montar().explain()}")
+        return resultados
+
+    def _analisar(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def handle(self, *args, **options):
+        nome_banco = connection.settings_dict["NAME"]
+        if not (options["banco_descartavel"] or banco_descartavel(nome_banco)):
+            raise CommandError(
+                f"O banco '{nome_banco}' não parece descartável: o benchmark remove índices e "
+                "trava as tabelas de contratos e vídeos enquanto mede. Aponte DATABASE_URL para "
+                "um banco de teste/bench ou confirme com --banco-descartavel."
+            )
+
+        # dados sintéticos e índices removidos somem no rollback do final
+        with transaction.atomic():
+            if not options["sem_popular"]:
+                self.stdout.write(f"Populando {options['contratos']} contratos...")
+                popular_base(options["contratos"])
+            self._analisar()
+
+            indices = [(model, index.name) for model in (Contrato, Video) for index in model._meta.indexes]
+
+            # "antes": remove os índices dentro de um savepoint que é desfeito em seguida
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for _, nome in indices:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(nome)}")
+                self._analisar()
+                self.stdout.write(self.style.MIGRATE_HEADING("\nSem índices"))
+                antes = self._medir(options["repeticoes"], options["explain"])
+                transaction.set_rollback(True)
+
+            self._analisar()
+            self.stdout.write(self.style.MIGRATE_HEADING("\nCom índices"))
+            depois = self._medir(options["repeticoes"], options["explain"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{'Consulta':<36} {'sem (ms)':>10} {'com (ms)':>10} {'ganho':>8}"))
+        for nome in antes:
+            ganho = antes[nome] / depois[nome] if depois[nome] else 0
+            self.stdout.write(f"{nome:<36} {antes[nome]:>10.2f} {depois[nome]:>10.2f} {ganho:>7.1f}x")
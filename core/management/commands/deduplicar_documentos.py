@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.services.documentos import TAMANHO_LOTE, deduplicar
+
+
+class Command(BaseCommand):
+    help = (
+        "Move os documentos gravados antes do storage por conteúdo para ele: cópias do "
+        "mesmo arquivo passam a ser um arquivo só e os arquivos antigos são apagados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Só conta os documentos que seriam migrados.")
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE,
+                            help=f"Documentos por lote (padrão: {TAMANHO_LOTE}).")
+
+    def handle(self, *args, **options):
+        resultado = deduplicar(tamanho_lote=options["lote"], simular=options["dry_run"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.documentos} documento(s); {resultado.migrados} migrado(s), "
+            f"{resultado.ausentes} arquivo(s) ausente(s), {resultado.removidos} arquivo(s) antigo(s) apagado(s)."
+        ))
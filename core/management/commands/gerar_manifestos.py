@@ -0,0 +1,24 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from core.services.manifestos import gerar
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera os manifestos (playlist em JSON/CSV) das telas, regravando só os que mudaram. "
+        "Deve rodar no cron (diariamente) para tirar do ar os vídeos vencidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--local", type=int, action="append", dest="locais",
+                            help="ID do Local (pode repetir; padrão: todas as telas).")
+        parser.add_argument("--data", type=date.fromisoformat,
+                            help="Dia da playlist AAAA-MM-DD (padrão: hoje).")
+        parser.add_argument("--forcar", action="store_true",
+                            help="Regrava os arquivos mesmo sem mudança no conteúdo.")
+
+    def handle(self, *args, **options):
+        resultado = gerar(options["locais"], dia=options["data"], forcar=options["forcar"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.telas} tela(s) avaliada(s); {len(resultado.gerados)} manifesto(s) regravado(s)."
+        ))
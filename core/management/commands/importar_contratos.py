@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.services.importacao import (
+    TAMANHO_LOTE, ArquivoImportacaoInvalido, escrever_relatorio, importar, ler_planilha,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa contratos de uma planilha (xlsx ou CSV) no layout da exportação. "
+        "As linhas com erro vão para um relatório CSV que pode ser corrigido e reimportado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Planilha .xlsx ou .csv")
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE,
+                            help=f"Linhas por transação (padrão: {TAMANHO_LOTE}).")
+        parser.add_argument("--usuario", help="Username gravado em created_by/updated_by.")
+        parser.add_argument("--relatorio", default="importacao_erros.csv",
+                            help="Caminho do relatório de erros (padrão: importacao_erros.csv).")
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options["usuario"]:
+            usuario = User.objects.filter(username=options["usuario"]).first()
+            if usuario is None:
+                raise CommandError(f"Usuário não encontrado: {options['usuario']}")
+
+        def progresso(processados):
+            self.stdout.write(f"{processados} linha(s) processada(s)...")
+
+        try:
+            with open(options["arquivo"], "rb") as arquivo:
+                resultado = importar(
+                    ler_planilha(arquivo, options["arquivo"]), usuario,
+                    tamanho_lote=options["lote"], progresso=progresso,
+                )
+        except (OSError, ArquivoImportacaoInvalido) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.contratos} contrato(s) e {resultado.clientes} cliente(s) novo(s) "
+            f"de {resultado.linhas} linha(s)."
+        ))
+        if resultado.erros:
+            with open(options["relatorio"], "w", encoding="utf-8-sig", newline="") as destino:
+                escrever_relatorio(destino, resultado.erros)
+            self.stdout.write(self.style.WARNING(
+                f"{len(resultado.erros)} linha(s) com erro: veja {options['relatorio']}"
+            ))
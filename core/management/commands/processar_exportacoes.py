@@ -0,0 +1,49 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.services.exportacao import limpar_exportacoes_antigas, reservar_proxima_exportacao, processar_exportacao
+
+# de quanto em quanto tempo o worker apaga os arquivos de exportações antigas
+INTERVALO_LIMPEZA = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Worker que processa a fila de exportações de contratos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--uma-vez",
+            action="store_true",
+            help="Processa os jobs pendentes e encerra (útil em cron).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+
+    def handle(self, *args, **options):
+        ultima_limpeza = None
+        while True:
+            close_old_connections()
+            if ultima_limpeza is None or time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                removidos = limpar_exportacoes_antigas()
+                if removidos:
+                    self.stdout.write(f"{removidos} arquivo(s) de exportações antigas apagado(s)")
+                ultima_limpeza = time.monotonic()
+
+            job = reservar_proxima_exportacao()
+
+            if job is None:
+                if options["uma_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Processando {job}...")
+            job = processar_exportacao(job)
+            if job.status == job.CONCLUIDA:
+                self.stdout.write(self.style.SUCCESS(f"{job}: {job.processados} linha(s) em {job.arquivo.name}"))
+            else:
+                self.stderr.write(self.style.ERROR(f"{job}: {job.erro}"))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.services.importacao import reservar_proxima_importacao, processar_importacao
+
+
+class Command(BaseCommand):
+    help = "Worker que processa a fila de importações de contratos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--uma-vez",
+            action="store_true",
+            help="Processa os jobs pendentes e encerra (útil em cron).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = reservar_proxima_importacao()
+
+            if job is None:
+                if options["uma_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Processando {job}...")
+            job = processar_importacao(job)
+            if job.status == job.CONCLUIDA:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{job}: {job.contratos_criados} contrato(s), {job.clientes_criados} cliente(s) novo(s), "
+                    f"{job.linhas_com_erro} linha(s) com erro"
+                ))
+            else:
+                self.stderr.write(self.style.ERROR(f"{job}: {job.erro}"))
@@ -0,0 +1,62 @@
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.services.renovacao import TAMANHO_LOTE, processar_vencimentos
+
+
+class Command(BaseCommand):
+    help = (
+        "Renova os contratos de clientes com renovação automática e marca como Expirado "
+        "os demais contratos vencidos. Pode rodar no cron (diariamente)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Só mostra o que seria feito, sem gravar nada.")
+        parser.add_argument("--data", type=date.fromisoformat,
+                            help="Data de referência AAAA-MM-DD (padrão: hoje).")
+        parser.add_argument("--meses", type=int, default=1,
+                            help="Meses somados ao vencimento em cada renovação (padrão: 1).")
+        parser.add_argument("--antecedencia", type=int, default=0,
+                            help="Renova contratos que vencem nos próximos N dias (padrão: 0).")
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE,
+                            help=f"Contratos por UPDATE (padrão: {TAMANHO_LOTE}).")
+        parser.add_argument("--usuario", help="Username gravado em updated_by.")
+        parser.add_argument("--detalhes", type=int, default=20,
+                            help="Quantos contratos listar por ação no relatório (padrão: 20).")
+
+    def handle(self, *args, **options):
+        if options["meses"] < 1:
+            raise CommandError("--meses deve ser pelo menos 1.")
+        usuario = None
+        if options["usuario"]:
+            usuario = User.objects.filter(username=options["usuario"]).first()
+            if usuario is None:
+                raise CommandError(f"Usuário não encontrado: {options['usuario']}")
+
+        dia = options["data"] or timezone.localdate()
+        simular = options["dry_run"]
+        resultado = processar_vencimentos(
+            dia, meses=options["meses"], antecedencia=options["antecedencia"],
+            usuario=usuario, simular=simular, tamanho_lote=options["lote"],
+        )
+
+        prefixo = "[dry-run] " if simular else ""
+        limite = options["detalhes"]
+        self.stdout.write(f"{prefixo}Referência: {dia:%d/%m/%Y}")
+        self.stdout.write(f"{prefixo}{len(resultado.renovados)} contrato(s) renovado(s)")
+        for item in resultado.renovados[:limite]:
+            self.stdout.write(
+                f"  #{item.contrato_id:05d}: {item.vencimento:%d/%m/%Y} -> {item.novo_vencimento:%d/%m/%Y}"
+            )
+        self.stdout.write(f"{prefixo}{len(resultado.expirados)} contrato(s) expirado(s)")
+        for contrato_id in resultado.expirados[:limite]:
+            self.stdout.write(f"  #{contrato_id:05d}")
+        if max(len(resultado.renovados), len(resultado.expirados)) > limite:
+            self.stdout.write(f"  (listando no máximo {limite} por ação; use --detalhes)")
+
+        if simular:
+            self.stdout.write(self.style.WARNING("Nada foi gravado (--dry-run)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Vencimentos processados."))
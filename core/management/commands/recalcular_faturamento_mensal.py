@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.services.faturamento import recalcular_faturamento_mensal
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero o rollup de faturamento mensal a partir dos contratos."
+
+    def handle(self, *args, **options):
+        linhas = recalcular_faturamento_mensal()
+        self.stdout.write(self.style.SUCCESS(f"Faturamento mensal recalculado: {linhas} linha(s)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.models import ContadorPendencia
+from core.services.contadores import ler_contadores, recalcular_contadores
+
+
+class Command(BaseCommand):
+    help = "Reconta as filas de pendência a partir dos contratos e corrige os contadores da navegação."
+
+    def handle(self, *args, **options):
+        antes = ler_contadores()
+        depois = recalcular_contadores()
+        for chave, descricao in ContadorPendencia.CHAVES:
+            diferenca = depois[chave] - antes[chave]
+            linha = f"{descricao}: {depois[chave]}"
+            if diferenca:
+                self.stdout.write(self.style.WARNING(f"{linha} (estava {antes[chave]}, diferença {diferenca:+d})"))
+            else:
+                self.stdout.write(linha)
+        self.stdout.write(self.style.SUCCESS("Contadores reconciliados."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.services.ocupacao import TAMANHO_LOTE, ocupacao_no_dia, reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de ocupação das telas (IntervaloOcupacao) a partir dos vídeos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE,
+                            help=f"Vídeos por lote (padrão: {TAMANHO_LOTE}).")
+
+    def handle(self, *args, **options):
+        total = reconstruir(tamanho_lote=options["lote"])
+        hoje = ocupacao_no_dia()
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} vídeo(s) ocupando tela; {len(hoje)} tela(s) com vídeos hoje."
+        ))
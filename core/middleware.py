@@ -0,0 +1,154 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate, reraise
+
+logger = logging.getLogger("core.instrumentacao")
+logger_lentas = logging.getLogger("core.consultas_lentas")
+
+_metricas_atuais = ContextVar("metricas_request", default=None)
+
+
+class MetricasRequest:
+    def __init__(self, limite_lenta_ms):
+        self.limite_lenta_ms = limite_lenta_ms
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        self.lentas = []
+
+    def executar_query(self, execute, sql, params, many, context):
+        # usado com connection.execute_wrapper(): mede cada query da conexão
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.queries += 1
+            self.tempo_db += duracao
+            if duracao >= self.limite_lenta_ms:
+                self.lentas.append((duracao, context["connection"].alias, sql))
+
+
+class TemplateInstrumentado(DjangoTemplate):
+    """Template que soma o tempo de render nas métricas do request em andamento."""
+
+    def render(self, context=None, request=None):
+        metricas = _metricas_atuais.get()
+        if metricas is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metricas.tempo_template += (time.perf_counter() - inicio) * 1000
+
+
+class DjangoTemplatesInstrumentado(DjangoTemplates):
+    """
+    Backend DjangoTemplates que devolve TemplateInstrumentado (TEMPLATES["BACKEND"]
+    em app/settings.py). Só o template de topo passa por aqui; includes e
+    extends são renderizados dentro dele e entram no mesmo tempo.
+    """
+
+    def from_string(self, template_code):
+        return TemplateInstrumentado(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateInstrumentado(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede por request: número de queries, tempo de banco, tempo de template e
+    tempo total. Requests acima de SLOW_REQUEST_MS ou de MAX_QUERIES_REQUEST
+    viram uma linha estruturada em WARNING no logger "core.instrumentacao" (os
+    demais, em DEBUG); as queries acima de SLOW_QUERY_MS vão para o logger
+    "core.consultas_lentas".
+    O header Server-Timing só vai com DEBUG ou para usuários staff, para não
+    expor tempos internos a qualquer visitante.
+
+    O tempo de template depende do backend DjangoTemplatesInstrumentado.
+    Respostas em streaming (exportações, downloads) são medidas só até a view
+    devolver a resposta: as queries feitas enquanto o corpo é enviado ficam de
+    fora e a linha do log sai com "streaming": true.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite_lenta_ms = getattr(settings, "SLOW_QUERY_MS", 200)
+        self.limite_request_ms = getattr(settings, "SLOW_REQUEST_MS", 1000)
+        self.limite_queries = getattr(settings, "MAX_QUERIES_REQUEST", 50)
+
+    def __call__(self, request):
+        metricas = MetricasRequest(self.limite_lenta_ms)
+        token = _metricas_atuais.set(metricas)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexao in connections.all():
+                    stack.enter_context(conexao.execute_wrapper(metricas.executar_query))
+                response = self.get_response(request)
+                # ainda medido: ler request.user pode consultar sessão e usuário
+                mostrar_tempos = self._mostrar_tempos(request)
+        finally:
+            _metricas_atuais.reset(token)
+        total = (time.perf_counter() - inicio) * 1000
+
+        if mostrar_tempos:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={metricas.tempo_db:.1f};desc="{metricas.queries} queries"',
+                f"tpl;dur={metricas.tempo_template:.1f}",
+                f"total;dur={total:.1f}",
+            ])
+
+        view = self._nome_view(request)
+        excedeu = total >= self.limite_request_ms or metricas.queries > self.limite_queries
+        nivel = logging.WARNING if excedeu else logging.DEBUG
+        if logger.isEnabledFor(nivel):
+            logger.log(nivel, json.dumps({
+                "metodo": request.method,
+                "caminho": request.path,
+                "view": view,
+                "status": response.status_code,
+                "streaming": response.streaming,
+                "queries": metricas.queries,
+                "db_ms": round(metricas.tempo_db, 1),
+                "template_ms": round(metricas.tempo_template, 1),
+                "total_ms": round(total, 1),
+            }))
+
+        for duracao, alias, sql in metricas.lentas:
+            logger_lentas.warning(
+                json.dumps({
+                    "view": view,
+                    "rota": getattr(request.resolver_match, "route", None),
+                    "kwargs": getattr(request.resolver_match, "kwargs", None),
+                    "banco": alias,
+                    "duracao_ms": round(duracao, 1),
+                    "sql": sql,
+                }, default=str)
+            )
+        return response
+
+    @staticmethod
+    def _mostrar_tempos(request):
+        if settings.DEBUG:
+            return True
+        usuario = getattr(request, "user", None)
+        return bool(usuario and usuario.is_staff)
+
+    @staticmethod
+    def _nome_view(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return None
+        return match.view_name or match._func_path
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum, F, ExpressionWrapper, DecimalField
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+
+def popular_faturamento_mensal(apps, schema_editor):
+    Contrato = apps.get_model('core', 'Contrato')
+    FaturamentoMensal = apps.get_model('core', 'FaturamentoMensal')
+    valor_total_expr = ExpressionWrapper(
+        F('valor_mensalidade') * F('vigencia_meses'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    linhas = (
+        Contrato.objects
+        .annotate(ano=ExtractYear('data_assinatura'), mes=ExtractMonth('data_assinatura'))
+        .values('ano', 'mes', 'vendedor_id', 'forma_pagamento_id')
+        .annotate(total_contratos=Count('id_contrato'), total_valor=Sum(valor_total_expr))
+        .order_by()
+    )
+    FaturamentoMensal.objects.bulk_create(
+        [
+            FaturamentoMensal(
+                ano=linha['ano'],
+                mes=linha['mes'],
+                vendedor_id=linha['vendedor_id'],
+                forma_pagamento_id=linha['forma_pagamento_id'],
+                contratos=linha['total_contratos'],
+                valor_total=linha['total_valor'] or 0,
+            )
+            for linha in linhas
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_alter_formapagamento_options_alter_local_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaturamentoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('contratos', models.IntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('forma_pagamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.formapagamento')),
+                ('vendedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.vendedor')),
+            ],
+            options={
+                'verbose_name': 'Faturamento Mensal',
+                'verbose_name_plural': 'Faturamento Mensal',
+                'indexes': [models.Index(fields=['ano', 'mes', 'vendedor', 'forma_pagamento'], name='faturamento_mensal_chave_idx')],
+            },
+        ),
+        migrations.RunPython(popular_faturamento_mensal, migrations.RunPython.noop),
+    ]
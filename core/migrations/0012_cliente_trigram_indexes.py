@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Índices GIN pg_trgm para a busca por razão social e CPF/CNPJ (LIKE '%termo%').
+# Só se aplicam ao PostgreSQL; em outros bancos a migração não faz nada.
+
+INDICES = [
+    ("cliente_razao_social_trgm_idx", "razao_social"),
+    ("cliente_cpf_cnpj_trgm_idx", "cpf_cnpj"),
+]
+
+
+def criar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    tabela = schema_editor.quote_name(apps.get_model("core", "Cliente")._meta.db_table)
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for nome, coluna in INDICES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} USING gin ({schema_editor.quote_name(coluna)} gin_trgm_ops)"
+        )
+
+
+def remover_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nome, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nome}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_exportacaocontratos'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices_trigram, remover_indices_trigram),
+    ]
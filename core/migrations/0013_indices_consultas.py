@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_cliente_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(fields=['-data_assinatura', '-id_contrato'], name='contrato_lista_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(fields=['vendedor', '-data_assinatura', '-id_contrato'], name='contrato_vendedor_lista_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(condition=models.Q(('cobranca_gerada', False)), fields=['id_contrato'], name='contrato_cobranca_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(condition=models.Q(('cobranca_gerada', True), models.Q(('primeiro_pagamento__isnull', True), ('segundo_pagamento__isnull', True), _connector='OR')), fields=['id_contrato'], name='contrato_pagamento_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(condition=models.Q(('primeiro_pagamento__isnull', False)), fields=['id_contrato'], name='contrato_pago_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(condition=models.Q(('data_cancelamento_contrato__isnull', True), ('data_vencimento_contrato__isnull', False)), fields=['data_vencimento_contrato', 'id_contrato'], name='contrato_vencimento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(condition=models.Q(('status', False)), fields=['contrato'], name='video_pendente_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:40
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+
+
+def popular_contadores(apps, schema_editor):
+    Contrato = apps.get_model('core', 'Contrato')
+    Video = apps.get_model('core', 'Video')
+    ContadorPendencia = apps.get_model('core', 'ContadorPendencia')
+
+    video_off = Exists(Video.objects.filter(contrato=OuterRef('pk'), status=False))
+    contagens = Contrato.objects.aggregate(
+        video=Count('pk', filter=Q(primeiro_pagamento__isnull=False) & video_off),
+        cobranca=Count('pk', filter=Q(cobranca_gerada=False)),
+        pagamento=Count(
+            'pk',
+            filter=Q(cobranca_gerada=True) & (Q(primeiro_pagamento__isnull=True) | Q(segundo_pagamento__isnull=True)),
+        ),
+    )
+    ContadorPendencia.objects.bulk_create(
+        [ContadorPendencia(chave=chave, valor=valor) for chave, valor in contagens.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorPendencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(choices=[('video', 'Ativação de vídeo'), ('cobranca', 'Cobrança não gerada'), ('pagamento', 'Pagamento pendente')], max_length=20, unique=True)),
+                ('valor', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de Pendência',
+                'verbose_name_plural': 'Contadores de Pendência',
+            },
+        ),
+        migrations.RunPython(popular_contadores, migrations.RunPython.noop),
+    ]
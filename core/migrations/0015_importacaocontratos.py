@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_contadorpendencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoContratos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('processados', models.IntegerField(default=0)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('arquivo', models.FileField(upload_to='importacoes/')),
+                ('relatorio', models.FileField(blank=True, null=True, upload_to='importacoes/')),
+                ('contratos_criados', models.IntegerField(default=0)),
+                ('clientes_criados', models.IntegerField(default=0)),
+                ('linhas_com_erro', models.IntegerField(default=0)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importação de Contratos',
+                'verbose_name_plural': 'Importações de Contratos',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='importacao_fila_idx')],
+            },
+        ),
+    ]
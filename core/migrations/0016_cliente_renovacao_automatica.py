@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_importacaocontratos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='renovacao_automatica',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def popular_intervalos(apps, schema_editor):
+    Video = apps.get_model('core', 'Video')
+    IntervaloOcupacao = apps.get_model('core', 'IntervaloOcupacao')
+
+    intervalos = []
+    videos = Video.objects.filter(status=True, data_subiu__isnull=False).values_list(
+        'pk', 'local_id', 'data_subiu', 'tempo_video',
+        'contrato__data_vencimento_contrato', 'contrato__data_cancelamento_contrato',
+    )
+    for pk, local_id, inicio, tempo, vencimento, cancelamento in videos.iterator(chunk_size=2000):
+        fins = [d for d in (vencimento, cancelamento) if d]
+        fim = min(fins) if fins else None
+        if fim and fim < inicio:
+            continue
+        intervalos.append(IntervaloOcupacao(
+            video_id=pk, local_id=local_id, inicio=inicio, fim=fim, segundos=max(0, round(tempo.total_seconds())),
+        ))
+    IntervaloOcupacao.objects.bulk_create(intervalos, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_cliente_renovacao_automatica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntervaloOcupacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateField()),
+                ('fim', models.DateField(blank=True, null=True)),
+                ('segundos', models.PositiveIntegerField()),
+                ('local', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervalos_ocupacao', to='core.local')),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='intervalo_ocupacao', to='core.video')),
+            ],
+            options={
+                'verbose_name': 'Intervalo de Ocupação',
+                'verbose_name_plural': 'Intervalos de Ocupação',
+                'indexes': [models.Index(fields=['inicio', 'fim'], name='ocupacao_periodo_idx'), models.Index(fields=['local', 'inicio'], name='ocupacao_local_idx')],
+            },
+        ),
+        migrations.RunPython(popular_intervalos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_intervaloocupacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='local',
+            name='capacidade_segundos',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
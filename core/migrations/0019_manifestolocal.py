@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_local_capacidade_segundos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ManifestoLocal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_conteudo', models.CharField(max_length=64)),
+                ('videos', models.PositiveIntegerField(default=0)),
+                ('segundos', models.PositiveIntegerField(default=0)),
+                ('arquivo_json', models.FileField(upload_to='manifestos/')),
+                ('arquivo_csv', models.FileField(upload_to='manifestos/')),
+                ('gerado_em', models.DateTimeField()),
+                ('local', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='manifesto', to='core.local')),
+            ],
+            options={
+                'verbose_name': 'Manifesto da Tela',
+                'verbose_name_plural': 'Manifestos das Telas',
+            },
+        ),
+    ]
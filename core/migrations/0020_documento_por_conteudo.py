@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:04
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_manifestolocal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentocontrato',
+            name='nome_original',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='documentocontrato',
+            name='arquivo',
+            field=models.FileField(db_index=True, storage=core.storage.ArmazenamentoPorConteudo(), upload_to='documentos/'),
+        ),
+    ]
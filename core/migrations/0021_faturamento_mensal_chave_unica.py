@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:14
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def juntar_duplicadas(apps, schema_editor):
+    # linhas repetidas criadas por gravações concorrentes antes da constraint:
+    # a primeira fica com a soma das demais
+    FaturamentoMensal = apps.get_model("core", "FaturamentoMensal")
+    chave = ("ano", "mes", "vendedor_id", "forma_pagamento_id")
+    repetidas = (
+        FaturamentoMensal.objects.values(*chave)
+        .annotate(linhas=Count("id"), primeira=Min("id"), contratos_soma=Sum("contratos"), valor_soma=Sum("valor_total"))
+        .filter(linhas__gt=1)
+        .order_by()
+    )
+    for grupo in repetidas:
+        mesmas = FaturamentoMensal.objects.filter(**{campo: grupo[campo] for campo in chave})
+        mesmas.exclude(id=grupo["primeira"]).delete()
+        mesmas.filter(id=grupo["primeira"]).update(contratos=grupo["contratos_soma"], valor_total=grupo["valor_soma"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_documento_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_duplicadas, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='faturamentomensal',
+            name='faturamento_mensal_chave_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='faturamentomensal',
+            constraint=models.UniqueConstraint(models.F('ano'), models.F('mes'), django.db.models.functions.comparison.Coalesce('vendedor', 0), django.db.models.functions.comparison.Coalesce('forma_pagamento', 0), name='faturamento_mensal_chave_unica'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_faturamento_mensal_chave_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueioArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Bloqueio de Arquivo',
+                'verbose_name_plural': 'Bloqueios de Arquivo',
+            },
+        ),
+    ]
@@ -1,11 +1,23 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from core.storage import armazenamento_documentos
 import datetime
 import os
 import re
 import unicodedata
 
 
+def normalizar_texto(valor):
+    """Remove acentos, converte para maiúsculas e apara espaços (padrão da razão social)."""
+    valor = unicodedata.normalize("NFKD", valor).encode("ASCII", "ignore").decode("utf-8")
+    return valor.upper().strip()
+
+
+def somente_digitos(valor):
+    return re.sub(r"\D", "", valor)
+
+
 class BaseAudit(models.Model):
     created_by = models.ForeignKey(
         User,
@@ -34,23 +46,27 @@ class Cliente(BaseAudit):
     telefone = models.CharField(max_length=20, blank=True, null=True)
     telefone_financeiro = models.CharField(max_length=20, blank=True, null=True)
     email_financeiro = models.EmailField(blank=True, null=True)
+    # contratos renovados pelo processar_vencimentos em vez de expirados
+    renovacao_automatica = models.BooleanField(default=False)
 
-    def save(self, *args, **kwargs):
+    def normalizar(self):
         # Normalizar razão social (sem acentos e maiúscula)
         if self.razao_social:
-            self.razao_social = unicodedata.normalize("NFKD", self.razao_social).encode("ASCII", "ignore").decode("utf-8")
-            self.razao_social = self.razao_social.upper().strip()
+            self.razao_social = normalizar_texto(self.razao_social)
 
         # Remover caracteres não numéricos dos campos de números
         if self.cpf_cnpj:
-            self.cpf_cnpj = re.sub(r"\D", "", self.cpf_cnpj)
+            self.cpf_cnpj = somente_digitos(self.cpf_cnpj)
 
         if self.telefone:
-            self.telefone = re.sub(r"\D", "", self.telefone)
+            self.telefone = somente_digitos(self.telefone)
 
         if self.telefone_financeiro:
-            self.telefone_financeiro = re.sub(r"\D", "", self.telefone_financeiro)
+            self.telefone_financeiro = somente_digitos(self.telefone_financeiro)
 
+    def save(self, *args, **kwargs):
+        # bulk_create não passa por aqui: quem cria em lote chama normalizar()
+        self.normalizar()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -80,6 +96,8 @@ class Vendedor(BaseAudit):
 
 class Local(BaseAudit):
     nome = models.CharField(max_length=255)
+    # duração máxima do loop da tela; vazio = sem limite
+    capacidade_segundos = models.PositiveIntegerField(blank=True, null=True)
 
     def __str__(self):
         return self.nome
@@ -161,30 +179,101 @@ class Contrato(BaseAudit):
 
     class Meta:
         ordering = ["-data_assinatura", "-id_contrato"]
+        # Índices pensados para as consultas das telas (medidos com `manage.py benchmark_indices`)
+        indexes = [
+            # contrato_list: ordenação padrão + paginação por cursor
+            models.Index(fields=["-data_assinatura", "-id_contrato"], name="contrato_lista_idx"),
+            # contrato_list filtrado por vendedor
+            models.Index(fields=["vendedor", "-data_assinatura", "-id_contrato"], name="contrato_vendedor_lista_idx"),
+            # pendencias_pagamento: cobrança não gerada
+            models.Index(
+                fields=["id_contrato"],
+                name="contrato_cobranca_pend_idx",
+                condition=models.Q(cobranca_gerada=False),
+            ),
+            # pendencias_pagamento: cobrança gerada com parcela em aberto
+            models.Index(
+                fields=["id_contrato"],
+                name="contrato_pagamento_pend_idx",
+                condition=models.Q(cobranca_gerada=True)
+                & (models.Q(primeiro_pagamento__isnull=True) | models.Q(segundo_pagamento__isnull=True)),
+            ),
+            # pendencias_video: só contratos com primeiro pagamento
+            models.Index(
+                fields=["id_contrato"],
+                name="contrato_pago_idx",
+                condition=models.Q(primeiro_pagamento__isnull=False),
+            ),
+            # contratos_vencendo: vencimento definido e não cancelado
+            models.Index(
+                fields=["data_vencimento_contrato", "id_contrato"],
+                name="contrato_vencimento_idx",
+                condition=models.Q(data_vencimento_contrato__isnull=False, data_cancelamento_contrato__isnull=True),
+            ),
+        ]
 
 
 class DocumentoContrato(BaseAudit):
     contrato = models.ForeignKey(Contrato, on_delete=models.CASCADE, related_name="documentos")
-    arquivo = models.FileField(upload_to=contrato_upload_path)
+    # endereçado pelo conteúdo: o mesmo PDF anexado a vários contratos é um
+    # arquivo só; o nome enviado fica em nome_original
+    arquivo = models.FileField(upload_to="documentos/", storage=armazenamento_documentos, db_index=True)
+    nome_original = models.CharField(max_length=255, blank=True)
     descricao = models.CharField(max_length=255, blank=True, null=True)
 
     @property
     def filename(self):
-        return os.path.basename(self.arquivo.name)
+        return self.nome_original or os.path.basename(self.arquivo.name)
 
     def __str__(self):
-        return f"{self.contrato} - {self.descricao or self.arquivo.name}"
+        return f"{self.contrato} - {self.descricao or self.filename}"
 
-    def delete(self, *args, **kwargs):
-        # Excluir o arquivo do storage antes de remover o registro
-        if self.arquivo and self.arquivo.storage.exists(self.arquivo.name):
-            self.arquivo.delete(save=False)
-        super().delete(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        if not self.arquivo or self.arquivo._committed:
+            return super().save(*args, **kwargs)
+        self.nome_original = os.path.basename(self.arquivo.name)[:255]
+        storage = self.arquivo.storage
+        # o upload em si (não o FieldFile): é o objeto que chega ao _save do storage
+        nome = storage.nome_para(self.arquivo.file, self.arquivo.name)
+        # conferir se o arquivo já existe e gravar a referência sob o bloqueio
+        # do nome: liberar_arquivo não apaga o arquivo no meio do caminho
+        with transaction.atomic():
+            BloqueioArquivo.bloquear(nome)
+            if storage.exists(nome):
+                self.arquivo.name = nome
+                self.arquivo._committed = True
+            super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Documento do Contrato"
         verbose_name_plural = "Documentos do Contrato"
 
+
+class BloqueioArquivo(models.Model):
+    """
+    Linha de bloqueio por arquivo do storage por conteúdo. Quem grava uma
+    referência a um arquivo ou apaga um arquivo sem referências trava esta
+    linha (select_for_update) até o fim da transação e confere o estado de
+    novo já com o bloqueio; quem apaga o arquivo apaga a linha junto.
+    """
+    nome = models.CharField(max_length=255, unique=True)
+
+    @classmethod
+    def bloquear(cls, nome):
+        """Trava o nome até o fim da transação em andamento (cria a linha se preciso)."""
+        while True:
+            cls.objects.bulk_create([cls(nome=nome)], ignore_conflicts=True)
+            bloqueio = cls.objects.select_for_update().filter(nome=nome).first()
+            if bloqueio is not None:  # None: apagada por quem segurava o bloqueio
+                return bloqueio
+
+    def __str__(self):
+        return self.nome
+
+    class Meta:
+        verbose_name = "Bloqueio de Arquivo"
+        verbose_name_plural = "Bloqueios de Arquivo"
+
 class Registro(BaseAudit):
     contrato = models.ForeignKey(Contrato, on_delete=models.CASCADE, related_name="registros")
     data_hora = models.DateTimeField(default=datetime.datetime.now)
@@ -202,4 +291,191 @@ class Video(BaseAudit):
     data_subiu = models.DateField(blank=True, null=True)
 
     def __str__(self):
-        return f"Vídeo {self.id} - {self.tempo_video}"
\ No newline at end of file
+        return f"Vídeo {self.id} - {self.tempo_video}"
+
+    class Meta:
+        indexes = [
+            # pendencias_video / detalhe: vídeos OFF por contrato
+            models.Index(fields=["contrato"], name="video_pendente_idx", condition=models.Q(status=False)),
+        ]
+
+class FaturamentoMensal(models.Model):
+    """
+    Rollup do faturamento por mês de assinatura, vendedor e forma de pagamento.
+    Mantido incrementalmente pelos sinais de Contrato (ver core/signals.py) e
+    reconstruído com `python manage.py recalcular_faturamento_mensal`.
+    """
+    ano = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    vendedor = models.ForeignKey(Vendedor, on_delete=models.CASCADE, null=True, blank=True)
+    forma_pagamento = models.ForeignKey(FormaPagamento, on_delete=models.CASCADE, null=True, blank=True)
+    contratos = models.IntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.mes:02d}/{self.ano} - {self.vendedor or '-'} - {self.forma_pagamento or '-'}"
+
+    class Meta:
+        verbose_name = "Faturamento Mensal"
+        verbose_name_plural = "Faturamento Mensal"
+        constraints = [
+            # uma linha por chave; Coalesce porque NULL != NULL em UNIQUE (vendedor e
+            # forma de pagamento são opcionais). Também serve de índice para a chave.
+            models.UniqueConstraint(
+                "ano", "mes", Coalesce("vendedor", 0), Coalesce("forma_pagamento", 0),
+                name="faturamento_mensal_chave_unica",
+            ),
+        ]
+
+
+class ContadorPendencia(models.Model):
+    """
+    Contadores das filas de pendência exibidos na barra de navegação.
+    Mantidos incrementalmente pelos sinais de Contrato e Video (ver
+    core/services/contadores.py) e conferidos com
+    `python manage.py reconciliar_contadores`.
+    """
+    VIDEO = "video"
+    COBRANCA = "cobranca"
+    PAGAMENTO = "pagamento"
+    CHAVES = [
+        (VIDEO, "Ativação de vídeo"),
+        (COBRANCA, "Cobrança não gerada"),
+        (PAGAMENTO, "Pagamento pendente"),
+    ]
+
+    chave = models.CharField(max_length=20, choices=CHAVES, unique=True)
+    valor = models.IntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_chave_display()}: {self.valor}"
+
+    class Meta:
+        verbose_name = "Contador de Pendência"
+        verbose_name_plural = "Contadores de Pendência"
+
+
+class IntervaloOcupacao(models.Model):
+    """
+    Índice de ocupação das telas: um intervalo por vídeo ativo, do dia em que
+    subiu até o fim da vigência do contrato (vencimento ou cancelamento, o que
+    vier antes; sem fim enquanto não houver nenhum dos dois). Mantido pelos
+    sinais de Video e Contrato (ver core/services/ocupacao.py) e reconstruído
+    com `python manage.py sincronizar_ocupacao`.
+    """
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name="intervalo_ocupacao")
+    local = models.ForeignKey(Local, on_delete=models.CASCADE, related_name="intervalos_ocupacao")
+    inicio = models.DateField()
+    fim = models.DateField(blank=True, null=True)
+    segundos = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.local_id}: {self.segundos}s de {self.inicio} a {self.fim or '...'}"
+
+    class Meta:
+        verbose_name = "Intervalo de Ocupação"
+        verbose_name_plural = "Intervalos de Ocupação"
+        indexes = [
+            # ocupação de todas as telas em um período: inicio <= fim do período
+            models.Index(fields=["inicio", "fim"], name="ocupacao_periodo_idx"),
+            models.Index(fields=["local", "inicio"], name="ocupacao_local_idx"),
+        ]
+
+
+class ManifestoLocal(models.Model):
+    """
+    Playlist de uma tela (vídeos no ar, em ordem, com a duração) gravada em
+    JSON e CSV no MEDIA. Só é regravada quando o hash do conteúdo muda (ver
+    core/services/manifestos.py); `python manage.py gerar_manifestos` refaz
+    todas e tira do ar os vídeos que venceram.
+    """
+    local = models.OneToOneField(Local, on_delete=models.CASCADE, related_name="manifesto")
+    hash_conteudo = models.CharField(max_length=64)
+    videos = models.PositiveIntegerField(default=0)
+    segundos = models.PositiveIntegerField(default=0)
+    arquivo_json = models.FileField(upload_to="manifestos/")
+    arquivo_csv = models.FileField(upload_to="manifestos/")
+    gerado_em = models.DateTimeField()
+
+    def __str__(self):
+        return f"Manifesto {self.local_id}: {self.videos} vídeo(s), {self.segundos}s"
+
+    class Meta:
+        verbose_name = "Manifesto da Tela"
+        verbose_name_plural = "Manifestos das Telas"
+
+
+class JobContratos(BaseAudit):
+    """Base dos jobs processados fora do request (exportação/importação)."""
+    PENDENTE = "pendente"
+    PROCESSANDO = "processando"
+    CONCLUIDA = "concluida"
+    ERRO = "erro"
+    STATUS_CHOICES = [
+        (PENDENTE, "Pendente"),
+        (PROCESSANDO, "Processando"),
+        (CONCLUIDA, "Concluída"),
+        (ERRO, "Erro"),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    total = models.IntegerField(default=0)
+    processados = models.IntegerField(default=0)
+    erro = models.TextField(blank=True, null=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def percentual(self):
+        if self.status == self.CONCLUIDA:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.processados * 100 / self.total))
+
+    class Meta:
+        abstract = True
+
+
+class ExportacaoContratos(JobContratos):
+    """Job de exportação processado fora do request (ver processar_exportacoes)."""
+    FORMATO_CHOICES = [
+        ("xlsx", "Excel"),
+        ("csv", "CSV"),
+    ]
+
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default="xlsx")
+    filtros = models.JSONField(default=dict, blank=True)
+    arquivo = models.FileField(upload_to="exportacoes/", blank=True, null=True)
+
+    def __str__(self):
+        return f"Exportação {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Exportação de Contratos"
+        verbose_name_plural = "Exportações de Contratos"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="exportacao_fila_idx"),
+        ]
+
+
+class ImportacaoContratos(JobContratos):
+    """Job de importação de planilha de contratos (ver processar_importacoes)."""
+    arquivo = models.FileField(upload_to="importacoes/")
+    relatorio = models.FileField(upload_to="importacoes/", blank=True, null=True)
+    contratos_criados = models.IntegerField(default=0)
+    clientes_criados = models.IntegerField(default=0)
+    linhas_com_erro = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Importação {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Importação de Contratos"
+        verbose_name_plural = "Importações de Contratos"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="importacao_fila_idx"),
+        ]
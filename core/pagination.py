@@ -0,0 +1,133 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class PaginaCursor:
+    """Página de uma paginação por cursor (keyset), com a mesma cara de um Page do Django."""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class PaginadorCursor:
+    """
+    Paginação por cursor sobre uma ordenação estável (a última coluna deve ser
+    única, ex.: a PK). Em vez de COUNT(*) + OFFSET, cada página filtra a partir
+    dos valores da última linha vista, então o custo não depende da profundidade.
+
+        paginador = PaginadorCursor(qs, ("-data_assinatura", "-id_contrato"), por_pagina=10)
+        pagina = paginador.pagina(apos=request.GET.get("apos"), antes=request.GET.get("antes"))
+    """
+
+    def __init__(self, queryset, ordenacao, por_pagina=10):
+        self.queryset = queryset
+        self.ordenacao = list(ordenacao)
+        self.por_pagina = por_pagina
+        self.campos = [campo.lstrip("-") for campo in self.ordenacao]
+        self.descendente = [campo.startswith("-") for campo in self.ordenacao]
+
+    # ----- cursor -----
+
+    def _valor(self, item, campo):
+        if isinstance(item, dict):
+            return item[campo]
+        return getattr(item, campo)
+
+    def codificar(self, item):
+        valores = []
+        for campo in self.campos:
+            valor = self._valor(item, campo)
+            valores.append(valor.isoformat() if hasattr(valor, "isoformat") else valor)
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+    def decodificar(self, cursor):
+        try:
+            bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            valores = json.loads(bruto)
+        except (ValueError, TypeError) as exc:
+            raise CursorInvalido(cursor) from exc
+        if not isinstance(valores, list) or len(valores) != len(self.campos):
+            raise CursorInvalido(cursor)
+
+        opts = self.queryset.model._meta
+        try:
+            return [opts.get_field(campo).to_python(valor) for campo, valor in zip(self.campos, valores)]
+        except Exception as exc:
+            raise CursorInvalido(cursor) from exc
+
+    # ----- consulta -----
+
+    def _filtro(self, valores, para_tras):
+        # (a, b) depois de (va, vb) => a > va OR (a = va AND b > vb), respeitando a direção de cada coluna
+        condicoes = []
+        for i, campo in enumerate(self.campos):
+            desc = self.descendente[i] != para_tras
+            iguais = {self.campos[j]: valores[j] for j in range(i)}
+            iguais[f"{campo}__{'lt' if desc else 'gt'}"] = valores[i]
+            condicoes.append(Q(**iguais))
+        return reduce(or_, condicoes)
+
+    def _ordenacao(self, para_tras):
+        if not para_tras:
+            return self.ordenacao
+        return [campo.lstrip("-") if campo.startswith("-") else f"-{campo}" for campo in self.ordenacao]
+
+    def pagina(self, apos=None, antes=None):
+        """Página seguinte a `apos`, anterior a `antes` ou a primeira (sem cursor)."""
+        cursor = antes or apos
+        para_tras = bool(antes)
+        qs = self.queryset.order_by(*self._ordenacao(para_tras))
+
+        if cursor:
+            try:
+                qs = qs.filter(self._filtro(self.decodificar(cursor), para_tras))
+            except CursorInvalido:
+                cursor, para_tras = None, False
+                qs = self.queryset.order_by(*self.ordenacao)
+
+        itens = list(qs[: self.por_pagina + 1])
+        tem_mais = len(itens) > self.por_pagina
+        itens = itens[: self.por_pagina]
+
+        if para_tras:
+            itens.reverse()
+            has_next, has_previous = True, tem_mais
+        else:
+            has_next, has_previous = tem_mais, bool(cursor)
+
+        return PaginaCursor(
+            itens,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.codificar(itens[-1]) if itens and has_next else None,
+            previous_cursor=self.codificar(itens[0]) if itens and has_previous else None,
+        )
@@ -0,0 +1,149 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from django.core.cache import cache
+from core.models import Cliente, normalizar_texto, somente_digitos
+
+# Índice de prefixos em memória para o autocomplete de clientes.
+#
+# Cada worker monta o índice uma vez (na primeira busca) e o mantém atualizado
+# pelos sinais de Cliente. Quando outro worker altera um cliente, a versão no
+# cache muda e o índice local é reconstruído na próxima busca; com um cache
+# local (LocMem) isso não se propaga, então há também uma idade máxima.
+
+CHAVE_VERSAO = "autocomplete_clientes:versao"
+IDADE_MAXIMA = 300  # segundos
+CAMPOS = ["id", "razao_social", "cpf_cnpj", "email", "telefone", "telefone_financeiro", "email_financeiro"]
+
+
+class IndicePrefixos:
+    """Lista ordenada de (chave, id): a busca por prefixo é um bisect + varredura curta."""
+
+    def __init__(self):
+        self._entradas = []
+        self._chaves_por_id = {}
+        self.clientes = {}
+
+    @staticmethod
+    def chaves(cliente):
+        razao = normalizar_texto(cliente["razao_social"] or "")
+        # o nome inteiro e o nome a partir de cada palavra ("SAO J" acha "PADARIA SAO JOAO")
+        chaves = {razao[m.start():] for m in re.finditer(r"\S+", razao)}
+        if cliente["cpf_cnpj"]:
+            chaves.add(somente_digitos(cliente["cpf_cnpj"]))
+        chaves.discard("")
+        return chaves
+
+    def construir(self, clientes):
+        entradas = []
+        self._chaves_por_id = {}
+        self.clientes = {}
+        for cliente in clientes:
+            chaves = self.chaves(cliente)
+            self._chaves_por_id[cliente["id"]] = chaves
+            self.clientes[cliente["id"]] = cliente
+            entradas.extend((chave, cliente["id"]) for chave in chaves)
+        entradas.sort()
+        self._entradas = entradas
+
+    def remover(self, cliente_id):
+        for chave in self._chaves_por_id.pop(cliente_id, ()):
+            i = bisect_left(self._entradas, (chave, cliente_id))
+            if i < len(self._entradas) and self._entradas[i] == (chave, cliente_id):
+                del self._entradas[i]
+        self.clientes.pop(cliente_id, None)
+
+    def adicionar(self, cliente):
+        self.remover(cliente["id"])
+        chaves = self.chaves(cliente)
+        self._chaves_por_id[cliente["id"]] = chaves
+        self.clientes[cliente["id"]] = cliente
+        for chave in chaves:
+            insort(self._entradas, (chave, cliente["id"]))
+
+    def buscar(self, prefixo, limite=10):
+        encontrados = []
+        vistos = set()
+        i = bisect_left(self._entradas, (prefixo,))
+        while i < len(self._entradas) and len(encontrados) < limite:
+            chave, cliente_id = self._entradas[i]
+            if not chave.startswith(prefixo):
+                break
+            if cliente_id not in vistos:
+                vistos.add(cliente_id)
+                encontrados.append(self.clientes[cliente_id])
+            i += 1
+        return encontrados
+
+
+_lock = threading.Lock()
+_indice = None
+_versao = None
+_construido_em = 0.0
+
+
+def _versao_atual():
+    cache.add(CHAVE_VERSAO, 0, timeout=None)
+    return cache.get(CHAVE_VERSAO)
+
+
+def _indice_em_dia(versao):
+    """Índice deste worker, reconstruído se ficou para trás. Chamar com _lock."""
+    global _indice, _versao, _construido_em
+    expirado = time.monotonic() - _construido_em > IDADE_MAXIMA
+    if _indice is None or versao != _versao or expirado:
+        indice = IndicePrefixos()
+        indice.construir(Cliente.objects.values(*CAMPOS).order_by().iterator(chunk_size=2000))
+        _indice, _versao, _construido_em = indice, versao, time.monotonic()
+    return _indice
+
+
+def normalizar_consulta(termo):
+    termo = (termo or "").strip()
+    if re.fullmatch(r"[\d.\-/\s]+", termo):
+        return somente_digitos(termo)
+    return normalizar_texto(termo)
+
+
+def buscar(termo, limite=10):
+    prefixo = normalizar_consulta(termo)
+    if not prefixo:
+        return []
+    versao = _versao_atual()
+    # adicionar/remover alteram a lista no lugar (sinais, em outra thread do
+    # mesmo worker): a leitura também fica sob o lock
+    with _lock:
+        return _indice_em_dia(versao).buscar(prefixo, limite)
+
+
+def _nova_versao():
+    cache.add(CHAVE_VERSAO, 0, timeout=None)
+    try:
+        return cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, 1, timeout=None)
+        return 1
+
+
+def atualizar_cliente(cliente_id):
+    """Reflete no índice deste worker um cliente criado/alterado/excluído e avisa os outros."""
+    global _versao
+    versao = _nova_versao()
+    dados = Cliente.objects.filter(pk=cliente_id).values(*CAMPOS).first()
+    with _lock:
+        if _indice is None:
+            return
+        if _versao is not None and versao != _versao + 1:
+            # outro worker também mudou algo: reconstrói na próxima busca
+            return
+        if dados:
+            _indice.adicionar(dados)
+        else:
+            _indice.remover(cliente_id)
+        _versao = versao
+
+
+def invalidar_indice():
+    """Para cargas em massa (bulk_create/update) que não disparam sinais."""
+    _nova_versao()
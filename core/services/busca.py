@@ -0,0 +1,53 @@
+from django.db import connections
+from core.models import normalizar_texto, somente_digitos
+
+# Busca por razão social / CPF-CNPJ.
+#
+# Os dois campos já são gravados normalizados (Cliente.save), então o termo é
+# normalizado do mesmo jeito e a busca usa `contains` (LIKE '%termo%') na coluna
+# pura. No PostgreSQL esse LIKE é atendido pelos índices GIN pg_trgm criados na
+# migração 0012 e os resultados podem ser ordenados por similaridade; no SQLite
+# a busca continua funcionando, só que sem índice e sem ranking.
+
+
+def usa_trigram(qs):
+    return connections[qs.db].vendor == "postgresql"
+
+
+def termo_razao_social(termo):
+    return normalizar_texto(termo or "")
+
+
+def termo_cpf_cnpj(termo):
+    termo = (termo or "").strip()
+    return somente_digitos(termo) or termo
+
+
+def filtrar_por_cliente(qs, nome=None, cpf_cnpj=None, prefixo="cliente__"):
+    """Filtra um queryset (de Contrato, por padrão) pelo nome e/ou CPF/CNPJ do cliente."""
+    nome = termo_razao_social(nome)
+    cpf_cnpj = termo_cpf_cnpj(cpf_cnpj)
+    if nome:
+        qs = qs.filter(**{f"{prefixo}razao_social__contains": nome})
+    if cpf_cnpj:
+        qs = qs.filter(**{f"{prefixo}cpf_cnpj__contains": cpf_cnpj})
+    return qs
+
+
+def ordenar_por_similaridade(qs, nome, prefixo="cliente__"):
+    """
+    No PostgreSQL, anota `similaridade` (pg_trgm) com o termo e ordena pelos
+    mais parecidos, mantendo a ordenação original como desempate.
+    No SQLite devolve o queryset como está.
+    """
+    nome = termo_razao_social(nome)
+    if not nome or not usa_trigram(qs):
+        return qs
+
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    ordenacao = list(qs.query.order_by or qs.model._meta.ordering)
+    return qs.annotate(
+        similaridade=TrigramSimilarity(f"{prefixo}razao_social", nome)
+    ).order_by("-similaridade", *ordenacao)
+
@@ -0,0 +1,95 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from core.models import Local, Video
+from core.services import ocupacao
+
+# Capacidade das telas: Local.capacidade_segundos é a duração máxima do loop.
+#
+# A carga de cada tela é o que já está no ar hoje (índice de ocupação) mais os
+# vídeos vendidos que ainda não subiram (OFF, contrato não cancelado). Ela fica
+# em cache (CACHE_CARGA_TELAS_SEGUNDOS) junto com nome e capacidade, então os
+# formulários de vídeo não somam a tabela de vídeos a cada post; os sinais de
+# Video, Local e Contrato apagam a chave depois do commit e trocam a versão
+# usada na chave do fragmento de locais do detalhe do contrato. Com cache
+# local (LocMem) a invalidação não chega aos outros workers: a validade é curta.
+
+CHAVE_CARGA = "telas:carga"
+CHAVE_VERSAO = "telas:carga:versao"
+
+
+def tempo_cache():
+    return getattr(settings, "CACHE_CARGA_TELAS_SEGUNDOS", 300)
+
+
+def _calcular():
+    no_ar = ocupacao.ocupacao_no_dia(timezone.localdate())
+    pendentes = (
+        Video.objects.filter(status=False, contrato__data_cancelamento_contrato__isnull=True)
+        .order_by()
+        .values("local_id")
+        .annotate(total=Sum("tempo_video"))
+        .values_list("local_id", "total")
+    )
+    carga = {local_id: ocupacao.segundos_do_video(total) for local_id, total in pendentes}
+    for local_id, segundos in no_ar.items():
+        carga[local_id] = carga.get(local_id, 0) + segundos
+
+    return {
+        pk: {"id": pk, "nome": nome, "capacidade": capacidade, "carga": carga.get(pk, 0)}
+        for pk, nome, capacidade in Local.objects.order_by("nome").values_list("id", "nome", "capacidade_segundos")
+    }
+
+
+def carga_das_telas():
+    """{local_id: {id, nome, capacidade, carga}} (do cache)."""
+    return cache.get_or_set(CHAVE_CARGA, _calcular, tempo_cache())
+
+
+def versao():
+    return cache.get_or_set(CHAVE_VERSAO, time.time_ns, timeout=None)
+
+
+def invalidar():
+    cache.delete(CHAVE_CARGA)
+    cache.set(CHAVE_VERSAO, time.time_ns(), timeout=None)
+
+
+def restante(tela):
+    if tela is None or tela["capacidade"] is None:
+        return None
+    return tela["capacidade"] - tela["carga"]
+
+
+def telas():
+    """Telas em ordem de nome com o restante (None = sem limite), para os templates."""
+    return [dict(tela, restante=restante(tela)) for tela in carga_das_telas().values()]
+
+
+def rotulo(tela):
+    sobra = restante(tela)
+    if sobra is None:
+        return tela["nome"]
+    if sobra <= 0:
+        return f"{tela['nome']} (lotada)"
+    return f"{tela['nome']} (restam {sobra}s)"
+
+
+def excedentes(acrescimos):
+    """
+    Mensagens para as telas que não comportam os segundos pedidos
+    ({local_id: segundos}); lista vazia se tudo cabe.
+    """
+    telas_por_id = carga_das_telas()
+    erros = []
+    for local_id, pedido in acrescimos.items():
+        tela = telas_por_id.get(local_id)
+        sobra = restante(tela)
+        if pedido > 0 and sobra is not None and pedido > sobra:
+            erros.append(
+                f"{tela['nome']}: {pedido}s pedidos, mas restam {max(sobra, 0)}s "
+                f"do loop de {tela['capacidade']}s."
+            )
+    return erros
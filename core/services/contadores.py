@@ -0,0 +1,77 @@
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, When
+from core.models import ContadorPendencia, Contrato, Video
+
+# Contadores das filas de pendência (badges da navegação).
+#
+# As mesmas regras de pendencias_video / pendencias_pagamento, avaliadas por
+# contrato: os sinais comparam o estado antes/depois de cada gravação e somam
+# só a diferença (+1/-1) no contador, sem refazer a contagem da tabela toda.
+
+
+def filtro_cobranca_pendente():
+    return Q(cobranca_gerada=False)
+
+
+def filtro_pagamento_pendente():
+    return Q(cobranca_gerada=True) & (Q(primeiro_pagamento__isnull=True) | Q(segundo_pagamento__isnull=True))
+
+
+def filtro_video_pendente():
+    # já pagou a primeira parcela e tem pelo menos um vídeo OFF
+    return Q(primeiro_pagamento__isnull=False) & Exists(
+        Video.objects.filter(contrato=OuterRef("pk"), status=False)
+    )
+
+
+def pendencias_do_contrato(contrato):
+    """Flags de cobrança/pagamento de uma instância (sem consultar o banco)."""
+    cobranca = not contrato.cobranca_gerada
+    pagamento = contrato.cobranca_gerada and (not contrato.primeiro_pagamento or not contrato.segundo_pagamento)
+    return {ContadorPendencia.COBRANCA: cobranca, ContadorPendencia.PAGAMENTO: bool(pagamento)}
+
+
+def contratos_com_video_pendente(contrato_ids):
+    return set(
+        Contrato.objects.filter(filtro_video_pendente(), pk__in=contrato_ids).values_list("pk", flat=True)
+    )
+
+
+def contar_pendencias():
+    """As três contagens em uma única query."""
+    return Contrato.objects.aggregate(
+        **{
+            ContadorPendencia.VIDEO: Count("pk", filter=filtro_video_pendente()),
+            ContadorPendencia.COBRANCA: Count("pk", filter=filtro_cobranca_pendente()),
+            ContadorPendencia.PAGAMENTO: Count("pk", filter=filtro_pagamento_pendente()),
+        }
+    )
+
+
+def recalcular_contadores():
+    contagens = contar_pendencias()
+    for chave, valor in contagens.items():
+        ContadorPendencia.objects.update_or_create(chave=chave, defaults={"valor": valor})
+    return contagens
+
+
+def aplicar_deltas(deltas):
+    """Soma {chave: delta} nos contadores com um único UPDATE."""
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    atualizados = ContadorPendencia.objects.filter(chave__in=deltas).update(
+        valor=Case(*(When(chave=chave, then=F("valor") + delta) for chave, delta in deltas.items()))
+    )
+    if atualizados < len(deltas):
+        # algum contador ainda não existe: conta do zero (o delta já está refletido no banco)
+        recalcular_contadores()
+
+
+def aplicar_delta(chave, delta):
+    aplicar_deltas({chave: delta})
+
+
+def ler_contadores():
+    contadores = dict.fromkeys((chave for chave, _ in ContadorPendencia.CHAVES), 0)
+    contadores.update(ContadorPendencia.objects.values_list("chave", "valor"))
+    return contadores
@@ -0,0 +1,95 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from core.models import (
+    Banco, Cliente, Contrato, FormaPagamento, Local, StatusContrato, Vendedor, Video,
+)
+from core.services.faturamento import recalcular_faturamento_mensal
+from core.services import autocomplete, capacidade, ocupacao
+from core.services.contadores import recalcular_contadores
+
+# Massa de dados sintética para benchmarks (benchmark_indices, testes de desempenho).
+# Usa bulk_create, então os sinais não rodam: os agregados derivados são
+# recalculados no final.
+
+
+def popular_base(contratos=10000, seed=42, lote=2000):
+    rnd = random.Random(seed)
+    hoje = date.today()
+
+    with transaction.atomic():
+        vendedores = Vendedor.objects.bulk_create([Vendedor(nome=f"VENDEDOR {i}") for i in range(10)])
+        bancos = Banco.objects.bulk_create([Banco(nome=f"BANCO {i}") for i in range(3)])
+        formas = FormaPagamento.objects.bulk_create(
+            [FormaPagamento(nome=nome) for nome in ("BOLETO", "PIX", "CARTAO", "TRANSFERENCIA")]
+        )
+        locais = Local.objects.bulk_create([Local(nome=f"TELAO {i}") for i in range(40)])
+        status_ativo, _ = StatusContrato.objects.get_or_create(nome_status="Ativo")
+
+        total_clientes = max(1, contratos // 3)
+        clientes = Cliente.objects.bulk_create(
+            [
+                Cliente(
+                    razao_social=f"CLIENTE {i:06d} {rnd.choice(['COMERCIO', 'SERVICOS', 'INDUSTRIA', 'LTDA'])}",
+                    cpf_cnpj=f"{rnd.randrange(10**13, 10**14)}",
+                    email=f"cliente{i}@exemplo.com",
+                    telefone=f"55{rnd.randrange(10**9, 10**10)}",
+                )
+                for i in range(total_clientes)
+            ],
+            batch_size=lote,
+        )
+
+        for inicio in range(0, contratos, lote):
+            novos = []
+            for _ in range(min(lote, contratos - inicio)):
+                assinatura = hoje - timedelta(days=rnd.randrange(0, 5 * 365))
+                cobranca = rnd.random() < 0.8
+                primeiro = assinatura + timedelta(days=30) if cobranca and rnd.random() < 0.7 else None
+                segundo = assinatura + timedelta(days=60) if primeiro and rnd.random() < 0.6 else None
+                vigencia = rnd.choice([6, 12, 24])
+                novos.append(
+                    Contrato(
+                        cliente=rnd.choice(clientes),
+                        vendedor=rnd.choice(vendedores),
+                        banco=rnd.choice(bancos),
+                        forma_pagamento=rnd.choice(formas),
+                        status=status_ativo,
+                        valor_mensalidade=Decimal(rnd.randrange(100, 5000)),
+                        vigencia_meses=vigencia,
+                        data_assinatura=assinatura,
+                        cobranca_gerada=cobranca,
+                        primeiro_pagamento=primeiro,
+                        segundo_pagamento=segundo,
+                        data_vencimento_contrato=(
+                            assinatura + timedelta(days=30 * vigencia) if primeiro else None
+                        ),
+                        data_cancelamento_contrato=(
+                            assinatura + timedelta(days=90) if rnd.random() < 0.05 else None
+                        ),
+                    )
+                )
+            criados = Contrato.objects.bulk_create(novos, batch_size=lote)
+
+            videos = []
+            for contrato in criados:
+                for _ in range(rnd.randint(0, 3)):
+                    ativo = contrato.primeiro_pagamento is not None and rnd.random() < 0.8
+                    videos.append(
+                        Video(
+                            contrato=contrato,
+                            local=rnd.choice(locais),
+                            tempo_video=timedelta(seconds=rnd.choice([10, 15, 30, 60])),
+                            status=ativo,
+                            data_subiu=contrato.primeiro_pagamento if ativo else None,
+                        )
+                    )
+            Video.objects.bulk_create(videos, batch_size=lote)
+
+    recalcular_faturamento_mensal()
+    recalcular_contadores()
+    ocupacao.reconstruir()
+    autocomplete.invalidar_indice()
+    capacidade.invalidar()
+    return contratos
@@ -2,106 +2,119 @@
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-from core.models import Contrato
-from django.db.models import Count, Avg
+from functools import reduce
+from operator import or_
+from django.db.models import Sum, Q
+from core.models import FaturamentoMensal
 from core.models import Vendedor
-from datetime import datetime
 
-def faturamento_ultimos_seis_meses(user, vendedor=None):
-    hoje = date.today()
+# Os números do dashboard vêm do rollup FaturamentoMensal (uma linha por
+# ano/mês/vendedor/forma de pagamento), que é mantido pelos sinais de Contrato.
+# Assim o custo de cada consulta não cresce com o histórico de contratos.
 
-    # cria lista de meses: 6 meses (do mais antigo -> mais recente)
-    months = []
-    for i in range(5, -1, -1):  # 5,4,3,2,1,0
-        dt = (hoje - relativedelta(months=i)).replace(day=1)
-        months.append((dt.year, dt.month))
 
-    valor_total_expr = ExpressionWrapper(
-        F("valor_mensalidade") * F("vigencia_meses"),
-        output_field=DecimalField(max_digits=12, decimal_places=2),
-    )
+def _meses_da_serie(meses, referencia=None):
+    """Primeiro dia de cada mês da série, do mais antigo para o mais recente."""
+    inicio_mes_atual = (referencia or date.today()).replace(day=1)
+    return [inicio_mes_atual - relativedelta(months=i) for i in range(meses - 1, -1, -1)]
+
 
-    resultados = []
-    for ano, mes in months:
-        contratos = Contrato.objects.filter(data_assinatura__year=ano, data_assinatura__month=mes)
+def _filtro_meses(meses):
+    return reduce(or_, (Q(ano=inicio.year, mes=inicio.month) for inicio in meses))
 
-        if vendedor:
-            contratos = contratos.filter(vendedor=vendedor)
 
-        total = contratos.aggregate(total=Sum(valor_total_expr))["total"] or Decimal("0")
-        resultados.append({
-            "ano": ano,
-            "mes": mes,
-            "faturamento_total": float(total)  # já converte pra float aqui
+def _agrupar_por_mes(qs, meses):
+    """
+    Uma única consulta agrupada por mês, retornando
+    {primeiro_dia_do_mes: {"contratos": n, "total": valor}}.
+    """
+    linhas = (
+        qs.filter(_filtro_meses(meses))
+        .values("ano", "mes")
+        .annotate(total_contratos=Sum("contratos"), total_valor=Sum("valor_total"))
+        .order_by()
+    )
+    return {
+        date(linha["ano"], linha["mes"], 1): {
+            "contratos": linha["total_contratos"] or 0,
+            "total": linha["total_valor"] or Decimal("0"),
+        }
+        for linha in linhas
+    }
+
+
+def _montar_serie(meses_serie, buckets):
+    # meses sem vendas entram zerados
+    serie = []
+    for inicio in meses_serie:
+        bucket = buckets.get(inicio, {"contratos": 0, "total": Decimal("0")})
+        serie.append({
+            "ano": inicio.year,
+            "mes": inicio.month,
+            "contratos": bucket["contratos"],
+            "faturamento_total": bucket["total"],
         })
+    return serie
 
-    return resultados
 
+def serie_faturamento(meses=6, vendedor_id=None, referencia=None):
+    """
+    Faturamento dos últimos `meses` meses (do mais antigo -> mais recente)
+    calculado em uma única consulta agrupada por mês.
+    """
+    meses_serie = _meses_da_serie(meses, referencia)
+    qs = FaturamentoMensal.objects.all()
+    if vendedor_id:
+        qs = qs.filter(vendedor_id=vendedor_id)
+    return _montar_serie(meses_serie, _agrupar_por_mes(qs, meses_serie))
 
-def get_dashboard_data(vendedor_id=None, mes=None):
-    qs = Contrato.objects.all()
-    # expressão para calcular valor_total (mensalidade * vigência)
-    valor_total_expr = ExpressionWrapper(
-        F("valor_mensalidade") * F("vigencia_meses"),
-        output_field=DecimalField(max_digits=12, decimal_places=2),
-    )
+
+def faturamento_ultimos_seis_meses(user, vendedor=None):
+    return [
+        {"ano": item["ano"], "mes": item["mes"], "faturamento_total": float(item["faturamento_total"])}  # já converte pra float aqui
+        for item in serie_faturamento(6, vendedor_id=getattr(vendedor, "pk", vendedor))
+    ]
+
+
+def get_dashboard_data(vendedor_id=None, mes=None, meses_serie=6):
+    qs = FaturamentoMensal.objects.all()
 
     # filtro por vendedor
     if vendedor_id:
         qs = qs.filter(vendedor_id=vendedor_id)
 
+    # série dos últimos meses (independente do filtro de mês, mas sempre pela data de assinatura)
+    meses = _meses_da_serie(meses_serie)
 
-    # filtro por mês (baseado em data de assinatura)
     if mes:
+        # filtro por mês (baseado em data de assinatura): o mês selecionado entra
+        # na mesma consulta agrupada da série, mesmo que esteja fora da janela
         ano, mes_num = map(int, mes.split("-"))
-        qs = qs.filter(data_assinatura__year=ano, data_assinatura__month=mes_num)
-
-    # aplicar o valor_total no queryset filtrado
-    qs = qs.annotate(valor_total=valor_total_expr)
-
-    # contratos vendidos
-    contratos_vendidos = qs.count()
-
-    # faturamento total
-    faturamento = qs.aggregate(total=Sum("valor_total"))["total"] or 0
+        inicio_mes = date(ano, mes_num, 1)
+        buckets = _agrupar_por_mes(qs, meses + [inicio_mes])
+
+        selecionado = buckets.get(inicio_mes, {"contratos": 0, "total": Decimal("0")})
+        contratos_vendidos = selecionado["contratos"]
+        faturamento = selecionado["total"]
+        qs_periodo = qs.filter(ano=ano, mes=mes_num)
+    else:
+        buckets = _agrupar_por_mes(qs, meses)
+        totais = qs.aggregate(contratos=Sum("contratos"), total=Sum("valor_total"))
+        contratos_vendidos = totais["contratos"] or 0
+        faturamento = totais["total"] or 0
+        qs_periodo = qs
 
     # ticket médio
-    ticket_medio = qs.aggregate(avg=Avg("valor_total"))["avg"] or 0
+    ticket_medio = faturamento / contratos_vendidos if contratos_vendidos else 0
 
     # métodos de pagamento
     metodos_pagamento = (
-        qs.values("forma_pagamento__nome")
-        .annotate(total=Count("id_contrato"))
+        qs_periodo.values("forma_pagamento__nome")
+        .annotate(total=Sum("contratos"))
+        .filter(total__gt=0)
         .order_by("-total")
     )
 
-    # faturamento últimos 6 meses (independente do filtro acima, mas sempre pela data de assinatura)
-    hoje = datetime.today()
-    seis_meses_atras = hoje - relativedelta(months=6)
-    faturamento_por_mes = []
-
-    for i in range(6):
-        # Ajuste para pegar a data correta do mês
-        data_inicio = (hoje - relativedelta(months=i)).replace(day=1)
-        mes = data_inicio.month
-        ano = data_inicio.year
-        # Filtragem por data e por tipo de usuário (vendedor, supervisor ou superusuário)
-        contratos = Contrato.objects.filter(
-            data_assinatura__month=mes,
-            data_assinatura__year=ano
-        )
-        if vendedor_id:
-            # Filtra os contratos do vendedor especificado
-            contratos = contratos.filter(vendedor=vendedor_id)
-        faturamento_total = contratos.aggregate(total=Sum(valor_total_expr))["total"] or 0
-
-        faturamento_por_mes.append({
-            'ano': ano,
-            'mes': mes,
-            'faturamento_total': faturamento_total
-        })
-
     # vendedores para o filtro
     vendedores = Vendedor.objects.all()
 
@@ -111,5 +124,5 @@ def get_dashboard_data(vendedor_id=None, mes=None):
         "ticket_medio": ticket_medio,
         "metodos_pagamento": list(metodos_pagamento),
         "vendedores": vendedores,
-        "faturamento_por_mes": list(reversed(faturamento_por_mes)),  # do mais antigo para o mais recente
-    }
\ No newline at end of file
+        "faturamento_por_mes": _montar_serie(meses, buckets),  # do mais antigo para o mais recente
+    }
@@ -0,0 +1,80 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from core.models import Contrato
+from core.services import capacidade
+
+# Página de detalhe do contrato: carregamento em poucas queries + versões usadas
+# nas chaves dos fragmentos {% cache %} de contrato_detail.html.
+#
+# Cada contrato tem uma versão no cache; os sinais de Video, DocumentoContrato e
+# Registro trocam essa versão e os fragmentos antigos simplesmente deixam de ser
+# lidos (expiram sozinhos). A versão é um timestamp e não um contador, para que
+# uma versão perdida (eviction) nunca volte a apontar para um fragmento antigo.
+# Com cache local (LocMem) a troca não chega aos outros workers, por isso os
+# fragmentos têm validade curta (CACHE_DETALHE_SEGUNDOS).
+
+CHAVE_VERSAO_CONTRATO = "contrato_detalhe:{}:versao"
+CHAVE_VERSAO_LOCAIS = "contrato_detalhe:locais:versao"
+
+
+def tempo_cache():
+    return getattr(settings, "CACHE_DETALHE_SEGUNDOS", 300)
+
+
+def _versao(chave):
+    return cache.get_or_set(chave, time.time_ns, timeout=None)
+
+
+def versao_contrato(contrato_id):
+    return _versao(CHAVE_VERSAO_CONTRATO.format(contrato_id))
+
+
+def versao_locais():
+    return _versao(CHAVE_VERSAO_LOCAIS)
+
+
+def invalidar_contrato(contrato_id):
+    cache.set(CHAVE_VERSAO_CONTRATO.format(contrato_id), time.time_ns(), timeout=None)
+
+
+def invalidar_contratos(contrato_ids):
+    agora = time.time_ns()
+    cache.set_many({CHAVE_VERSAO_CONTRATO.format(pk): agora for pk in contrato_ids}, timeout=None)
+
+
+def invalidar_locais():
+    cache.set(CHAVE_VERSAO_LOCAIS, time.time_ns(), timeout=None)
+
+
+def carregar_detalhe(pk):
+    """
+    Contrato com cliente/vendedor/forma/status em uma query e todos os vídeos
+    (com o local) em outra, separados em ativos/pendentes aqui. Documentos,
+    registros e locais (com a capacidade restante de cada tela) ficam
+    preguiçosos: só são consultados quando o fragmento correspondente não está
+    no cache.
+    """
+    contrato = get_object_or_404(
+        Contrato.objects.select_related("cliente", "vendedor", "forma_pagamento", "status"), pk=pk
+    )
+    videos = list(contrato.videos.select_related("local").order_by("id"))
+    videos_pendentes = [v for v in videos if not v.status]
+    videos_ativos = [v for v in videos if v.status]
+
+    return {
+        "contrato": contrato,
+        "videos": videos,
+        "videos_pendentes": videos_pendentes,
+        "videos_ativos": videos_ativos,
+        "tem_video_pendente": bool(videos_pendentes),
+        "documentos": contrato.documentos.order_by("id"),
+        "registros": contrato.registros.select_related("created_by").order_by("id"),
+        # chamado pelo template só quando o fragmento não está no cache
+        "locais": capacidade.telas,
+        "versao_detalhe": versao_contrato(contrato.pk),
+        "versao_locais": versao_locais(),
+        "versao_carga": capacidade.versao(),
+        "tempo_cache": tempo_cache(),
+    }
@@ -0,0 +1,90 @@
+from collections import namedtuple
+from django.db import transaction
+from core.models import BloqueioArquivo, DocumentoContrato
+from core.storage import ArmazenamentoPorConteudo, armazenamento_documentos
+
+# Documentos dos contratos no storage endereçado pelo conteúdo
+# (core/storage.py): vários DocumentoContrato podem apontar para o mesmo
+# arquivo, então a contagem de referências é a dos registros com aquele nome
+# (arquivo tem índice). Os sinais de DocumentoContrato chamam liberar_arquivo
+# depois do commit quando um registro é excluído ou troca de arquivo.
+#
+# Contar e apagar não é atômico: um upload do mesmo conteúdo pode achar o
+# arquivo entre a contagem e o delete. Por isso quem apaga e quem referencia
+# travam o mesmo BloqueioArquivo e só decidem depois de ter o bloqueio.
+
+TAMANHO_LOTE = 500
+
+ResultadoDeduplicacao = namedtuple("ResultadoDeduplicacao", "documentos migrados ausentes removidos")
+
+
+def referencias(nome):
+    return DocumentoContrato.objects.filter(arquivo=nome).count()
+
+
+def liberar_arquivo(nome, storage=armazenamento_documentos):
+    """Apaga o arquivo se nenhum documento o referencia mais; devolve se apagou."""
+    if not nome:
+        return False
+    with transaction.atomic():
+        bloqueio = BloqueioArquivo.bloquear(nome)
+        if referencias(nome):
+            return False
+        storage.delete(nome)
+        bloqueio.delete()
+    return True
+
+
+def _no_formato_do_storage(nome):
+    return nome.startswith(f"{ArmazenamentoPorConteudo.PASTA}/")
+
+
+def deduplicar(tamanho_lote=TAMANHO_LOTE, simular=False):
+    """
+    Passa os arquivos gravados antes do storage por conteúdo (contratos/contrato_<id>/...)
+    para ele, em lotes por PK: cada arquivo é lido uma vez, as cópias passam a
+    apontar para o mesmo nome e os arquivos antigos sem referência são apagados.
+    """
+    storage = armazenamento_documentos
+    documentos = migrados = ausentes = removidos = 0
+    ultimo = 0
+    while True:
+        lote = list(
+            DocumentoContrato.objects.filter(pk__gt=ultimo).order_by("pk").only("pk", "arquivo", "nome_original")[:tamanho_lote]
+        )
+        if not lote:
+            return ResultadoDeduplicacao(documentos, migrados, ausentes, removidos)
+        ultimo = lote[-1].pk
+        documentos += len(lote)
+
+        novos = {}  # nome antigo -> nome por conteúdo (cópias do mesmo arquivo no lote)
+        alterados = []
+        for documento in lote:
+            antigo = documento.arquivo.name
+            if not antigo or _no_formato_do_storage(antigo):
+                continue
+            if antigo not in novos:
+                if not storage.exists(antigo):
+                    ausentes += 1
+                    continue
+                if simular:
+                    novos[antigo] = antigo
+                else:
+                    with storage.open(antigo, "rb") as arquivo:
+                        novos[antigo] = storage.save(antigo, arquivo)
+            documento.nome_original = documento.nome_original or antigo.rsplit("/", 1)[-1]
+            documento.arquivo.name = novos[antigo]
+            alterados.append(documento)
+        migrados += len(alterados)
+        if simular or not alterados:
+            continue
+
+        with transaction.atomic():
+            for antigo, novo in novos.items():
+                # o arquivo novo pode ter sido liberado depois do save(): grava de novo
+                BloqueioArquivo.bloquear(novo)
+                if not storage.exists(novo):
+                    with storage.open(antigo, "rb") as arquivo:
+                        storage.save(antigo, arquivo)
+            DocumentoContrato.objects.bulk_update(alterados, ["arquivo", "nome_original"])
+        removidos += sum(liberar_arquivo(antigo, storage) for antigo in novos)
@@ -0,0 +1,227 @@
+import csv
+import tempfile
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from openpyxl import Workbook
+from core.models import Contrato, ExportacaoContratos
+from core.services.filtros import filtrar_contratos
+from core.services.busca import ordenar_por_similaridade
+
+# Mesma ordem de colunas do relatório original (e do layout de importação)
+COLUNAS = [
+    "ID Contrato",
+    "Cliente",
+    "CPF/CNPJ",
+    "Email Cliente",
+    "Telefone Cliente",
+    "Telefone Financeiro",
+    "Email Financeiro",
+    "Vendedor",
+    "Banco",
+    "Cobrança Gerada",
+    "Primeiro Pagamento",
+    "Segundo Pagamento",
+    "Data Assinatura",
+    "Data Vencimento Contrato",
+    "Data Cancelamento",
+    "Data Vencimento 1ª Parcela",
+    "Data Última Parcela",
+    "Valor Mensalidade",
+    "Vigência (meses)",
+    "Valor Total",
+    "Forma de Pagamento",
+    "Status Contrato",
+    "Telões",
+    "Status Vídeos",
+    "Tempo Vídeos",
+    "Datas Subida Vídeos",
+    "Observações",
+]
+
+TAMANHO_LOTE = 500
+
+
+def _data(valor):
+    return valor.strftime("%d/%m/%Y") if valor else ""
+
+
+def contratos_para_exportacao(params):
+    qs = Contrato.objects.select_related(
+        "cliente", "vendedor", "forma_pagamento", "status", "banco"
+    ).prefetch_related("videos__local")
+    qs = filtrar_contratos(qs, params)
+    # buscando por nome, os clientes mais parecidos com o termo vêm primeiro
+    return ordenar_por_similaridade(qs, params.get("nome"))
+
+
+def linha_contrato(contrato):
+    videos = contrato.videos.all()
+    locais = ", ".join([v.local.nome for v in videos if v.local])
+    status_videos = ", ".join(["ON" if v.status else "OFF" for v in videos]) or "Sem vídeo"
+    tempos_videos = ", ".join([str(v.tempo_video) for v in videos])
+    datas_subida = ", ".join([v.data_subiu.strftime("%d/%m/%Y") for v in videos if v.data_subiu])
+    cliente = contrato.cliente
+
+    return [
+        contrato.id_contrato,
+        cliente.razao_social,
+        cliente.cpf_cnpj,
+        cliente.email,
+        cliente.telefone,
+        cliente.telefone_financeiro,
+        cliente.email_financeiro,
+        contrato.vendedor.nome if contrato.vendedor else "",
+        contrato.banco.nome if contrato.banco else "",
+        "Sim" if contrato.cobranca_gerada else "Não",
+        _data(contrato.primeiro_pagamento),
+        _data(contrato.segundo_pagamento),
+        _data(contrato.data_assinatura),
+        _data(contrato.data_vencimento_contrato),
+        _data(contrato.data_cancelamento_contrato),
+        _data(contrato.data_vencimento_primeira_parcela),
+        _data(contrato.data_ultima_parcela),
+        contrato.valor_mensalidade,
+        contrato.vigencia_meses,
+        contrato.valor_total,
+        contrato.forma_pagamento.nome if contrato.forma_pagamento else "",
+        contrato.status.nome_status if contrato.status else "",
+        locais or "Sem local",
+        status_videos,
+        tempos_videos,
+        datas_subida,
+        contrato.observacoes or "",
+    ]
+
+
+def linhas_contratos(qs, tamanho_lote=TAMANHO_LOTE):
+    """
+    Percorre o queryset em lotes (o prefetch dos vídeos é feito por lote),
+    sem carregar todos os contratos na memória.
+    """
+    for contrato in qs.iterator(chunk_size=tamanho_lote):
+        yield linha_contrato(contrato)
+
+
+def escrever_xlsx(destino, linhas):
+    """Grava as linhas em um .xlsx usando o modo write-only do openpyxl."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Contratos")
+    ws.append(COLUNAS)
+    for linha in linhas:
+        ws.append(linha)
+    wb.save(destino)
+
+
+class _Eco:
+    """Pseudo-buffer: o csv.writer devolve a linha em vez de acumulá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    # BOM + ";" para o Excel em pt-BR abrir o arquivo corretamente
+    writer = csv.writer(_Eco(), delimiter=";")
+    yield "\ufeff" + writer.writerow(COLUNAS)
+    for linha in linhas:
+        yield writer.writerow(linha)
+
+
+# ----- Jobs de exportação em segundo plano -----
+
+FILTROS_EXPORTACAO = ["nome", "cnpj", "vendedor", "local", "data_inicio", "data_fim"]
+
+
+def enfileirar_exportacao(params, formato, usuario):
+    filtros = {campo: params.get(campo) for campo in FILTROS_EXPORTACAO if params.get(campo)}
+    return ExportacaoContratos.objects.create(
+        filtros=filtros,
+        formato="csv" if formato == "csv" else "xlsx",
+        created_by=usuario,
+        updated_by=usuario,
+    )
+
+
+def devolver_exportacoes_travadas():
+    """
+    Devolve para a fila os jobs em processamento sem sinal de vida (updated_at,
+    tocado a cada lote) há EXPORTACAO_TRAVADA_MINUTOS: o worker que os
+    reservou morreu no meio.
+    """
+    limite = timezone.now() - timedelta(minutes=settings.EXPORTACAO_TRAVADA_MINUTOS)
+    return ExportacaoContratos.objects.filter(
+        status=ExportacaoContratos.PROCESSANDO, updated_at__lt=limite
+    ).update(status=ExportacaoContratos.PENDENTE, iniciado_em=None, total=0, processados=0)
+
+
+def limpar_exportacoes_antigas():
+    """Apaga os arquivos das exportações concluídas há EXPORTACAO_RETENCAO_DIAS; devolve quantos."""
+    limite = timezone.now() - timedelta(days=settings.EXPORTACAO_RETENCAO_DIAS)
+    antigas = list(
+        ExportacaoContratos.objects.filter(concluido_em__lt=limite).exclude(arquivo="").exclude(arquivo__isnull=True)
+        .only("pk", "arquivo")
+    )
+    for job in antigas:
+        job.arquivo.delete(save=False)
+    ExportacaoContratos.objects.filter(pk__in=[job.pk for job in antigas]).update(arquivo="")
+    return len(antigas)
+
+
+def reservar_proxima_exportacao():
+    """
+    Pega a exportação pendente mais antiga (depois de devolver à fila as
+    travadas). O UPDATE condicional garante que só um worker fica com o job,
+    mesmo com vários rodando ao mesmo tempo.
+    """
+    devolver_exportacoes_travadas()
+    pendentes = ExportacaoContratos.objects.filter(status=ExportacaoContratos.PENDENTE).order_by("created_at")
+    for job_id in pendentes.values_list("id", flat=True)[:10]:
+        reservado = ExportacaoContratos.objects.filter(
+            id=job_id, status=ExportacaoContratos.PENDENTE
+        ).update(status=ExportacaoContratos.PROCESSANDO, iniciado_em=timezone.now(), updated_at=timezone.now())
+        if reservado:
+            return ExportacaoContratos.objects.get(id=job_id)
+    return None
+
+
+def _com_progresso(job, linhas, a_cada=TAMANHO_LOTE):
+    processados = 0
+    for linha in linhas:
+        yield linha
+        processados += 1
+        if processados % a_cada == 0:
+            # updated_at é o sinal de vida do job (ver devolver_exportacoes_travadas)
+            ExportacaoContratos.objects.filter(id=job.id).update(processados=processados, updated_at=timezone.now())
+    job.processados = processados
+
+
+def processar_exportacao(job):
+    """Gera o arquivo do job em MEDIA, atualizando o progresso a cada lote."""
+    try:
+        qs = contratos_para_exportacao(job.filtros)
+        job.total = qs.count()
+        ExportacaoContratos.objects.filter(id=job.id).update(total=job.total, updated_at=timezone.now())
+
+        linhas = _com_progresso(job, linhas_contratos(qs))
+        with tempfile.TemporaryFile() as arquivo:
+            if job.formato == "csv":
+                for trecho in gerar_csv(linhas):
+                    arquivo.write(trecho.encode("utf-8"))
+            else:
+                escrever_xlsx(arquivo, linhas)
+            arquivo.seek(0)
+
+            nome = f"contratos_{job.id}_{timezone.now():%Y%m%d_%H%M%S}.{job.formato}"
+            job.arquivo.save(nome, File(arquivo), save=False)
+
+        job.status = ExportacaoContratos.CONCLUIDA
+    except Exception:
+        job.status = ExportacaoContratos.ERRO
+        job.erro = traceback.format_exc()
+
+    job.concluido_em = timezone.now()
+    job.save()
+    return job
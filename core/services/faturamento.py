@@ -0,0 +1,83 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, F, ExpressionWrapper, DecimalField
+from django.db.models.functions import ExtractYear, ExtractMonth
+from core.models import Contrato, FaturamentoMensal
+
+
+def chave_faturamento(contrato):
+    """Chave do rollup (ano, mês, vendedor, forma de pagamento) de um contrato."""
+    return (
+        contrato.data_assinatura.year,
+        contrato.data_assinatura.month,
+        contrato.vendedor_id,
+        contrato.forma_pagamento_id,
+    )
+
+
+def valor_faturamento(contrato):
+    return (contrato.valor_mensalidade or Decimal("0")) * (contrato.vigencia_meses or 0)
+
+
+def aplicar_delta(chave, contratos, valor):
+    """Soma (ou subtrai, com valores negativos) um delta na linha do rollup."""
+    if not contratos and not valor:
+        return
+
+    ano, mes, vendedor_id, forma_pagamento_id = chave
+    linha = FaturamentoMensal.objects.filter(
+        ano=ano,
+        mes=mes,
+        vendedor_id=vendedor_id,
+        forma_pagamento_id=forma_pagamento_id,
+    )
+    campos = {"contratos": F("contratos") + contratos, "valor_total": F("valor_total") + valor}
+    if linha.update(**campos):
+        return
+    try:
+        # savepoint: se outra gravação criou a mesma chave entre o UPDATE e o
+        # INSERT, a constraint única recusa e o delta vai para a linha dela
+        with transaction.atomic():
+            FaturamentoMensal.objects.create(
+                ano=ano,
+                mes=mes,
+                vendedor_id=vendedor_id,
+                forma_pagamento_id=forma_pagamento_id,
+                contratos=contratos,
+                valor_total=valor,
+            )
+    except IntegrityError:
+        linha.update(**campos)
+
+
+def recalcular_faturamento_mensal():
+    """Reconstrói o rollup inteiro a partir da tabela de contratos."""
+    valor_total_expr = ExpressionWrapper(
+        F("valor_mensalidade") * F("vigencia_meses"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    linhas = (
+        Contrato.objects
+        .annotate(ano=ExtractYear("data_assinatura"), mes=ExtractMonth("data_assinatura"))
+        .values("ano", "mes", "vendedor_id", "forma_pagamento_id")
+        .annotate(total_contratos=Count("id_contrato"), total_valor=Sum(valor_total_expr))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        FaturamentoMensal.objects.all().delete()
+        FaturamentoMensal.objects.bulk_create(
+            [
+                FaturamentoMensal(
+                    ano=linha["ano"],
+                    mes=linha["mes"],
+                    vendedor_id=linha["vendedor_id"],
+                    forma_pagamento_id=linha["forma_pagamento_id"],
+                    contratos=linha["total_contratos"],
+                    valor_total=linha["total_valor"] or 0,
+                )
+                for linha in linhas
+            ],
+            batch_size=1000,
+        )
+    return FaturamentoMensal.objects.count()
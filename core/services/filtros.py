@@ -0,0 +1,40 @@
+from datetime import datetime
+from core.models import Video
+from core.services.busca import filtrar_por_cliente
+
+
+def _data_ou_none(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def filtrar_contratos(contratos, params):
+    """
+    Aplica os filtros da lista de contratos (mesmos parâmetros do formulário
+    partials/filtros_contratos.html) a um queryset de Contrato.
+    `params` pode ser o request.GET ou um dict simples.
+    """
+    nome = (params.get("nome") or "").strip()
+    cnpj = (params.get("cnpj") or "").strip()
+    vendedor = (params.get("vendedor") or "").strip()
+    local = (params.get("local") or "").strip()
+    data_inicio = _data_ou_none((params.get("data_inicio") or "").strip())
+    data_fim = _data_ou_none((params.get("data_fim") or "").strip())
+
+    # nome/CPF-CNPJ: busca normalizada, indexada por pg_trgm no PostgreSQL
+    contratos = filtrar_por_cliente(contratos, nome=nome, cpf_cnpj=cnpj)
+    if vendedor:
+        contratos = contratos.filter(vendedor_id=vendedor)
+    if local:
+        # subquery em vez de join: não duplica linhas (sem distinct) nem interfere em anotações sobre vídeos
+        contratos = contratos.filter(id_contrato__in=Video.objects.filter(local_id=local).values("contrato_id"))
+
+    # Datas inválidas são ignoradas
+    if data_inicio:
+        contratos = contratos.filter(data_assinatura__gte=data_inicio)
+    if data_fim:
+        contratos = contratos.filter(data_assinatura__lte=data_fim)
+
+    return contratos
@@ -0,0 +1,405 @@
+import csv
+import io
+import tempfile
+import traceback
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import islice
+from dateutil.relativedelta import relativedelta
+from django import forms
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from core.forms import ClienteForm, ContratoImportacaoForm
+from core.models import (
+    Banco, Cliente, Contrato, FormaPagamento, ImportacaoContratos, Local, StatusContrato, Vendedor, Video,
+    normalizar_texto, somente_digitos,
+)
+from core.services import autocomplete, capacidade, manifestos, ocupacao
+from core.services.contadores import recalcular_contadores
+from core.services.exportacao import COLUNAS
+from core.services.faturamento import recalcular_faturamento_mensal
+from core.services.videos import vencimento_pelo_video
+
+# Importação de contratos a partir de uma planilha no layout da exportação
+# (COLUNAS em core/services/exportacao.py), em xlsx ou CSV.
+#
+# Cada linha é validada com as regras do ClienteForm/ContratoForm; as válidas
+# são gravadas em lotes (uma transação por lote) com bulk_create de Cliente,
+# Contrato e Video. Clientes são deduplicados pelo CPF/CNPJ (só dígitos),
+# reaproveitando os já cadastrados. As linhas com erro vão para um relatório
+# CSV com o motivo e os dados originais, que pode ser corrigido e reimportado.
+
+TAMANHO_LOTE = 1000
+
+OBRIGATORIAS = ["Cliente", "CPF/CNPJ", "Email Cliente", "Vendedor", "Valor Mensalidade", "Forma de Pagamento"]
+SEM_VIDEO = {"", "SEM LOCAL", "SEM VIDEO"}
+
+LinhaValida = namedtuple("LinhaValida", "numero cpf cliente contrato videos")
+
+
+class ArquivoImportacaoInvalido(ValueError):
+    pass
+
+
+# ----- leitura -----
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _linhas_xlsx(arquivo):
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        primeira = texto.readline()
+        delimitador = ";" if primeira.count(";") >= primeira.count(",") else ","
+        yield next(csv.reader([primeira], delimiter=delimitador))
+        yield from csv.reader(texto, delimiter=delimitador)
+    finally:
+        texto.detach()  # o arquivo é fechado por quem o abriu, não pelo wrapper
+
+
+def ler_planilha(arquivo, nome):
+    """Gera (número da linha, {coluna: texto}) sem carregar a planilha inteira."""
+    linhas = _linhas_xlsx(arquivo) if nome.lower().endswith(".xlsx") else _linhas_csv(arquivo)
+    try:
+        cabecalho = [_texto(c) for c in next(linhas)]
+    except StopIteration:
+        raise ArquivoImportacaoInvalido("Planilha vazia.")
+    faltando = [coluna for coluna in OBRIGATORIAS if coluna not in cabecalho]
+    if faltando:
+        raise ArquivoImportacaoInvalido("Colunas obrigatórias ausentes: " + ", ".join(faltando))
+
+    for numero, valores in enumerate(linhas, start=2):
+        linha = {coluna: _texto(valor) for coluna, valor in zip(cabecalho, valores) if coluna}
+        if any(linha.values()):
+            yield numero, linha
+
+
+# ----- validação -----
+
+def _data_iso(texto):
+    # a exportação grava dd/mm/aaaa; o xlsx pode trazer a data já convertida
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            continue
+    return texto
+
+
+def _decimal(texto):
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return texto.replace("R$", "").strip()
+
+
+def _lista(texto):
+    return [item.strip() for item in texto.split(",")] if texto.strip().upper() not in SEM_VIDEO else []
+
+
+class Cadastros:
+    """Vendedores, bancos, formas de pagamento, locais e status carregados uma vez, por nome."""
+
+    def __init__(self):
+        self.vendedores = self._por_nome(Vendedor.objects.all(), "nome")
+        self.bancos = self._por_nome(Banco.objects.all(), "nome")
+        self.formas = self._por_nome(FormaPagamento.objects.all(), "nome")
+        self.locais = self._por_nome(Local.objects.all(), "nome")
+        self.status = self._por_nome(StatusContrato.objects.all(), "nome_status")
+
+    @staticmethod
+    def _por_nome(qs, campo):
+        return {normalizar_texto(getattr(obj, campo)): obj for obj in qs}
+
+    def status_por_nome(self, nome, usuario):
+        # status desconhecido é criado (como o "Ativo" do cadastro manual)
+        nome = nome or "Ativo"
+        chave = normalizar_texto(nome)
+        if chave not in self.status:
+            self.status[chave], _ = StatusContrato.objects.get_or_create(
+                nome_status=nome, defaults={"created_by": usuario, "updated_by": usuario}
+            )
+        return self.status[chave]
+
+
+def _erros_do_form(form):
+    return [f"{form.fields[campo].label or campo if campo in form.fields else campo}: {' '.join(msgs)}"
+            for campo, msgs in form.errors.items()]
+
+
+def _por_nome(cadastro, nome, descricao, erros, obrigatorio=False):
+    if not nome:
+        if obrigatorio:
+            erros.append(f"{descricao}: campo obrigatório.")
+        return None
+    obj = cadastro.get(normalizar_texto(nome))
+    if obj is None:
+        erros.append(f"{descricao} não cadastrado: {nome}")
+    return obj
+
+
+def _videos(linha, cadastros, erros):
+    locais = _lista(linha.get("Telões", ""))
+    status = _lista(linha.get("Status Vídeos", ""))
+    tempos = _lista(linha.get("Tempo Vídeos", ""))
+    datas = _lista(linha.get("Datas Subida Vídeos", ""))
+    if not locais:
+        return []
+    if len(status) not in (0, len(locais)) or len(tempos) not in (0, len(locais)):
+        erros.append("Vídeos: Telões, Status Vídeos e Tempo Vídeos devem ter a mesma quantidade de itens.")
+        return []
+
+    campo_tempo = forms.DurationField()
+    videos = []
+    datas = iter(datas)  # a exportação só lista as datas dos vídeos que já subiram (ON)
+    for i, nome_local in enumerate(locais):
+        local = _por_nome(cadastros.locais, nome_local, "Local", erros, obrigatorio=True)
+        try:
+            tempo = campo_tempo.clean(tempos[i] if tempos else "0:00:10")
+        except forms.ValidationError as exc:
+            erros.append(f"Tempo do vídeo {i + 1}: {' '.join(exc.messages)}")
+            continue
+        ativo = bool(status) and status[i].upper() == "ON"
+        data_subiu = None
+        if ativo:
+            try:
+                data_subiu = date.fromisoformat(_data_iso(next(datas, "")))
+            except ValueError:
+                erros.append(f"Vídeo {i + 1} está ON sem uma data de subida válida.")
+                continue
+        videos.append(Video(local=local, tempo_video=tempo, status=ativo, data_subiu=data_subiu))
+    return videos
+
+
+def validar_linha(numero, linha, cadastros, usuario):
+    """Devolve (LinhaValida, []) ou (None, [erros])."""
+    erros = []
+    cliente_form = ClienteForm({
+        "razao_social": linha.get("Cliente", ""),
+        "cpf_cnpj": linha.get("CPF/CNPJ", ""),
+        "email": linha.get("Email Cliente", ""),
+        "telefone": linha.get("Telefone Cliente", ""),
+        "telefone_financeiro": linha.get("Telefone Financeiro", ""),
+        "email_financeiro": linha.get("Email Financeiro", ""),
+    })
+    contrato_form = ContratoImportacaoForm({
+        "primeiro_pagamento": _data_iso(linha.get("Primeiro Pagamento", "")),
+        "segundo_pagamento": _data_iso(linha.get("Segundo Pagamento", "")),
+        "vigencia_meses": linha.get("Vigência (meses)") or "12",
+        "valor_mensalidade": _decimal(linha.get("Valor Mensalidade", "")),
+        "data_assinatura": _data_iso(linha.get("Data Assinatura", "")),
+        "data_vencimento_contrato": _data_iso(linha.get("Data Vencimento Contrato", "")),
+        "data_vencimento_primeira_parcela": _data_iso(linha.get("Data Vencimento 1ª Parcela", "")),
+        "data_ultima_parcela": _data_iso(linha.get("Data Última Parcela", "")),
+        "observacoes": linha.get("Observações", ""),
+    })
+    if not cliente_form.is_valid():
+        erros.extend(_erros_do_form(cliente_form))
+    if not contrato_form.is_valid():
+        erros.extend(_erros_do_form(contrato_form))
+
+    vendedor = _por_nome(cadastros.vendedores, linha.get("Vendedor"), "Vendedor", erros, obrigatorio=True)
+    banco = _por_nome(cadastros.bancos, linha.get("Banco"), "Banco", erros)
+    forma = _por_nome(cadastros.formas, linha.get("Forma de Pagamento"), "Forma de Pagamento", erros,
+                      obrigatorio=True)
+    cancelamento = _data_iso(linha.get("Data Cancelamento", ""))
+    if cancelamento:
+        try:
+            cancelamento = date.fromisoformat(cancelamento)
+        except ValueError:
+            erros.append(f"Data Cancelamento inválida: {cancelamento}")
+    videos = _videos(linha, cadastros, erros)
+    if erros:
+        return None, erros
+
+    cliente = cliente_form.save(commit=False)
+    cliente.normalizar()
+    cliente.created_by = cliente.updated_by = usuario
+
+    contrato = contrato_form.save(commit=False)
+    contrato.vendedor, contrato.banco, contrato.forma_pagamento = vendedor, banco, forma
+    contrato.status = cadastros.status_por_nome(linha.get("Status Contrato"), usuario)
+    contrato.cobranca_gerada = linha.get("Cobrança Gerada", "").upper() in ("SIM", "S", "TRUE", "1")
+    contrato.data_cancelamento_contrato = cancelamento or None
+    contrato.created_by = contrato.updated_by = usuario
+    # mesmas regras do cadastro manual e do sinal de vídeo (bulk_create não dispara sinais)
+    if contrato.data_vencimento_primeira_parcela and not contrato.data_ultima_parcela:
+        contrato.data_ultima_parcela = (
+            contrato.data_vencimento_primeira_parcela + relativedelta(months=contrato.vigencia_meses - 1)
+        )
+    subidas = [v.data_subiu for v in videos if v.status and v.data_subiu]
+    if subidas and not contrato.data_vencimento_contrato:
+        contrato.data_vencimento_contrato = vencimento_pelo_video(subidas[0], contrato.vigencia_meses)
+    for video in videos:
+        video.created_by = video.updated_by = usuario
+
+    return LinhaValida(numero, cliente.cpf_cnpj, cliente, contrato, videos), []
+
+
+# ----- gravação -----
+
+def _gravar_lote(validas, clientes_por_cpf):
+    """Grava um lote de linhas válidas; devolve quantos clientes novos foram criados."""
+    procurar = {v.cpf for v in validas} - clientes_por_cpf.keys()
+    for pk, cpf in Cliente.objects.filter(cpf_cnpj__in=procurar).order_by("pk").values_list("pk", "cpf_cnpj"):
+        clientes_por_cpf.setdefault(cpf, pk)
+
+    novos = {}
+    for v in validas:
+        if v.cpf not in clientes_por_cpf and v.cpf not in novos:
+            novos[v.cpf] = v.cliente  # a primeira linha do CPF define o cadastro
+    Cliente.objects.bulk_create(novos.values())
+    clientes_por_cpf.update({cpf: cliente.pk for cpf, cliente in novos.items()})
+
+    for v in validas:
+        v.contrato.cliente_id = clientes_por_cpf[v.cpf]
+    Contrato.objects.bulk_create([v.contrato for v in validas])
+
+    videos = []
+    for v in validas:
+        for video in v.videos:
+            video.contrato_id = v.contrato.pk
+            videos.append(video)
+    Video.objects.bulk_create(videos)
+    # bulk_create não dispara sinais: os vídeos já ativos entram no índice de ocupação aqui
+    ativos = {video.contrato_id for video in videos if video.status}
+    if ativos:
+        ocupacao.sincronizar(contrato_ids=ativos)
+    return len(novos)
+
+
+ResultadoImportacao = namedtuple("ResultadoImportacao", "linhas contratos clientes erros")
+
+
+def importar(linhas, usuario, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Importa as linhas de ler_planilha(). Cada lote é gravado em sua própria
+    transação; `erros` é a lista (número, linha, [mensagens]) para o relatório.
+    """
+    cadastros = Cadastros()
+    clientes_por_cpf = {}
+    total = contratos = clientes = 0
+    erros = []
+
+    iterador = iter(linhas)
+    while lote := list(islice(iterador, tamanho_lote)):
+        validas = []
+        for numero, linha in lote:
+            valida, mensagens = validar_linha(numero, linha, cadastros, usuario)
+            if valida:
+                validas.append(valida)
+            else:
+                erros.append((numero, linha, mensagens))
+
+        if validas:
+            conhecidos = dict(clientes_por_cpf)
+            try:
+                with transaction.atomic():
+                    clientes += _gravar_lote(validas, clientes_por_cpf)
+                contratos += len(validas)
+            except Exception as exc:
+                # o lote inteiro volta, inclusive os clientes criados nele
+                clientes_por_cpf = conhecidos
+                dados = dict(lote)
+                erros.extend((v.numero, dados[v.numero], [f"Erro ao gravar o lote: {exc}"]) for v in validas)
+
+        total += len(lote)
+        if progresso:
+            progresso(total)
+
+    if contratos:
+        # bulk_create não dispara os sinais: derivados refeitos uma vez no final
+        recalcular_faturamento_mensal()
+        recalcular_contadores()
+        autocomplete.invalidar_indice()
+        capacidade.invalidar()
+        manifestos.gerar()
+    return ResultadoImportacao(total, contratos, clientes, erros)
+
+
+def escrever_relatorio(destino, erros):
+    """CSV com o motivo de cada linha recusada + os dados originais (pode ser reimportado)."""
+    writer = csv.writer(destino, delimiter=";")
+    writer.writerow(["Linha", "Erros"] + COLUNAS)
+    for numero, linha, mensagens in erros:
+        writer.writerow([numero, " | ".join(mensagens)] + [linha.get(coluna, "") for coluna in COLUNAS])
+
+
+# ----- Jobs de importação em segundo plano -----
+
+def enfileirar_importacao(arquivo, usuario):
+    return ImportacaoContratos.objects.create(arquivo=arquivo, created_by=usuario, updated_by=usuario)
+
+
+def reservar_proxima_importacao():
+    """Mesmo UPDATE condicional de reservar_proxima_exportacao: um job por worker."""
+    pendentes = ImportacaoContratos.objects.filter(status=ImportacaoContratos.PENDENTE).order_by("created_at")
+    for job_id in pendentes.values_list("id", flat=True)[:10]:
+        reservado = ImportacaoContratos.objects.filter(
+            id=job_id, status=ImportacaoContratos.PENDENTE
+        ).update(status=ImportacaoContratos.PROCESSANDO, iniciado_em=timezone.now())
+        if reservado:
+            return ImportacaoContratos.objects.get(id=job_id)
+    return None
+
+
+def _progresso_pela_posicao(job, arquivo, tamanho):
+    """
+    Atualiza o progresso a cada lote sem uma passada só para contar as linhas:
+    o total é estimado pela fração do arquivo já lida e fica exato no fim.
+    """
+    def progresso(processados):
+        posicao = arquivo.tell()
+        total = max(processados, round(processados * tamanho / posicao)) if posicao else processados
+        ImportacaoContratos.objects.filter(id=job.id).update(processados=processados, total=total)
+    return progresso
+
+
+def processar_importacao(job):
+    try:
+        with job.arquivo.open("rb") as arquivo:
+            progresso = _progresso_pela_posicao(job, arquivo, job.arquivo.size)
+            resultado = importar(ler_planilha(arquivo, job.arquivo.name), job.created_by, progresso=progresso)
+
+        job.total = resultado.linhas
+        job.processados = resultado.linhas
+        job.contratos_criados = resultado.contratos
+        job.clientes_criados = resultado.clientes
+        job.linhas_com_erro = len(resultado.erros)
+        if resultado.erros:
+            with tempfile.TemporaryFile() as relatorio:
+                texto = io.TextIOWrapper(relatorio, encoding="utf-8-sig", newline="")
+                escrever_relatorio(texto, resultado.erros)
+                texto.flush()
+                relatorio.seek(0)
+                job.relatorio.save(f"importacao_{job.id}_erros.csv", File(relatorio), save=False)
+                texto.detach()
+        job.status = ImportacaoContratos.CONCLUIDA
+    except ArquivoImportacaoInvalido as exc:
+        job.status = ImportacaoContratos.ERRO
+        job.erro = str(exc)
+    except Exception:
+        job.status = ImportacaoContratos.ERRO
+        job.erro = traceback.format_exc()
+
+    job.concluido_em = timezone.now()
+    job.save()
+    return job
@@ -0,0 +1,36 @@
+from django.db.models import Aggregate, CharField, Count, DecimalField, ExpressionWrapper, F, Q
+
+
+class AgregarTexto(Aggregate):
+    """Concatena os valores do grupo separados por ", " (GROUP_CONCAT / STRING_AGG)."""
+
+    function = "GROUP_CONCAT"
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="STRING_AGG", **extra_context)
+
+
+def linhas_lista_contratos(contratos):
+    """
+    Projeção da lista de contratos: só as colunas exibidas em contratos.html,
+    com valor total, telões e contagem de vídeos ON/OFF calculados no banco.
+    Cada linha é um dict, sem instanciar Contrato/Cliente/Video/Local.
+    """
+    return contratos.values(
+        "id_contrato",
+        "data_assinatura",
+        razao_social=F("cliente__razao_social"),
+        cpf_cnpj=F("cliente__cpf_cnpj"),
+        vendedor_nome=F("vendedor__nome"),
+        status_nome=F("status__nome_status"),
+    ).annotate(
+        valor_total=ExpressionWrapper(
+            F("valor_mensalidade") * F("vigencia_meses"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        locais=AgregarTexto("videos__local__nome"),
+        videos_on=Count("videos", filter=Q(videos__status=True)),
+        videos_off=Count("videos", filter=Q(videos__status=False)),
+    )
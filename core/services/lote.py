@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.utils import timezone
+from core.models import Contrato, Video
+from core.services.videos import definir_vencimentos
+from core.signals import contratos_atualizados_em_lote
+
+# Operações em lote das telas de pendência. Cada operação é um
+# único UPDATE dentro de uma transação (com updated_by/updated_at, que o
+# update() não preenche sozinho) e devolve o resultado de cada contrato pedido.
+# Os derivados (contadores, cache do detalhe) são atualizados pelo sinal
+# contratos_atualizados_em_lote.
+
+MARCADO = "ok"
+JA_FEITO = "ja_feito"
+NAO_ENCONTRADO = "nao_encontrado"
+
+CAMPOS_PARCELA = {1: "primeiro_pagamento", 2: "segundo_pagamento"}
+
+
+def _resultados(pedidos, encontrados, alterados):
+    resultados = {}
+    for pk in pedidos:
+        if pk not in encontrados:
+            resultados[pk] = (NAO_ENCONTRADO, None)
+        elif pk in alterados:
+            resultados[pk] = (MARCADO, None)
+        else:
+            resultados[pk] = (JA_FEITO, encontrados[pk])
+    return resultados
+
+
+def marcar_cobrancas_geradas(contrato_ids, usuario):
+    """
+    Marca a cobrança como gerada. Devolve {id: (situação, detalhe)}, com
+    situação MARCADO, JA_FEITO ou NAO_ENCONTRADO.
+    """
+    pedidos = sorted(set(contrato_ids))
+    with transaction.atomic():
+        encontrados = dict(
+            Contrato.objects.select_for_update()
+            .filter(pk__in=pedidos)
+            .values_list("pk", "cobranca_gerada")
+        )
+        alterados = [pk for pk, gerada in encontrados.items() if not gerada]
+        if alterados:
+            Contrato.objects.filter(pk__in=alterados).update(
+                cobranca_gerada=True, updated_by=usuario, updated_at=timezone.now()
+            )
+            contratos_atualizados_em_lote.send(sender=Contrato, contrato_ids=alterados)
+    return _resultados(pedidos, encontrados, set(alterados))
+
+
+def registrar_pagamentos(contrato_ids, parcela, data_pagamento, usuario):
+    """
+    Registra o pagamento da parcela (1 ou 2) na data informada. Parcelas já
+    pagas não são sobrescritas: voltam como JA_FEITO com a data existente.
+    """
+    campo = CAMPOS_PARCELA[parcela]
+    pedidos = sorted(set(contrato_ids))
+    with transaction.atomic():
+        encontrados = dict(
+            Contrato.objects.select_for_update()
+            .filter(pk__in=pedidos)
+            .values_list("pk", campo)
+        )
+        alterados = [pk for pk, pago_em in encontrados.items() if pago_em is None]
+        if alterados:
+            Contrato.objects.filter(pk__in=alterados).update(
+                **{campo: data_pagamento}, updated_by=usuario, updated_at=timezone.now()
+            )
+            contratos_atualizados_em_lote.send(sender=Contrato, contrato_ids=alterados)
+    return _resultados(pedidos, encontrados, set(alterados))
+
+
+def ativar_videos(video_ids, data_subiu, usuario):
+    """
+    Ativa os vídeos com a mesma data de subida: um UPDATE nos vídeos e um nos
+    contratos ainda sem vencimento (definir_vencimentos), na mesma transação e
+    sem o post_save de cada vídeo. Vídeos já ativos voltam como JA_FEITO com a
+    data em que subiram.
+    """
+    pedidos = sorted(set(video_ids))
+    with transaction.atomic():
+        videos = {
+            pk: (ativo, contrato_id, subiu)
+            for pk, ativo, contrato_id, subiu in Video.objects.select_for_update()
+            .filter(pk__in=pedidos)
+            .values_list("pk", "status", "contrato_id", "data_subiu")
+        }
+        alterados = [pk for pk, (ativo, _, _) in videos.items() if not ativo]
+        if alterados:
+            Video.objects.filter(pk__in=alterados).update(
+                status=True, data_subiu=data_subiu, updated_by=usuario, updated_at=timezone.now()
+            )
+            contrato_ids = sorted({videos[pk][1] for pk in alterados})
+            definir_vencimentos(contrato_ids, data_subiu)
+            contratos_atualizados_em_lote.send(sender=Video, contrato_ids=contrato_ids)
+    encontrados = {pk: subiu for pk, (_, _, subiu) in videos.items()}
+    return _resultados(pedidos, encontrados, set(alterados))
@@ -0,0 +1,146 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+from collections import namedtuple
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from core.models import Local, ManifestoLocal, Video
+from core.services.ocupacao import intervalos_no_periodo
+
+# Manifesto de cada tela: a playlist dos vídeos no ar no dia (índice de
+# ocupação), na ordem em que subiram, com a duração de cada um. Vai para o
+# MEDIA em JSON e CSV (manifestos/tela_<id>.json/.csv).
+#
+# Uma geração busca as telas, os vídeos no ar e os hashes já gravados (três
+# queries, para uma tela ou para todas) e grava num único upsert só os
+# manifestos cujo hash do conteúdo mudou; os arquivos das outras telas nem são
+# tocados. Os sinais regeneram as telas afetadas depois do commit (vídeo
+# ativado, incluído, excluído, contrato com vigência alterada); o vencimento
+# não tem evento, então `gerar_manifestos` roda uma vez por dia (cron).
+
+PASTA = "manifestos"
+COLUNAS_CSV = ["Ordem", "Vídeo", "Contrato", "Cliente", "Segundos", "No ar desde"]
+
+ResultadoManifestos = namedtuple("ResultadoManifestos", "telas gerados")
+
+
+def caminho(local_id, formato):
+    return f"{PASTA}/tela_{local_id}.{formato}"
+
+
+def _playlists(dia, local_ids):
+    """{local_id: [vídeos em ordem]} com os vídeos no ar em `dia`."""
+    qs = intervalos_no_periodo(dia, dia)
+    if local_ids is not None:
+        qs = qs.filter(local_id__in=local_ids)
+    playlists = {}
+    for item in qs.order_by("local_id", "inicio", "video_id").values(
+        "local_id", "video_id", "segundos", "inicio",
+        contrato=F("video__contrato_id"), cliente=F("video__contrato__cliente__razao_social"),
+    ):
+        playlists.setdefault(item["local_id"], []).append({
+            "video": item["video_id"],
+            "contrato": item["contrato"],
+            "cliente": item["cliente"],
+            "segundos": item["segundos"],
+            "desde": item["inicio"].isoformat(),
+        })
+    return playlists
+
+
+def conteudo(local_id, nome, videos):
+    """Dados do manifesto e o hash deles (sem a data de geração, que muda sempre)."""
+    dados = {
+        "local": {"id": local_id, "nome": nome},
+        "segundos": sum(video["segundos"] for video in videos),
+        "videos": [dict(video, ordem=ordem) for ordem, video in enumerate(videos, start=1)],
+    }
+    hash_conteudo = hashlib.sha256(json.dumps(dados, sort_keys=True).encode("utf-8")).hexdigest()
+    return dados, hash_conteudo
+
+
+def _csv(dados):
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=";")
+    escritor.writerow(COLUNAS_CSV)
+    for video in dados["videos"]:
+        escritor.writerow([
+            video["ordem"], video["video"], video["contrato"], video["cliente"], video["segundos"], video["desde"],
+        ])
+    return "\ufeff" + saida.getvalue()  # BOM para o Excel abrir com acentos
+
+
+def _gravar(nome, texto):
+    # grava ao lado e troca no fim (como core/storage.py): um download no meio
+    # da geração recebe o arquivo antigo ou o novo, nunca um 404
+    caminho_final = default_storage.path(nome)
+    os.makedirs(os.path.dirname(caminho_final), exist_ok=True)
+    temporario = f"{caminho_final}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporario, "wb") as destino:
+            destino.write(texto.encode("utf-8"))
+        if default_storage.file_permissions_mode is not None:
+            os.chmod(temporario, default_storage.file_permissions_mode)
+        os.replace(temporario, caminho_final)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return nome
+
+
+def gerar(local_ids=None, dia=None, forcar=False):
+    """
+    Gera os manifestos das telas informadas (todas, se None) e devolve
+    ResultadoManifestos(telas avaliadas, ids das telas regravadas).
+    """
+    dia = dia or timezone.localdate()
+    locais = Local.objects.order_by("pk").values_list("pk", "nome")
+    existentes = ManifestoLocal.objects.values_list("local_id", "hash_conteudo")
+    if local_ids is not None:
+        local_ids = set(local_ids)
+        locais = locais.filter(pk__in=local_ids)
+        existentes = existentes.filter(local_id__in=local_ids)
+    locais = list(locais)
+    if not locais:
+        return ResultadoManifestos(0, [])
+    playlists = _playlists(dia, local_ids)
+    hashes = dict(existentes)
+
+    agora = timezone.now()
+    manifestos = []
+    for local_id, nome in locais:
+        dados, hash_conteudo = conteudo(local_id, nome, playlists.get(local_id, []))
+        if not forcar and hashes.get(local_id) == hash_conteudo:
+            continue
+        arquivo = dict(dados, dia=dia.isoformat(), gerado_em=agora.isoformat())
+        manifestos.append(ManifestoLocal(
+            local_id=local_id,
+            hash_conteudo=hash_conteudo,
+            videos=len(dados["videos"]),
+            segundos=dados["segundos"],
+            arquivo_json=_gravar(caminho(local_id, "json"), json.dumps(arquivo, ensure_ascii=False, indent=2)),
+            arquivo_csv=_gravar(caminho(local_id, "csv"), _csv(dados)),
+            gerado_em=agora,
+        ))
+
+    if manifestos:
+        ManifestoLocal.objects.bulk_create(
+            manifestos,
+            update_conflicts=True,
+            unique_fields=["local"],
+            update_fields=["hash_conteudo", "videos", "segundos", "arquivo_json", "arquivo_csv", "gerado_em"],
+        )
+    return ResultadoManifestos(len(locais), [manifesto.local_id for manifesto in manifestos])
+
+
+def atualizar_contratos(contrato_ids):
+    """Regenera as telas onde os contratos têm vídeos."""
+    local_ids = set(
+        Video.objects.filter(contrato_id__in=contrato_ids).order_by().values_list("local_id", flat=True).distinct()
+    )
+    if local_ids:
+        gerar(local_ids)
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from core.models import IntervaloOcupacao, Video
+
+# Ocupação das telas (segundos de vídeo no loop de cada Local, por dia).
+#
+# IntervaloOcupacao guarda um intervalo [inicio, fim] por vídeo ativo; os
+# sinais de Video/Contrato e o sinal de lote ressincronizam só os vídeos
+# afetados. A ocupação de um período sai de uma query que já soma no banco os
+# vídeos com o mesmo (local, início, fim) e de uma varredura por diferenças:
+# +segundos no dia em que o intervalo começa e -segundos no dia seguinte ao
+# fim; a soma acumulada dá a série diária de cada tela.
+
+TAMANHO_LOTE = 2000
+DIAS_PADRAO = 365
+DIAS_MAXIMO = 731
+
+
+def segundos_do_video(tempo_video):
+    return max(0, round(tempo_video.total_seconds()))
+
+
+def intervalo_do_video(status, data_subiu, vencimento, cancelamento):
+    """(inicio, fim) em que o vídeo ocupa a tela, ou None se não ocupa."""
+    if not status or not data_subiu:
+        return None
+    fins = [d for d in (vencimento, cancelamento) if d]
+    fim = min(fins) if fins else None
+    if fim and fim < data_subiu:
+        return None
+    return data_subiu, fim
+
+
+def _videos(filtro):
+    return Video.objects.filter(filtro).values(
+        "pk", "local_id", "status", "data_subiu", "tempo_video",
+        vencimento=F("contrato__data_vencimento_contrato"),
+        cancelamento=F("contrato__data_cancelamento_contrato"),
+    )
+
+
+def sincronizar(video_ids=None, contrato_ids=None):
+    """
+    Recalcula os intervalos dos vídeos informados (ou de todos os vídeos dos
+    contratos informados): upsert dos que ocupam a tela e remoção dos demais.
+    """
+    filtro = Q(pk__in=video_ids) if video_ids is not None else Q(contrato_id__in=contrato_ids)
+    linhas = list(_videos(filtro))
+    intervalos = []
+    for video in linhas:
+        periodo = intervalo_do_video(video["status"], video["data_subiu"], video["vencimento"], video["cancelamento"])
+        if periodo:
+            intervalos.append(IntervaloOcupacao(
+                video_id=video["pk"], local_id=video["local_id"], inicio=periodo[0], fim=periodo[1],
+                segundos=segundos_do_video(video["tempo_video"]),
+            ))
+
+    ocupando = {intervalo.video_id for intervalo in intervalos}
+    fora = [video["pk"] for video in linhas if video["pk"] not in ocupando]
+    if fora:
+        IntervaloOcupacao.objects.filter(video_id__in=fora).delete()
+    if intervalos:
+        IntervaloOcupacao.objects.bulk_create(
+            intervalos,
+            update_conflicts=True,
+            unique_fields=["video"],
+            update_fields=["local", "inicio", "fim", "segundos"],
+        )
+    return len(intervalos)
+
+
+def reconstruir(tamanho_lote=TAMANHO_LOTE):
+    """Refaz o índice inteiro, percorrendo os vídeos por PK em lotes."""
+    total, ultimo = 0, 0
+    while True:
+        ids = list(Video.objects.filter(pk__gt=ultimo).order_by("pk").values_list("pk", flat=True)[:tamanho_lote])
+        if not ids:
+            return total
+        total += sincronizar(video_ids=ids)
+        ultimo = ids[-1]
+
+
+def intervalos_no_periodo(inicio, fim):
+    return IntervaloOcupacao.objects.filter(Q(fim__isnull=True) | Q(fim__gte=inicio), inicio__lte=fim)
+
+
+def ocupacao_diaria(inicio=None, dias=DIAS_PADRAO, local_ids=None):
+    """{local_id: [segundos no dia inicio, inicio + 1, ...]} para as telas com algum vídeo no período."""
+    inicio = inicio or timezone.localdate()
+    qs = intervalos_no_periodo(inicio, inicio + timedelta(days=dias - 1))
+    if local_ids is not None:
+        qs = qs.filter(local_id__in=local_ids)
+
+    diferencas = defaultdict(lambda: [0] * (dias + 1))
+    for grupo in qs.values("local_id", "inicio", "fim").annotate(total=Sum("segundos")).order_by():
+        primeiro = max((grupo["inicio"] - inicio).days, 0)
+        depois_do_ultimo = dias if grupo["fim"] is None else min((grupo["fim"] - inicio).days + 1, dias)
+        serie = diferencas[grupo["local_id"]]
+        serie[primeiro] += grupo["total"]
+        serie[depois_do_ultimo] -= grupo["total"]
+    return {local_id: list(accumulate(serie[:-1])) for local_id, serie in diferencas.items()}
+
+
+def ocupacao_no_dia(dia=None):
+    """{local_id: segundos} de um dia, somado no banco."""
+    dia = dia or timezone.localdate()
+    return dict(
+        intervalos_no_periodo(dia, dia).order_by().values("local_id").annotate(total=Sum("segundos")).values_list("local_id", "total")
+    )
@@ -0,0 +1,45 @@
+from django.db.models import Prefetch
+from core.models import Contrato, Video
+from core.pagination import PaginadorCursor
+from core.services.contadores import filtro_cobranca_pendente, filtro_pagamento_pendente, filtro_video_pendente
+
+# Filas de pendência paginadas por cursor. A ordem é id_contrato crescente
+# (pendência mais antiga primeiro), coberta pelos índices parciais de cada
+# fila (contrato_pago_idx, contrato_cobranca_pend_idx, contrato_pagamento_pend_idx).
+
+POR_PAGINA = 20
+ORDENACAO = ("id_contrato",)
+
+
+def _fila_video():
+    return (
+        Contrato.objects.filter(filtro_video_pendente())
+        .select_related("cliente")
+        .prefetch_related(
+            Prefetch(
+                "videos",
+                queryset=Video.objects.filter(status=False).select_related("local").order_by("id"),
+                to_attr="videos_pendentes",
+            )
+        )
+    )
+
+
+def _fila_cobranca():
+    return Contrato.objects.filter(filtro_cobranca_pendente()).select_related("cliente")
+
+
+def _fila_pagamento():
+    return Contrato.objects.filter(filtro_pagamento_pendente()).select_related("cliente")
+
+
+FILAS = {
+    "video": _fila_video,
+    "cobranca": _fila_cobranca,
+    "pagamento": _fila_pagamento,
+}
+
+
+def pagina_da_fila(fila, apos=None, por_pagina=POR_PAGINA):
+    """Próximo lote da fila a partir do cursor `apos` (ou o primeiro lote)."""
+    return PaginadorCursor(FILAS[fila](), ORDENACAO, por_pagina=por_pagina).pagina(apos=apos)
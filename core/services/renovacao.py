@@ -0,0 +1,130 @@
+from collections import namedtuple
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from core.models import Contrato, StatusContrato
+from core.services.vencimentos import contratos_com_vencimento
+from core.signals import contratos_atualizados_em_lote
+
+# Processamento diário dos vencimentos (comando processar_vencimentos):
+#   - contratos de clientes com renovação automática que vencem até
+#     hoje + antecedência ganham `meses` no vencimento (quantas vezes for
+#     preciso para voltar a ficar em dia);
+#   - os demais contratos vencidos vão para o status "Expirado".
+#
+# Os contratos são percorridos por PK em lotes; cada lote é um único UPDATE
+# (CASE por data de vencimento na renovação), sem save() por contrato e sem
+# os sinais de post_save. Os derivados (cache do detalhe, contadores) são
+# atualizados pelo sinal contratos_atualizados_em_lote.
+
+TAMANHO_LOTE = 1000
+STATUS_EXPIRADO = "Expirado"
+STATUS_ATIVO = "Ativo"
+
+Renovacao = namedtuple("Renovacao", "contrato_id vencimento novo_vencimento")
+ResultadoVencimentos = namedtuple("ResultadoVencimentos", "renovados expirados")
+
+
+def contratos_para_renovar(dia, antecedencia=0):
+    return contratos_com_vencimento().filter(
+        cliente__renovacao_automatica=True,
+        data_vencimento_contrato__lte=dia + timedelta(days=antecedencia),
+    )
+
+
+def contratos_para_expirar(dia, status_expirado=None):
+    qs = contratos_com_vencimento().filter(cliente__renovacao_automatica=False, data_vencimento_contrato__lt=dia)
+    if status_expirado is not None:
+        qs = qs.exclude(status=status_expirado)
+    return qs
+
+
+def novo_vencimento(vencimento, meses, dia):
+    """Soma `meses` quantas vezes for preciso para o vencimento chegar em `dia` ou depois."""
+    vezes = 1
+    while vencimento + relativedelta(months=meses * vezes) < dia:
+        vezes += 1
+    return vencimento + relativedelta(months=meses * vezes)
+
+
+def _lotes_por_pk(qs, campos, tamanho_lote):
+    # keyset pela PK: os contratos atualizados no lote podem sair do filtro
+    # sem bagunçar a paginação
+    ultimo = 0
+    while True:
+        lote = list(qs.filter(pk__gt=ultimo).order_by("pk").values_list("pk", *campos)[:tamanho_lote])
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1][0]
+
+
+def _status(nome, usuario, criar):
+    if not criar:
+        return StatusContrato.objects.filter(nome_status=nome).first()
+    status, _ = StatusContrato.objects.get_or_create(
+        nome_status=nome, defaults={"created_by": usuario, "updated_by": usuario}
+    )
+    return status
+
+
+def renovar(dia, meses, antecedencia=0, usuario=None, simular=False, tamanho_lote=TAMANHO_LOTE):
+    """Devolve a lista de Renovacao; com simular=True nada é gravado."""
+    renovados = []
+    expirado = _status(STATUS_EXPIRADO, usuario, criar=False)
+    ativo = _status(STATUS_ATIVO, usuario, criar=not simular) if expirado else None
+
+    for lote in _lotes_por_pk(contratos_para_renovar(dia, antecedencia), ["data_vencimento_contrato"], tamanho_lote):
+        novas = {vencimento: novo_vencimento(vencimento, meses, dia) for _, vencimento in lote}
+        renovados.extend(Renovacao(pk, vencimento, novas[vencimento]) for pk, vencimento in lote)
+        if simular:
+            continue
+
+        campos = {
+            # contratos do lote com o mesmo vencimento vão para a mesma data
+            "data_vencimento_contrato": Case(
+                *[When(data_vencimento_contrato=antiga, then=Value(nova)) for antiga, nova in novas.items()],
+                default=F("data_vencimento_contrato"),
+            ),
+            "updated_at": timezone.now(),
+        }
+        if usuario:
+            campos["updated_by"] = usuario
+        if expirado:
+            # contrato que chegou a expirar volta a valer
+            campos["status"] = Case(
+                When(status=expirado, then=Value(ativo.pk)), default=F("status"), output_field=IntegerField()
+            )
+        ids = [pk for pk, _ in lote]
+        with transaction.atomic():
+            Contrato.objects.filter(pk__in=ids).update(**campos)
+            contratos_atualizados_em_lote.send(sender=Contrato, contrato_ids=ids)
+    return renovados
+
+
+def expirar(dia, usuario=None, simular=False, tamanho_lote=TAMANHO_LOTE):
+    """Devolve os ids dos contratos que foram (ou seriam) marcados como expirados."""
+    expirados = []
+    expirado = _status(STATUS_EXPIRADO, usuario, criar=not simular)
+
+    for lote in _lotes_por_pk(contratos_para_expirar(dia, expirado), [], tamanho_lote):
+        ids = [pk for pk, in lote]
+        expirados.extend(ids)
+        if simular:
+            continue
+        campos = {"status": expirado, "updated_at": timezone.now()}
+        if usuario:
+            campos["updated_by"] = usuario
+        with transaction.atomic():
+            Contrato.objects.filter(pk__in=ids).update(**campos)
+            contratos_atualizados_em_lote.send(sender=Contrato, contrato_ids=ids)
+    return expirados
+
+
+def processar_vencimentos(dia, meses=1, antecedencia=0, usuario=None, simular=False, tamanho_lote=TAMANHO_LOTE):
+    # renovação antes: quem tem renovação automática nunca é expirado
+    renovados = renovar(dia, meses, antecedencia, usuario, simular, tamanho_lote)
+    expirados = expirar(dia, usuario, simular, tamanho_lote)
+    return ResultadoVencimentos(renovados, expirados)
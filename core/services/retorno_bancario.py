@@ -0,0 +1,257 @@
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models import Contrato
+from core.signals import contratos_atualizados_em_lote
+
+# Conciliação do arquivo de retorno do banco (CSV ou CNAB 240).
+#
+# O arquivo é lido linha a linha (sem carregar tudo na memória) e conciliado em
+# lotes: uma query por lote busca os contratos citados. O identificador do
+# título é o número do contrato (o "seu número" informado na geração da cobrança).
+# A prévia guarda só o necessário para aplicar (contrato, parcela, data); a
+# aplicação grava as datas com bulk_update, também em lotes.
+
+TAMANHO_LOTE = 1000
+
+OK = "ok"
+NAO_ENCONTRADO = "nao_encontrado"
+VALOR_MENOR = "valor_menor"
+JA_PAGO = "ja_pago"
+INVALIDA = "invalida"
+
+SITUACOES = {
+    OK: "Conciliado",
+    NAO_ENCONTRADO: "Contrato não encontrado",
+    VALOR_MENOR: "Valor pago menor que a mensalidade",
+    JA_PAGO: "Parcelas já pagas",
+    INVALIDA: "Linha inválida",
+}
+
+LinhaRetorno = namedtuple("LinhaRetorno", "numero identificador valor data")
+
+
+class ArquivoRetornoInvalido(ValueError):
+    pass
+
+
+# ----- leitura -----
+
+def _valor(texto):
+    texto = (texto or "").strip().replace("R$", "").replace(" ", "")
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        return None
+
+
+def _data(texto, formatos=("%d/%m/%Y", "%Y-%m-%d", "%d%m%Y")):
+    texto = (texto or "").strip()
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+# cabeçalhos aceitos no CSV (normalizados em minúsculas, sem acento)
+COLUNAS_CSV = {
+    "identificador": ("contrato", "id contrato", "seu numero", "numero documento", "documento"),
+    "valor": ("valor pago", "valor", "valor recebido"),
+    "data": ("data pagamento", "data credito", "data", "data ocorrencia"),
+}
+
+
+def _normalizar_cabecalho(nome):
+    nome = (nome or "").strip().lower()
+    for de, para in (("á", "a"), ("ã", "a"), ("â", "a"), ("é", "e"), ("ê", "e"), ("í", "i"), ("ó", "o"),
+                     ("ô", "o"), ("ú", "u"), ("ç", "c"), ("_", " ")):
+        nome = nome.replace(de, para)
+    return nome
+
+
+def ler_csv(texto):
+    """Linhas de um CSV (; ou ,) com colunas de contrato, valor pago e data."""
+    amostra = texto.readline()
+    delimitador = ";" if amostra.count(";") >= amostra.count(",") else ","
+    cabecalho = [_normalizar_cabecalho(c) for c in next(csv.reader([amostra], delimiter=delimitador))]
+
+    indices = {}
+    for campo, aceitos in COLUNAS_CSV.items():
+        for nome in aceitos:
+            if nome in cabecalho:
+                indices[campo] = cabecalho.index(nome)
+                break
+        else:
+            raise ArquivoRetornoInvalido(f"Coluna obrigatória ausente no CSV: {aceitos[0]}")
+
+    for numero, colunas in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        if not any(c.strip() for c in colunas):
+            continue
+        valores = {campo: colunas[i] if i < len(colunas) else "" for campo, i in indices.items()}
+        yield LinhaRetorno(numero, valores["identificador"].strip(), _valor(valores["valor"]), _data(valores["data"]))
+
+
+def ler_cnab240(texto):
+    """
+    Detalhes do retorno CNAB 240 (FEBRABAN): o segmento T traz o seu número
+    (posições 59-73) e o segmento U seguinte traz o valor pago (78-92, com 2
+    decimais) e a data do crédito (146-153, DDMMAAAA).
+    """
+    segmento_t = None
+    for numero, linha in enumerate(texto, start=1):
+        linha = linha.rstrip("\r\n")
+        if len(linha) < 240 or linha[7] != "3":
+            continue  # header/trailer de arquivo ou de lote
+        segmento = linha[13]
+        if segmento == "T":
+            segmento_t = (numero, linha[58:73].strip().lstrip("0"))
+        elif segmento == "U" and segmento_t:
+            numero_t, identificador = segmento_t
+            centavos = linha[77:92].strip()
+            valor = Decimal(centavos) / 100 if centavos.isdigit() else None
+            yield LinhaRetorno(numero_t, identificador, valor, _data(linha[145:153], ("%d%m%Y",)))
+            segmento_t = None
+
+
+def ler_retorno(arquivo):
+    """Detecta o formato pela primeira linha e devolve um gerador de LinhaRetorno."""
+    inicio = arquivo.read(512)
+    arquivo.seek(0)
+    primeira = inicio.split(b"\n", 1)[0].rstrip(b"\r")
+    if len(primeira) == 240 and primeira[:3].isdigit():
+        return ler_cnab240(io.TextIOWrapper(arquivo, encoding="latin-1", newline=""))
+    return ler_csv(io.TextIOWrapper(arquivo, encoding="utf-8-sig", errors="replace", newline=""))
+
+
+# ----- conciliação -----
+
+def _lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def conciliar(linhas, tamanho_lote=TAMANHO_LOTE):
+    """
+    Casa as linhas do retorno com os contratos (uma query por lote). A parcela
+    é a primeira em aberto; duas linhas do mesmo contrato no arquivo pagam a
+    primeira e a segunda parcela, nessa ordem.
+    """
+    resultados = []
+    parcelas_usadas = {}  # contrato -> parcelas já atribuídas por linhas anteriores do arquivo
+
+    for lote in _lotes(linhas, tamanho_lote):
+        ids = {int(linha.identificador) for linha in lote if linha.identificador.isdigit()}
+        contratos = {
+            c["pk"]: c
+            for c in Contrato.objects.filter(pk__in=ids).values(
+                "pk", "valor_mensalidade", "primeiro_pagamento", "segundo_pagamento",
+                razao_social=F("cliente__razao_social"),
+            )
+        }
+
+        for linha in lote:
+            item = {
+                "linha": linha.numero,
+                "identificador": linha.identificador,
+                "contrato_id": None,
+                "cliente": "",
+                "valor": linha.valor,
+                "data": linha.data,
+                "parcela": None,
+                "situacao": OK,
+            }
+            resultados.append(item)
+
+            if linha.valor is None or linha.data is None or not linha.identificador.isdigit():
+                item["situacao"] = INVALIDA
+                continue
+            contrato = contratos.get(int(linha.identificador))
+            if contrato is None:
+                item["situacao"] = NAO_ENCONTRADO
+                continue
+
+            item["contrato_id"] = contrato["pk"]
+            item["cliente"] = contrato["razao_social"]
+            if linha.valor < contrato["valor_mensalidade"]:
+                item["situacao"] = VALOR_MENOR
+                continue
+
+            usadas = parcelas_usadas.setdefault(contrato["pk"], set())
+            if contrato["primeiro_pagamento"] is None and 1 not in usadas:
+                item["parcela"] = 1
+            elif contrato["segundo_pagamento"] is None and 2 not in usadas:
+                item["parcela"] = 2
+            else:
+                item["situacao"] = JA_PAGO
+                continue
+            usadas.add(item["parcela"])
+
+    return resultados
+
+
+def resumo(resultados):
+    contagem = dict.fromkeys(SITUACOES, 0)
+    for item in resultados:
+        contagem[item["situacao"]] += 1
+    return contagem
+
+
+def pagamentos_a_aplicar(resultados):
+    """Forma compacta (serializável na sessão) dos itens conciliados."""
+    return [
+        [item["contrato_id"], item["parcela"], item["data"].isoformat()]
+        for item in resultados
+        if item["situacao"] == OK
+    ]
+
+
+def aplicar(pagamentos, usuario, tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava as datas de pagamento com bulk_update. Uma parcela preenchida desde
+    a prévia (ex.: marcada à mão) não é sobrescrita. Devolve quantos contratos
+    foram alterados.
+    """
+    por_contrato = {}
+    for contrato_id, parcela, data in pagamentos:
+        por_contrato.setdefault(contrato_id, {})[parcela] = datetime.strptime(data, "%Y-%m-%d").date()
+
+    alterados = []
+    agora = timezone.now()
+    with transaction.atomic():
+        for lote in _lotes(por_contrato.items(), tamanho_lote):
+            contratos = Contrato.objects.select_for_update().filter(pk__in=[pk for pk, _ in lote]).only(
+                "pk", "primeiro_pagamento", "segundo_pagamento"
+            )
+            modificados = []
+            for contrato in contratos:
+                parcelas = por_contrato[contrato.pk]
+                mudou = False
+                if 1 in parcelas and contrato.primeiro_pagamento is None:
+                    contrato.primeiro_pagamento = parcelas[1]
+                    mudou = True
+                if 2 in parcelas and contrato.segundo_pagamento is None:
+                    contrato.segundo_pagamento = parcelas[2]
+                    mudou = True
+                if mudou:
+                    contrato.updated_by = usuario
+                    contrato.updated_at = agora
+                    modificados.append(contrato)
+            Contrato.objects.bulk_update(
+                modificados, ["primeiro_pagamento", "segundo_pagamento", "updated_by", "updated_at"]
+            )
+            alterados.extend(c.pk for c in modificados)
+
+        if alterados:
+            contratos_atualizados_em_lote.send(sender=Contrato, contrato_ids=alterados)
+    return len(alterados)
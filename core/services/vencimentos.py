@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from core.models import Contrato
+from core.pagination import PaginadorCursor
+
+# Contratos vencendo agrupados em faixas de prazo. Tudo é filtro por intervalo
+# de data_vencimento_contrato sobre o índice parcial contrato_vencimento_idx
+# (vencimento definido e não cancelado): as contagens saem de um único
+# aggregate e cada faixa é paginada por cursor (vencimento, id).
+
+POR_PAGINA = 25
+ORDENACAO = ("data_vencimento_contrato", "id_contrato")
+
+# chave -> (rótulo, primeiro dia, último dia) em dias a partir de hoje; None = sem limite
+FAIXAS = {
+    "vencidos": ("Vencidos", None, -1),
+    "7": ("Até 7 dias", 0, 7),
+    "30": ("8 a 30 dias", 8, 30),
+    "60": ("31 a 60 dias", 31, 60),
+    "90": ("61 a 90 dias", 61, 90),
+    "mais_90": ("Mais de 90 dias", 91, None),
+}
+
+
+def hoje():
+    return timezone.localdate()
+
+
+def contratos_com_vencimento():
+    return Contrato.objects.filter(data_vencimento_contrato__isnull=False, data_cancelamento_contrato__isnull=True)
+
+
+def filtro_faixa(chave, dia):
+    _, inicio, fim = FAIXAS[chave]
+    filtro = Q()
+    if inicio is not None:
+        filtro &= Q(data_vencimento_contrato__gte=dia + timedelta(days=inicio))
+    if fim is not None:
+        filtro &= Q(data_vencimento_contrato__lte=dia + timedelta(days=fim))
+    return filtro
+
+
+def contar_faixas(dia=None):
+    """Quantidade de contratos em cada faixa, em uma query."""
+    dia = dia or hoje()
+    contagem = contratos_com_vencimento().aggregate(
+        **{chave: Count("id_contrato", filter=filtro_faixa(chave, dia)) for chave in FAIXAS}
+    )
+    return [
+        {"chave": chave, "rotulo": rotulo, "total": contagem[chave]}
+        for chave, (rotulo, _, _) in FAIXAS.items()
+    ]
+
+
+def pagina_da_faixa(chave, apos=None, dia=None, por_pagina=POR_PAGINA):
+    """
+    Próximo lote da faixa: só as colunas da tabela, com a razão social do
+    cliente no mesmo SELECT, e os dias restantes já calculados.
+    """
+    dia = dia or hoje()
+    qs = contratos_com_vencimento().filter(filtro_faixa(chave, dia)).values(
+        "id_contrato", "data_vencimento_contrato", razao_social=F("cliente__razao_social")
+    )
+    pagina = PaginadorCursor(qs, ORDENACAO, por_pagina=por_pagina).pagina(apos=apos)
+    for linha in pagina:
+        linha["dias"] = (linha["data_vencimento_contrato"] - dia).days
+        linha["dias_atraso"] = max(0, -linha["dias"])
+    return pagina
@@ -0,0 +1,28 @@
+from dateutil.relativedelta import relativedelta
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from core.models import Contrato
+
+
+def vencimento_pelo_video(data_subiu, vigencia_meses):
+    """O contrato vence `vigencia_meses` contando o mês em que o primeiro vídeo subiu."""
+    return data_subiu + relativedelta(months=vigencia_meses - 1)
+
+
+def definir_vencimentos(contrato_ids, data_subiu):
+    """
+    Contratos ainda sem vencimento passam a vencer pela data de subida do vídeo.
+    Uma query busca as vigências distintas e um único UPDATE (CASE por vigência)
+    grava todos; contratos que já têm vencimento não mudam.
+    """
+    sem_vencimento = Contrato.objects.filter(pk__in=contrato_ids, data_vencimento_contrato__isnull=True)
+    vigencias = set(sem_vencimento.order_by().values_list("vigencia_meses", flat=True).distinct())
+    if not vigencias:
+        return 0
+    return sem_vencimento.update(
+        data_vencimento_contrato=Case(
+            *[When(vigencia_meses=v, then=Value(vencimento_pelo_video(data_subiu, v))) for v in vigencias],
+            default=F("data_vencimento_contrato"),
+        ),
+        updated_at=timezone.now(),
+    )
@@ -1,19 +1,287 @@
-from .models import Video, Contrato
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from .models import Video, Contrato, Vendedor, FormaPagamento, Cliente, Local, DocumentoContrato, Registro, ContadorPendencia
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import Signal, receiver
 from datetime import timedelta
-from dateutil.relativedelta import relativedelta
+from core.services import faturamento, autocomplete, detalhe, contadores, documentos, ocupacao, capacidade, manifestos, videos
+
+# Enviado por operações em lote que alteram contratos com update()/bulk_update()
+# (sem post_save por objeto). Argumento: contrato_ids.
+contratos_atualizados_em_lote = Signal()
 
 @receiver(post_save, sender=Video)
 def update_contrato_vencimento(sender, instance, **kwargs):
-    print("Sinal recebido para Video salvo:", instance)
-    if instance.status:  # Se o vídeo foi ativado
-        contrato = instance.contrato
-        print("Verificando contrato:", contrato)
-        if not contrato.data_vencimento_contrato:  # Se a data de vencimento ainda não estiver definida
-            # Calcula a nova data de vencimento com base na data do vídeo
-            print("Atualizando data de vencimento do contrato...")
-            nova_data_vencimento = instance.data_subiu + relativedelta(months=contrato.vigencia_meses - 1)
-            contrato.data_vencimento_contrato = nova_data_vencimento
-            print("Nova data de vencimento definida para:", nova_data_vencimento)
-            contrato.save()
\ No newline at end of file
+    # vídeo ativado: o contrato ainda sem vencimento passa a vencer pela data de
+    # subida (UPDATE condicional, sem recarregar nem salvar o contrato de novo)
+    if instance.status and instance.data_subiu:
+        videos.definir_vencimentos([instance.contrato_id], instance.data_subiu)
+
+
+# ----- Rollup de faturamento mensal -----
+
+@receiver(pre_save, sender=Contrato)
+def guardar_estado_anterior(sender, instance, **kwargs):
+    # guarda o contrato como estava no banco para calcular os deltas do
+    # faturamento, dos contadores de pendência e da ocupação (uma query só)
+    instance._faturamento_anterior = None
+    instance._pendencias_anteriores = None
+    instance._vigencia_anterior = None
+    if instance.pk:
+        anterior = (
+            Contrato.objects.filter(pk=instance.pk)
+            .only(
+                "data_assinatura", "vendedor_id", "forma_pagamento_id", "valor_mensalidade", "vigencia_meses",
+                "cobranca_gerada", "primeiro_pagamento", "segundo_pagamento",
+                "data_vencimento_contrato", "data_cancelamento_contrato",
+            )
+            .first()
+        )
+        if anterior:
+            instance._faturamento_anterior = (
+                faturamento.chave_faturamento(anterior),
+                faturamento.valor_faturamento(anterior),
+            )
+            instance._pendencias_anteriores = (
+                contadores.pendencias_do_contrato(anterior),
+                anterior.primeiro_pagamento,
+            )
+            instance._vigencia_anterior = (anterior.data_vencimento_contrato, anterior.data_cancelamento_contrato)
+
+
+@receiver(post_save, sender=Contrato)
+def atualizar_faturamento_mensal(sender, instance, **kwargs):
+    nova_chave = faturamento.chave_faturamento(instance)
+    novo_valor = faturamento.valor_faturamento(instance)
+    anterior = getattr(instance, "_faturamento_anterior", None)
+
+    if anterior is None:
+        faturamento.aplicar_delta(nova_chave, 1, novo_valor)
+        return
+
+    chave_anterior, valor_anterior = anterior
+    if chave_anterior == nova_chave:
+        faturamento.aplicar_delta(nova_chave, 0, novo_valor - valor_anterior)
+    else:
+        faturamento.aplicar_delta(chave_anterior, -1, -valor_anterior)
+        faturamento.aplicar_delta(nova_chave, 1, novo_valor)
+
+
+@receiver(post_delete, sender=Contrato)
+def remover_faturamento_mensal(sender, instance, **kwargs):
+    faturamento.aplicar_delta(
+        faturamento.chave_faturamento(instance), -1, -faturamento.valor_faturamento(instance)
+    )
+
+
+@receiver(post_delete, sender=Vendedor)
+@receiver(post_delete, sender=FormaPagamento)
+def recalcular_faturamento_apos_exclusao(sender, instance, **kwargs):
+    # os contratos passam a ter vendedor/forma nulos via SET_NULL (sem sinais),
+    # então o rollup é reconstruído ao final da transação
+    transaction.on_commit(faturamento.recalcular_faturamento_mensal)
+
+
+# ----- Índice do autocomplete de clientes -----
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def atualizar_indice_clientes(sender, instance, **kwargs):
+    cliente_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.atualizar_cliente(cliente_id))
+
+
+# ----- Fragmentos em cache do detalhe do contrato -----
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=DocumentoContrato)
+@receiver(post_delete, sender=DocumentoContrato)
+@receiver(post_save, sender=Registro)
+@receiver(post_delete, sender=Registro)
+def invalidar_detalhe_contrato(sender, instance, **kwargs):
+    # só depois do commit: antes disso outro request ainda poderia guardar o estado antigo
+    contrato_id = instance.contrato_id
+    transaction.on_commit(lambda: detalhe.invalidar_contrato(contrato_id))
+
+
+@receiver(post_save, sender=Local)
+@receiver(post_delete, sender=Local)
+def invalidar_locais_detalhe(sender, instance, **kwargs):
+    transaction.on_commit(detalhe.invalidar_locais)
+
+
+# ----- Contadores de pendência (badges da navegação) -----
+
+@receiver(post_save, sender=Contrato)
+def atualizar_contadores_contrato(sender, instance, created, **kwargs):
+    anteriores = getattr(instance, "_pendencias_anteriores", None)
+    pendencias_antes, primeiro_antes = anteriores or ({}, None)
+
+    deltas = {
+        chave: int(pendente) - int(pendencias_antes.get(chave, False))
+        for chave, pendente in contadores.pendencias_do_contrato(instance).items()
+    }
+
+    # a pendência de vídeo só muda aqui se o primeiro pagamento entrou/saiu
+    if not created and bool(primeiro_antes) != bool(instance.primeiro_pagamento):
+        if instance.videos.filter(status=False).exists():
+            deltas[ContadorPendencia.VIDEO] = 1 if instance.primeiro_pagamento else -1
+
+    # um UPDATE só para todas as chaves que mudaram
+    contadores.aplicar_deltas(deltas)
+
+
+@receiver(pre_save, sender=Video)
+def guardar_pendencia_video_anterior(sender, instance, **kwargs):
+    contrato_ids = {instance.contrato_id}
+    instance._local_anterior = None
+    if instance.pk:
+        # o vídeo pode ter trocado de contrato ou de tela (admin)
+        for contrato_id, local_id in Video.objects.filter(pk=instance.pk).values_list("contrato_id", "local_id"):
+            contrato_ids.add(contrato_id)
+            instance._local_anterior = local_id
+    instance._pendencia_video_anterior = (contrato_ids, contadores.contratos_com_video_pendente(contrato_ids))
+
+
+@receiver(post_save, sender=Video)
+def atualizar_contador_video(sender, instance, **kwargs):
+    contrato_ids, antes = instance._pendencia_video_anterior
+    depois = contadores.contratos_com_video_pendente(contrato_ids)
+    contadores.aplicar_delta(ContadorPendencia.VIDEO, len(depois) - len(antes))
+
+
+@receiver(post_delete, sender=Contrato)
+@receiver(post_delete, sender=Video)
+def recontar_apos_exclusao(sender, instance, origin=None, **kwargs):
+    # exclusões chegam em cascata (contrato -> vídeos, cliente -> contratos...) com
+    # um sinal por objeto e antes/depois misturados; por isso recontam tudo uma
+    # vez por operação, no commit
+    origem = origin if origin is not None else instance
+    if getattr(origem, "_recontagem_agendada", False):
+        return
+    origem._recontagem_agendada = True
+    transaction.on_commit(contadores.recalcular_contadores)
+
+
+# ----- Atualizações em lote (update() não dispara post_save) -----
+
+@receiver(contratos_atualizados_em_lote)
+def recontar_pendencias_em_lote(sender, contrato_ids, **kwargs):
+    transaction.on_commit(contadores.recalcular_contadores)
+
+
+@receiver(contratos_atualizados_em_lote)
+def invalidar_detalhes_em_lote(sender, contrato_ids, **kwargs):
+    contrato_ids = list(contrato_ids)
+    transaction.on_commit(lambda: detalhe.invalidar_contratos(contrato_ids))
+
+
+# ----- Índice de ocupação das telas -----
+
+@receiver(post_save, sender=Video)
+def sincronizar_ocupacao_video(sender, instance, created, **kwargs):
+    if created and not instance.status:
+        return  # vídeo novo desligado não ocupa tela
+    video_id = instance.pk
+    transaction.on_commit(lambda: ocupacao.sincronizar(video_ids=[video_id]))
+
+
+@receiver(post_save, sender=Contrato)
+def sincronizar_ocupacao_contrato(sender, instance, created, **kwargs):
+    # o fim dos intervalos dos vídeos acompanha o vencimento/cancelamento
+    anterior = getattr(instance, "_vigencia_anterior", None)
+    if created or anterior == (instance.data_vencimento_contrato, instance.data_cancelamento_contrato):
+        return
+    contrato_id = instance.pk
+    transaction.on_commit(lambda: ocupacao.sincronizar(contrato_ids=[contrato_id]))
+    transaction.on_commit(capacidade.invalidar)  # cancelado: os vídeos pendentes deixam de contar
+
+
+@receiver(contratos_atualizados_em_lote)
+def sincronizar_ocupacao_em_lote(sender, contrato_ids, **kwargs):
+    contrato_ids = list(contrato_ids)
+    transaction.on_commit(lambda: ocupacao.sincronizar(contrato_ids=contrato_ids))
+
+
+# ----- Carga das telas (checagem de capacidade) -----
+# registrados depois dos de ocupação: no commit, o índice é sincronizado antes
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=Local)
+@receiver(post_delete, sender=Local)
+def invalidar_carga_telas(sender, instance, **kwargs):
+    transaction.on_commit(capacidade.invalidar)
+
+
+@receiver(contratos_atualizados_em_lote)
+def invalidar_carga_telas_em_lote(sender, contrato_ids, **kwargs):
+    transaction.on_commit(capacidade.invalidar)
+
+
+# ----- Manifestos das telas (playlist por Local) -----
+# também depois dos de ocupação: o manifesto sai do índice já sincronizado
+
+@receiver(post_save, sender=Video)
+def atualizar_manifesto_video(sender, instance, created, **kwargs):
+    if created and not instance.status:
+        return
+    local_ids = {instance.local_id, getattr(instance, "_local_anterior", None)} - {None}
+    transaction.on_commit(lambda: manifestos.gerar(local_ids))
+
+
+@receiver(post_delete, sender=Video)
+def atualizar_manifesto_apos_exclusao(sender, instance, origin=None, **kwargs):
+    # em cascata (contrato/cliente -> vídeos) junta as telas e gera uma vez só
+    origem = origin if origin is not None else instance
+    local_ids = getattr(origem, "_manifestos_pendentes", None)
+    if local_ids is None:
+        local_ids = origem._manifestos_pendentes = set()
+        transaction.on_commit(lambda: manifestos.gerar(local_ids))
+    local_ids.add(instance.local_id)
+
+
+@receiver(post_save, sender=Local)
+def atualizar_manifesto_local(sender, instance, **kwargs):
+    local_id = instance.pk
+    transaction.on_commit(lambda: manifestos.gerar([local_id]))
+
+
+@receiver(post_save, sender=Contrato)
+def atualizar_manifestos_contrato(sender, instance, created, **kwargs):
+    anterior = getattr(instance, "_vigencia_anterior", None)
+    if created or anterior == (instance.data_vencimento_contrato, instance.data_cancelamento_contrato):
+        return
+    contrato_id = instance.pk
+    transaction.on_commit(lambda: manifestos.atualizar_contratos([contrato_id]))
+
+
+@receiver(contratos_atualizados_em_lote)
+def atualizar_manifestos_em_lote(sender, contrato_ids, **kwargs):
+    contrato_ids = list(contrato_ids)
+    transaction.on_commit(lambda: manifestos.atualizar_contratos(contrato_ids))
+
+
+# ----- Arquivos dos documentos (storage por conteúdo, com referências) -----
+
+@receiver(pre_save, sender=DocumentoContrato)
+def guardar_arquivo_anterior(sender, instance, **kwargs):
+    instance._arquivo_anterior = None
+    if instance.pk:
+        instance._arquivo_anterior = (
+            DocumentoContrato.objects.filter(pk=instance.pk).values_list("arquivo", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=DocumentoContrato)
+def liberar_arquivo_substituido(sender, instance, **kwargs):
+    anterior = getattr(instance, "_arquivo_anterior", None)
+    if anterior and anterior != instance.arquivo.name:
+        transaction.on_commit(lambda: documentos.liberar_arquivo(anterior))
+
+
+@receiver(post_delete, sender=DocumentoContrato)
+def liberar_arquivo_excluido(sender, instance, **kwargs):
+    # o mesmo arquivo pode estar em outros contratos: só sai se ninguém mais usa
+    nome = instance.arquivo.name
+    transaction.on_commit(lambda: documentos.liberar_arquivo(nome))
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import uuid
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ArmazenamentoPorConteudo(FileSystemStorage):
+    """
+    Storage endereçado pelo conteúdo: o nome do arquivo é o SHA-256 dos bytes
+    (documentos/ab/cd/<sha256>.pdf), calculado lendo o upload em blocos. Um
+    arquivo que já existe não é gravado de novo, só referenciado; por isso
+    apagar um registro não apaga o arquivo: quem usa o storage confere se
+    ainda há referências antes (ver core/services/documentos.py).
+    """
+    PASTA = "documentos"
+    TAMANHO_BLOCO = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # nomes iguais são o mesmo conteúdo: nunca renomeia
+        return name
+
+    def nome_do_conteudo(self, digest, name):
+        extensao = os.path.splitext(name)[1].lower()[:10]
+        return f"{self.PASTA}/{digest[:2]}/{digest[2:4]}/{digest}{extensao}"
+
+    def nome_para(self, content, name):
+        """
+        Nome que `content` terá no storage. Lê o arquivo inteiro em blocos uma
+        vez só: o digest fica guardado no próprio objeto, e o _save do mesmo
+        upload (DocumentoContrato.save calcula antes, para o bloqueio) o reaproveita.
+        """
+        digest = getattr(content, "_sha256", None)
+        if digest is None:
+            hash_conteudo = hashlib.sha256()
+            for bloco in content.chunks(self.TAMANHO_BLOCO):
+                hash_conteudo.update(bloco)
+            digest = content._sha256 = hash_conteudo.hexdigest()
+        return self.nome_do_conteudo(digest, name)
+
+    def _save(self, name, content):
+        nome = self.nome_para(content, name)
+        if self.exists(nome):
+            return nome  # duplicado: nada a gravar
+
+        caminho = self.path(nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # grava ao lado e troca no fim: dois uploads simultâneos do mesmo
+        # arquivo escrevem o mesmo conteúdo e o último os.replace vence
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        try:
+            if hasattr(content, "temporary_file_path"):
+                file_move_safe(content.temporary_file_path(), temporario)
+            else:
+                with open(temporario, "wb") as destino:
+                    for bloco in content.chunks(self.TAMANHO_BLOCO):
+                        destino.write(bloco)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporario, self.file_permissions_mode)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        return nome
+
+
+armazenamento_documentos = ArmazenamentoPorConteudo()
@@ -1,3 +1,1197 @@
-from django.test import TestCase
+"""
+Regressão de desempenho das views do core.
 
-# Create your tests here.
+Cada URL de core/urls.py é renderizada contra uma base sintética e o número
+de queries não pode passar do limite definido em CASOS (um N+1 novo estoura
+o limite).
+
+A latência depende da máquina, então só é medida com BENCH_LATENCIA=1: a
+mediana de cada view é gravada em um baseline JSON (local, fora do git) e, nas
+execuções seguintes, o teste falha se piorar além da tolerância.
+
+Variáveis de ambiente:
+  BENCH_CONTRATOS   tamanho da base (padrão: 300 contratos)
+  BENCH_LATENCIA    "1" para medir e comparar a latência com o baseline
+  BENCH_BASELINE    arquivo do baseline (padrão: bench_baseline.json na raiz)
+  BENCH_ATUALIZAR   "1" para regravar o baseline com os tempos atuais
+  BENCH_TOLERANCIA  piora relativa aceita (padrão: 0.5 = 50%)
+  BENCH_FOLGA_MS    piora absoluta sempre aceita, contra ruído (padrão: 15 ms)
+
+    python manage.py test core
+    BENCH_LATENCIA=1 python manage.py test core.tests.DesempenhoViewsTests
+"""
+import atexit
+import base64
+import hashlib
+import csv
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import statistics
+import io
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from unittest import mock, skipUnless
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from core import urls as core_urls
+from core.models import BloqueioArquivo, Cliente, Contrato, FaturamentoMensal, IntervaloOcupacao, Local, DocumentoContrato, ExportacaoContratos, ImportacaoContratos, ManifestoLocal, Registro, Video
+from core.pagination import CursorInvalido, PaginadorCursor
+from core.services.contadores import contar_pendencias, ler_contadores
+from core.services.pendencias import pagina_da_fila
+from core.services import autocomplete, busca, capacidade, dashboard, documentos, exportacao, faturamento, importacao, lote, manifestos, renovacao, retorno_bancario, ocupacao, vencimentos, videos
+from core.services.dados_teste import popular_base
+from core.services.faturamento import recalcular_faturamento_mensal
+from core.forms import VideoFormSet
+from core.services.exportacao import TAMANHO_LOTE
+
+TAMANHO_BASE = int(os.environ.get("BENCH_CONTRATOS", 300))
+BASELINE = Path(os.environ.get("BENCH_BASELINE", Path(settings.BASE_DIR) / "bench_baseline.json"))
+MEDIR_LATENCIA = os.environ.get("BENCH_LATENCIA") == "1"
+ATUALIZAR_BASELINE = os.environ.get("BENCH_ATUALIZAR") == "1"
+TOLERANCIA = float(os.environ.get("BENCH_TOLERANCIA", 0.5))
+FOLGA_MS = float(os.environ.get("BENCH_FOLGA_MS", 15))
+EXECUCOES = 3
+
+# arquivos gravados pelos sinais no commit (manifestos das telas) vão para um
+# MEDIA_ROOT temporário, não para o media/ do projeto
+MEDIA_TESTES = tempfile.mkdtemp(prefix="innovaled-testes-")
+atexit.register(shutil.rmtree, MEDIA_TESTES, ignore_errors=True)
+
+
+# url_name -> (função que monta os kwargs da URL, máximo de queries)
+# Os limites não dependem do tamanho da base (só valem se não houver N+1); quando
+# a view trabalha em lotes, o máximo é uma função do número de contratos.
+CASOS = {
+    "home": (lambda d: {}, 6),
+    "contratos_list": (lambda d: {}, 6),
+    "contrato_create": (lambda d: {}, 9),
+    "cliente_autocomplete": (lambda d: {}, 3),
+    "contrato_detail": (lambda d: {"pk": d["contrato"].pk}, 8),  # sem cache dos fragmentos
+    "contratos_vencendo": (lambda d: {}, 5),  # contagem das faixas + 1ª página
+    "vencimentos_fragmento": (lambda d: {"faixa": "mais_90"}, 3),
+    "renovar_contrato": (lambda d: {"pk": d["contrato"].pk}, 6),
+    "pendencias_video": (lambda d: {}, 6),
+    "pendencias_pagamento": (lambda d: {}, 5),
+    "pendencias_fragmento": (lambda d: {"fila": "video"}, 4),
+    "marcar_cobranca_gerada": (lambda d: {"contrato_id": d["contrato"].pk}, 6),
+    "cobranca_em_lote": (lambda d: {}, 3),
+    "pagamento_em_lote": (lambda d: {}, 3),
+    "retorno_importar": (lambda d: {}, 4),
+    "retorno_aplicar": (lambda d: {}, 3),
+    "ativar_video": (lambda d: {"video_id": d["video"].pk}, 4),
+    "ativar_videos_em_lote": (lambda d: {}, 3),
+    "ocupacao_telas": (lambda d: {}, 4),
+    "manifestos_telas": (lambda d: {}, 3),
+    "manifesto_tela": (lambda d: {"pk": d["local"].pk, "formato": "json"}, 3),
+    "marcar_pagamento": (lambda d: {"contrato_id": d["contrato"].pk, "parcela": 1}, 4),
+    "documento_download": (lambda d: {"pk": d["documento"].pk}, 3),
+    "documento_delete": (lambda d: {"pk": d["documento"].pk}, 5),
+    "video_create_modal": (lambda d: {"contrato_id": d["contrato"].pk}, 4),
+    "dashboard": (lambda d: {}, 6),
+    "contratos_export": (lambda d: {}, 4),
+    # exportação em streaming: 2 queries (contratos + vídeos) por lote, por desenho
+    "contratos_export_direto": (lambda d: {}, lambda n: 4 + 2 * math.ceil(n / TAMANHO_LOTE)),
+    "exportacao_detail": (lambda d: {"pk": d["exportacao"].pk}, 4),
+    "exportacao_status": (lambda d: {"pk": d["exportacao"].pk}, 4),
+    "exportacao_download": (lambda d: {"pk": d["exportacao"].pk}, 4),
+    "contratos_importar": (lambda d: {}, 3),
+    "importacao_detail": (lambda d: {"pk": d["importacao"].pk}, 4),
+    "importacao_status": (lambda d: {"pk": d["importacao"].pk}, 4),
+    "importacao_relatorio": (lambda d: {"pk": d["importacao"].pk}, 4),
+    "criar_contrato_registro": (lambda d: {"contrato_id": d["contrato"].pk}, 4),
+}
+
+
+def _carregar_baseline():
+    if BASELINE.exists():
+        return json.loads(BASELINE.read_text())
+    return {}
+
+
+@override_settings(ALLOWED_HOSTS=["*"], MEDIA_ROOT=MEDIA_TESTES)
+class DesempenhoViewsTests(TestCase):
+    latencias = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(TAMANHO_BASE)
+        cls.usuario = User.objects.create_superuser("bench", "bench@exemplo.com", "bench")
+
+        contrato = Contrato.objects.filter(videos__isnull=False).distinct().first()
+        for i in range(5):
+            Registro.objects.create(
+                contrato=contrato, data_hora=timezone.now(), observacao=f"Registro {i}", created_by=cls.usuario
+            )
+        cls.dados = {
+            "contrato": contrato,
+            "video": Video.objects.filter(contrato=contrato).first(),
+            "documento": DocumentoContrato.objects.create(contrato=contrato, arquivo="contratos/teste.pdf"),
+            "exportacao": ExportacaoContratos.objects.create(created_by=cls.usuario),
+            "importacao": ImportacaoContratos.objects.create(created_by=cls.usuario, arquivo="importacoes/teste.csv"),
+            "local": contrato.videos.first().local,
+        }
+        manifestos.gerar()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.latencias and (ATUALIZAR_BASELINE or not BASELINE.exists()):
+            baseline = _carregar_baseline()
+            baseline.update(cls.latencias)
+            BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _get(self, url):
+        resposta = self.client.get(url)
+        if getattr(resposta, "streaming", False):
+            b"".join(resposta.streaming_content)
+        return resposta
+
+    def test_todas_as_urls_tem_caso(self):
+        nomes = {p.name for p in core_urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+        self.assertEqual(nomes - set(CASOS), set(), "URLs sem limite de queries em core/tests.py")
+
+    def test_limite_de_queries(self):
+        for nome, (kwargs, maximo) in CASOS.items():
+            with self.subTest(view=nome):
+                url = reverse(nome, kwargs=kwargs(self.dados))
+                with CaptureQueriesContext(connection) as queries:
+                    resposta = self._get(url)
+                self.assertLess(resposta.status_code, 500, url)
+                # captured_queries é lido do log da conexão, que é zerado a cada request
+                capturadas = list(queries.captured_queries)
+                if callable(maximo):
+                    maximo = maximo(TAMANHO_BASE)
+                self.assertLessEqual(
+                    len(capturadas),
+                    maximo,
+                    f"{nome}: {len(capturadas)} queries (máximo {maximo})\n"
+                    + "\n".join(q["sql"] for q in capturadas),
+                )
+
+    @skipUnless(MEDIR_LATENCIA, "latência só com BENCH_LATENCIA=1")
+    def test_latencia(self):
+        baseline = {} if ATUALIZAR_BASELINE else _carregar_baseline()
+
+        for nome, (kwargs, _) in CASOS.items():
+            with self.subTest(view=nome):
+                url = reverse(nome, kwargs=kwargs(self.dados))
+                self._get(url)  # aquece
+                tempos = []
+                for _ in range(EXECUCOES):
+                    inicio = time.perf_counter()
+                    self._get(url)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                latencia = statistics.median(tempos)
+                self.latencias[nome] = round(latencia, 2)
+
+                anterior = baseline.get(nome)
+                if anterior is not None:
+                    limite = anterior * (1 + TOLERANCIA) + FOLGA_MS
+                    self.assertLessEqual(
+                        latencia, limite, f"{nome}: {latencia:.1f} ms (baseline {anterior:.1f} ms)"
+                    )
+
+
+class DashboardFaturamentoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(80)
+
+    def _forca_bruta(self, inicio, vendedor_id=None):
+        qs = Contrato.objects.filter(data_assinatura__year=inicio.year, data_assinatura__month=inicio.month)
+        if vendedor_id:
+            qs = qs.filter(vendedor_id=vendedor_id)
+        return qs.count(), sum((c.valor_mensalidade * c.vigencia_meses for c in qs), Decimal("0"))
+
+    def test_serie_em_uma_query_com_meses_zerados(self):
+        referencia = timezone.localdate()
+        vendedor_id = Contrato.objects.values_list("vendedor_id", flat=True).first()
+        # um mês da janela sem nenhum contrato
+        vazio = (referencia.replace(day=1) - timedelta(days=1)).replace(day=1)
+        Contrato.objects.filter(data_assinatura__year=vazio.year, data_assinatura__month=vazio.month).delete()
+        recalcular_faturamento_mensal()
+
+        with self.assertNumQueries(1):
+            serie = dashboard.serie_faturamento(12, vendedor_id=vendedor_id, referencia=referencia)
+        self.assertEqual(len(serie), 12)
+        self.assertEqual((serie[-1]["ano"], serie[-1]["mes"]), (referencia.year, referencia.month))
+        for item in serie:
+            inicio = date(item["ano"], item["mes"], 1)
+            self.assertEqual((item["contratos"], item["faturamento_total"]), self._forca_bruta(inicio, vendedor_id))
+        self.assertEqual(serie[-2]["contratos"], 0)
+        self.assertEqual(serie[-2]["faturamento_total"], 0)
+
+    def test_dashboard_com_mes_fora_da_janela(self):
+        antigo = Contrato.objects.order_by("data_assinatura").first().data_assinatura.replace(day=1)
+        dados = dashboard.get_dashboard_data(mes=antigo.strftime("%Y-%m"))
+        self.assertEqual((dados["contratos_vendidos"], dados["faturamento"]), self._forca_bruta(antigo))
+        self.assertEqual(len(dados["faturamento_por_mes"]), 6)
+        self.assertEqual(
+            sum(item["total"] for item in dados["metodos_pagamento"]), self._forca_bruta(antigo)[0]
+        )
+
+
+class FaturamentoMensalSinaisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(20)
+
+    def _rollup(self):
+        return {
+            (f.ano, f.mes, f.vendedor_id, f.forma_pagamento_id): (f.contratos, f.valor_total)
+            for f in FaturamentoMensal.objects.all()
+            if f.contratos or f.valor_total
+        }
+
+    def _esperado(self):
+        esperado = {}
+        for contrato in Contrato.objects.all():
+            chave = faturamento.chave_faturamento(contrato)
+            contratos, valor = esperado.get(chave, (0, Decimal("0")))
+            esperado[chave] = (contratos + 1, valor + faturamento.valor_faturamento(contrato))
+        return esperado
+
+    def test_criacao_mudanca_de_chave_e_exclusao(self):
+        self.assertEqual(self._rollup(), self._esperado())
+        modelo = Contrato.objects.first()
+        contrato = Contrato.objects.create(
+            cliente=modelo.cliente, vendedor=None, forma_pagamento=None,
+            valor_mensalidade=Decimal("150.00"), vigencia_meses=12, data_assinatura=date(2020, 1, 15),
+        )
+        self.assertEqual(self._rollup(), self._esperado())
+
+        # muda mês, vendedor, forma e valor: sai de uma chave e entra em outra
+        contrato.data_assinatura = date(2020, 3, 2)
+        contrato.vendedor = modelo.vendedor
+        contrato.forma_pagamento = modelo.forma_pagamento
+        contrato.valor_mensalidade = Decimal("200.00")
+        contrato.save()
+        self.assertEqual(self._rollup(), self._esperado())
+
+        contrato.vigencia_meses = 24  # mesma chave, só o valor
+        contrato.save()
+        self.assertEqual(self._rollup(), self._esperado())
+
+        contrato.delete()
+        self.assertEqual(self._rollup(), self._esperado())
+
+    def test_chave_com_nulos_tem_uma_linha_so(self):
+        chave = (2019, 5, None, None)
+        faturamento.aplicar_delta(chave, 1, Decimal("10"))
+        faturamento.aplicar_delta(chave, 1, Decimal("5"))
+        self.assertEqual(FaturamentoMensal.objects.filter(ano=2019, mes=5).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FaturamentoMensal.objects.create(ano=2019, mes=5, contratos=1, valor_total=1)
+
+
+class PaginadorCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(40)
+        # empates na primeira coluna: a PK desempata
+        Contrato.objects.filter(pk__in=Contrato.objects.values("pk")[:15]).update(data_assinatura=date(2021, 6, 1))
+
+    def setUp(self):
+        self.qs = Contrato.objects.values("id_contrato", "data_assinatura")
+        self.paginador = PaginadorCursor(self.qs, ("-data_assinatura", "-id_contrato"), por_pagina=7)
+        self.todos = [c["id_contrato"] for c in self.qs.order_by("-data_assinatura", "-id_contrato")]
+
+    def _ids(self, pagina):
+        return [c["id_contrato"] for c in pagina]
+
+    def test_percorre_para_frente_e_para_tras(self):
+        paginas = [self.paginador.pagina()]
+        self.assertFalse(paginas[0].has_previous())
+        while paginas[-1].has_next():
+            paginas.append(self.paginador.pagina(apos=paginas[-1].next_cursor))
+        self.assertEqual([i for p in paginas for i in self._ids(p)], self.todos)
+        self.assertEqual(len(paginas), math.ceil(len(self.todos) / 7))
+
+        # de volta pelo cursor "antes": as mesmas páginas, na mesma ordem interna
+        atual = paginas[-1]
+        for esperada in reversed(paginas[:-1]):
+            atual = self.paginador.pagina(antes=atual.previous_cursor)
+            self.assertEqual(self._ids(atual), self._ids(esperada))
+            self.assertTrue(atual.has_next())
+        self.assertFalse(atual.has_previous())
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        primeira = self._ids(self.paginador.pagina())
+        valido = self.paginador.pagina().next_cursor
+        adulterados = [
+            "!!!",
+            valido[:-3],
+            base64.urlsafe_b64encode(json.dumps(["ontem", 1]).encode()).decode(),
+            base64.urlsafe_b64encode(json.dumps(["2021-06-01"]).encode()).decode(),
+            base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+        ]
+        for cursor in adulterados:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(CursorInvalido):
+                    self.paginador.decodificar(cursor)
+                self.assertEqual(self._ids(self.paginador.pagina(apos=cursor)), primeira)
+                self.assertEqual(self._ids(self.paginador.pagina(antes=cursor)), primeira)
+
+
+class BuscaClientesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(10)
+        cls.cliente = Cliente.objects.create(
+            razao_social="  Padaria São João ltda ", cpf_cnpj="123.456.789-09", email="padaria@exemplo.com"
+        )
+        cls.contrato = Contrato.objects.create(cliente=cls.cliente, valor_mensalidade=Decimal("100"))
+
+    def test_termos_normalizados_como_a_gravacao(self):
+        self.assertEqual((self.cliente.razao_social, self.cliente.cpf_cnpj), ("PADARIA SAO JOAO LTDA", "12345678909"))
+        self.assertEqual(busca.termo_razao_social("  padaria são joão "), "PADARIA SAO JOAO")
+        self.assertEqual(busca.termo_cpf_cnpj(" 123.456.789-09 "), "12345678909")
+        self.assertEqual(busca.termo_cpf_cnpj("abc"), "abc")
+
+    def test_filtros_acham_o_cliente_com_acento_e_mascara(self):
+        contratos = busca.filtrar_por_cliente(Contrato.objects.all(), nome="são joão")
+        self.assertEqual(list(contratos), [self.contrato])
+        contratos = busca.filtrar_por_cliente(Contrato.objects.all(), cpf_cnpj="456.789")
+        self.assertEqual(list(contratos), [self.contrato])
+        self.assertFalse(busca.filtrar_por_cliente(Contrato.objects.all(), nome="são joão", cpf_cnpj="999").exists())
+
+    def test_lista_e_exportacao_usam_a_busca(self):
+        self.client.force_login(User.objects.create_user("comercial"))
+        resposta = self.client.get(reverse("contratos_list"), {"nome": "são joão", "cnpj": "456.789"})
+        self.assertEqual([linha["id_contrato"] for linha in resposta.context["page_obj"]], [self.contrato.pk])
+
+        resposta = self.client.get(reverse("contratos_export_direto"), {"formato": "csv", "nome": "padaria sao"})
+        linhas = list(csv.reader(io.StringIO(b"".join(resposta.streaming_content).decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual([linha[0] for linha in linhas[1:]], [str(self.contrato.pk)])
+
+    def test_sem_trigram_no_sqlite_a_ordem_e_mantida(self):
+        qs = busca.filtrar_por_cliente(Contrato.objects.order_by("-pk"), nome="padaria")
+        self.assertIs(busca.ordenar_por_similaridade(qs, "padaria"), qs)
+
+
+class AutocompleteClientesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(10)
+        cls.cliente = Cliente.objects.create(
+            razao_social="Padaria São João", cpf_cnpj="123.456.789-09", email="padaria@exemplo.com"
+        )
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._indice = None  # cada teste monta o índice do zero
+
+    def _ids(self, termo):
+        return [cliente["id"] for cliente in autocomplete.buscar(termo)]
+
+    def test_indice_acompanha_os_sinais_sem_reconstruir(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._ids("sao j"), [self.cliente.pk])  # a partir de uma palavra do meio
+        self.assertEqual(self._ids("123.456"), [self.cliente.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.razao_social = "Confeitaria Aurora"
+            self.cliente.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids("aurora"), [self.cliente.pk])
+            self.assertEqual(self._ids("padaria"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = Cliente.objects.create(razao_social="Aurora Tintas", cpf_cnpj="98765432100", email="t@exemplo.com")
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(self._ids("aurora")), sorted([self.cliente.pk, novo.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids("aurora"), [self.cliente.pk])
+
+    def test_carga_em_massa_invalida_e_reconstroi(self):
+        self._ids("padaria")
+        Cliente.objects.filter(pk=self.cliente.pk).update(razao_social="MERCADO CENTRAL")
+        autocomplete.invalidar_indice()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._ids("mercado"), [self.cliente.pk])
+
+    def test_busca_espera_alteracao_em_andamento(self):
+        self._ids("padaria")
+        resultados = []
+        with autocomplete._lock:  # como um adicionar/remover no meio, vindo de outra thread
+            busca_paralela = threading.Thread(target=lambda: resultados.append(self._ids("padaria")))
+            busca_paralela.start()
+            busca_paralela.join(0.2)
+            self.assertTrue(busca_paralela.is_alive())
+        busca_paralela.join()
+        self.assertEqual(resultados, [[self.cliente.pk]])
+
+
+class InstrumentacaoMiddlewareTests(TestCase):
+    def test_server_timing_so_para_staff(self):
+        self.client.force_login(User.objects.create_user("operador"))
+        resposta = self.client.get(reverse("contratos_list"))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn("Server-Timing", resposta)
+
+        self.client.force_login(User.objects.create_user("suporte", is_staff=True))
+        resposta = self.client.get(reverse("contratos_list"))
+        self.assertIn("tpl;dur=", resposta["Server-Timing"])
+        self.assertNotIn("tpl;dur=0.0", resposta["Server-Timing"])
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_com_debug(self):
+        resposta = self.client.get(reverse("login"))
+        self.assertIn("Server-Timing", resposta)
+
+    def test_log_so_de_requests_lentos_ou_com_queries_demais(self):
+        self.client.force_login(User.objects.create_user("operador"))
+        url = reverse("contratos_list")
+        with self.assertNoLogs("core.instrumentacao", "WARNING"):
+            self.client.get(url)
+
+        with override_settings(MAX_QUERIES_REQUEST=0):
+            cliente = self.client_class()  # client novo: o middleware relê os limites
+            cliente.force_login(User.objects.get(username="operador"))
+            with self.assertLogs("core.instrumentacao", "WARNING") as logs:
+                cliente.get(url)
+        linha = json.loads(logs.records[0].getMessage())
+        self.assertEqual((linha["view"], linha["status"]), ("contratos_list", 200))
+        self.assertGreater(linha["queries"], 0)
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class DetalheContratoCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(20)
+        cls.usuario = User.objects.create_superuser("detalhe", "detalhe@exemplo.com", "detalhe")
+        cls.contrato = Contrato.objects.filter(videos__isnull=False).distinct().first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.url = reverse("contrato_detail", kwargs={"pk": self.contrato.pk})
+
+    def test_fragmentos_em_cache_evitam_queries(self):
+        with CaptureQueriesContext(connection) as primeira:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as segunda:
+            resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertLess(len(segunda.captured_queries), len(primeira.captured_queries))
+
+    def test_registro_novo_invalida_fragmento(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Registro.objects.create(
+                contrato=self.contrato, data_hora=timezone.now(), observacao="Cliente pediu troca do vídeo"
+            )
+        self.assertContains(self.client.get(self.url), "Cliente pediu troca do vídeo")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class ContadoresPendenciaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(60)
+
+    def assertContadoresEmDia(self):
+        self.assertEqual(ler_contadores(), contar_pendencias())
+
+    def test_sinais_mantem_contadores(self):
+        self.assertContadoresEmDia()
+        hoje = timezone.now().date()
+
+        contrato = Contrato.objects.filter(cobranca_gerada=False).first()
+        contrato.cobranca_gerada = True
+        contrato.save()
+        self.assertContadoresEmDia()
+
+        contrato.primeiro_pagamento = hoje
+        contrato.save()
+        self.assertContadoresEmDia()
+
+        video = Video.objects.create(
+            contrato=contrato, local=Video.objects.first().local, tempo_video=timedelta(seconds=15)
+        )
+        self.assertContadoresEmDia()
+
+        video.status = True
+        video.data_subiu = hoje
+        video.save()
+        self.assertContadoresEmDia()
+
+    def test_deltas_do_contrato_em_um_update(self):
+        contrato = Contrato.objects.filter(cobranca_gerada=False).first()
+        contrato.cobranca_gerada = True
+        with CaptureQueriesContext(connection) as queries:
+            contrato.save()
+        contadores_sql = [q["sql"] for q in queries.captured_queries if "core_contadorpendencia" in q["sql"]]
+        self.assertEqual(len(contadores_sql), 1, contadores_sql)
+        self.assertContadoresEmDia()
+
+    def test_exclusao_em_cascata_reconta_no_commit(self):
+        contrato = Contrato.objects.filter(primeiro_pagamento__isnull=False, videos__status=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            contrato.delete()
+        self.assertContadoresEmDia()
+
+    def test_filas_percorridas_por_cursor_batem_com_contadores(self):
+        contagens = contar_pendencias()
+        for fila in ("video", "cobranca", "pagamento"):
+            with self.subTest(fila=fila):
+                vistos, cursor = [], None
+                while True:
+                    pagina = pagina_da_fila(fila, apos=cursor, por_pagina=7)
+                    vistos.extend(contrato.pk for contrato in pagina)
+                    if not pagina.has_next():
+                        break
+                    cursor = pagina.next_cursor
+                self.assertEqual(vistos, sorted(set(vistos)))
+                self.assertEqual(len(vistos), contagens[fila])
+
+    def test_lote_de_cobranca_e_pagamento(self):
+        usuario = User.objects.create_user("financeiro")
+        pendentes = list(Contrato.objects.filter(cobranca_gerada=False).values_list("pk", flat=True)[:5])
+        ja_gerado = Contrato.objects.filter(cobranca_gerada=True).values_list("pk", flat=True).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultados = lote.marcar_cobrancas_geradas(pendentes + [ja_gerado, 999999], usuario)
+        self.assertEqual({pk: resultados[pk][0] for pk in pendentes}, dict.fromkeys(pendentes, lote.MARCADO))
+        self.assertEqual(resultados[ja_gerado][0], lote.JA_FEITO)
+        self.assertEqual(resultados[999999][0], lote.NAO_ENCONTRADO)
+        self.assertFalse(Contrato.objects.filter(pk__in=pendentes).exclude(updated_by=usuario).exists())
+        self.assertContadoresEmDia()
+
+        hoje = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            resultados = lote.registrar_pagamentos(pendentes, 1, hoje, usuario)
+        self.assertTrue(all(situacao == lote.MARCADO for situacao, _ in resultados.values()))
+        self.assertEqual(Contrato.objects.filter(pk__in=pendentes, primeiro_pagamento=hoje).count(), len(pendentes))
+        self.assertContadoresEmDia()
+
+        resultados = lote.registrar_pagamentos(pendentes[:1], 1, hoje, usuario)
+        self.assertEqual(resultados[pendentes[0]], (lote.JA_FEITO, hoje))
+
+    def test_ativacao_de_videos_em_lote(self):
+        usuario = User.objects.create_user("operador")
+        desligados = Video.objects.filter(status=False)
+        sem_vencimento = list(
+            desligados.filter(contrato__data_vencimento_contrato__isnull=True).values_list("pk", flat=True)[:4]
+        )
+        com_vencimento = desligados.filter(contrato__data_vencimento_contrato__isnull=False).first()
+        ligado = Video.objects.filter(status=True).first()
+        data = timezone.now().date() - timedelta(days=3)
+        pedidos = sem_vencimento + [com_vencimento.pk, ligado.pk]
+        vencimento_antes = com_vencimento.contrato.data_vencimento_contrato
+
+        # vídeos (lock), UPDATE dos vídeos, vigências, UPDATE dos contratos + savepoint
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(6):
+            resultados = lote.ativar_videos(pedidos, data, usuario)
+        self.assertEqual(resultados[ligado.pk], (lote.JA_FEITO, ligado.data_subiu))
+        self.assertEqual(Video.objects.filter(pk__in=pedidos[:-1], status=True, data_subiu=data).count(), 5)
+        for contrato in Contrato.objects.filter(videos__in=sem_vencimento).distinct():
+            self.assertEqual(contrato.data_vencimento_contrato, videos.vencimento_pelo_video(data, contrato.vigencia_meses))
+        com_vencimento.contrato.refresh_from_db()
+        self.assertEqual(com_vencimento.contrato.data_vencimento_contrato, vencimento_antes)
+        self.assertContadoresEmDia()
+
+
+def _linha_cnab(segmento, campos):
+    # linha de detalhe CNAB 240 com os campos nas posições (1-based, inclusivas) do layout
+    linha = list("0010001" + "3" + "00001" + segmento.ljust(1) + " " * 226)
+    for (inicio, fim), valor in campos.items():
+        linha[inicio - 1:fim] = str(valor).rjust(fim - inicio + 1, "0")
+    return "".join(linha)
+
+
+class VencimentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(60)
+
+    def test_faixas_cobrem_os_contratos_e_paginas_batem_com_contagem(self):
+        faixas = vencimentos.contar_faixas()
+        self.assertEqual(sum(f["total"] for f in faixas), vencimentos.contratos_com_vencimento().count())
+
+        for faixa in faixas:
+            vistos, apos = [], None
+            while True:
+                with self.assertNumQueries(1):
+                    pagina = vencimentos.pagina_da_faixa(faixa["chave"], apos=apos, por_pagina=4)
+                vistos.extend(linha["id_contrato"] for linha in pagina)
+                if not pagina.has_next():
+                    break
+                apos = pagina.next_cursor
+            self.assertEqual(len(vistos), faixa["total"], faixa["chave"])
+            self.assertEqual(len(set(vistos)), len(vistos))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class ProcessarVencimentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(40)
+        cls.usuario = User.objects.create_user("cron")
+
+    def test_renova_em_lote_e_expira_o_restante(self):
+        dia = vencimentos.hoje() + timedelta(days=400)  # tudo vencido
+        com_vencimento = vencimentos.contratos_com_vencimento()
+        automaticos = list(com_vencimento.values_list("cliente_id", flat=True).distinct()[:3])
+        Cliente.objects.filter(pk__in=automaticos).update(renovacao_automatica=True)
+
+        simulado = renovacao.processar_vencimentos(dia, usuario=self.usuario, simular=True)
+        self.assertFalse(Contrato.objects.filter(status__nome_status=renovacao.STATUS_EXPIRADO).exists())
+
+        resultado = renovacao.processar_vencimentos(dia, usuario=self.usuario, tamanho_lote=3)
+        self.assertEqual(simulado, resultado)
+        self.assertTrue(resultado.renovados and resultado.expirados)
+        for item in resultado.renovados:
+            contrato = Contrato.objects.get(pk=item.contrato_id)
+            self.assertEqual(contrato.data_vencimento_contrato, item.novo_vencimento)
+            self.assertGreaterEqual(contrato.data_vencimento_contrato, dia)
+            self.assertEqual(contrato.updated_by, self.usuario)
+        self.assertEqual(
+            set(resultado.expirados),
+            set(com_vencimento.filter(status__nome_status=renovacao.STATUS_EXPIRADO).values_list("pk", flat=True)),
+        )
+
+        # idempotente; e um contrato expirado volta a valer se o cliente passar a renovar
+        self.assertEqual(renovacao.processar_vencimentos(dia), ([], []))
+        expirado = Contrato.objects.get(pk=resultado.expirados[0])
+        Cliente.objects.filter(pk=expirado.cliente_id).update(renovacao_automatica=True)
+        renovacao.processar_vencimentos(dia)
+        expirado.refresh_from_db()
+        self.assertEqual(expirado.status.nome_status, renovacao.STATUS_ATIVO)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class OcupacaoTelasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(60)
+
+    def _forca_bruta(self, inicio, dias):
+        # a mesma conta direto nos vídeos, dia a dia
+        series = {}
+        for video in Video.objects.select_related("contrato"):
+            periodo = ocupacao.intervalo_do_video(
+                video.status, video.data_subiu,
+                video.contrato.data_vencimento_contrato, video.contrato.data_cancelamento_contrato,
+            )
+            if not periodo:
+                continue
+            serie = series.setdefault(video.local_id, [0] * dias)
+            for i in range(dias):
+                dia = inicio + timedelta(days=i)
+                if periodo[0] <= dia and (periodo[1] is None or dia <= periodo[1]):
+                    serie[i] += ocupacao.segundos_do_video(video.tempo_video)
+        return {pk: serie for pk, serie in series.items() if any(serie)}
+
+    def _confere(self):
+        inicio = timezone.localdate() - timedelta(days=30)
+        with self.assertNumQueries(1):
+            series = ocupacao.ocupacao_diaria(inicio, 400)
+        self.assertEqual({pk: s for pk, s in series.items() if any(s)}, self._forca_bruta(inicio, 400))
+        hoje = ocupacao.ocupacao_no_dia()
+        self.assertEqual({pk: s for pk, s in hoje.items() if s}, {pk: s[30] for pk, s in series.items() if s[30]})
+
+    def test_indice_acompanha_ativacao_vencimento_e_exclusao(self):
+        self.assertTrue(IntervaloOcupacao.objects.exists())
+        self._confere()
+
+        desligados = list(Video.objects.filter(status=False).values_list("pk", flat=True)[:5])
+        with self.captureOnCommitCallbacks(execute=True):
+            lote.ativar_videos(desligados, timezone.localdate() - timedelta(days=10), None)
+        self.assertEqual(IntervaloOcupacao.objects.filter(video_id__in=desligados).count(), 5)
+        self._confere()
+
+        contrato = Contrato.objects.filter(videos__status=True).first()
+        contrato.data_cancelamento_contrato = timezone.localdate() + timedelta(days=20)
+        with self.captureOnCommitCallbacks(execute=True):
+            contrato.save()
+        self._confere()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.filter(pk=desligados[0]).delete()
+        self._confere()
+
+        IntervaloOcupacao.objects.all().delete()
+        ocupacao.reconstruir(tamanho_lote=7)
+        self._confere()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class ManifestosTelasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(60)
+
+    def _esperado(self, dia):
+        # playlist direto dos vídeos: no ar no dia, na ordem em que subiram
+        esperado = {}
+        for video in Video.objects.select_related("contrato__cliente").order_by("data_subiu", "pk"):
+            periodo = ocupacao.intervalo_do_video(
+                video.status, video.data_subiu,
+                video.contrato.data_vencimento_contrato, video.contrato.data_cancelamento_contrato,
+            )
+            if periodo and periodo[0] <= dia and (periodo[1] is None or dia <= periodo[1]):
+                esperado.setdefault(video.local_id, []).append(
+                    (video.pk, video.contrato.cliente.razao_social, ocupacao.segundos_do_video(video.tempo_video))
+                )
+        return esperado
+
+    def _gravado(self):
+        gravado = {}
+        for manifesto in ManifestoLocal.objects.all():
+            with manifesto.arquivo_json.open("rb") as arquivo:
+                dados = json.load(arquivo)
+            self.assertEqual([v["ordem"] for v in dados["videos"]], list(range(1, len(dados["videos"]) + 1)))
+            if dados["videos"]:
+                gravado[manifesto.local_id] = [(v["video"], v["cliente"], v["segundos"]) for v in dados["videos"]]
+        return gravado
+
+    def test_regera_so_as_telas_alteradas(self):
+        telas = Local.objects.count()
+        with self.assertNumQueries(4):
+            resultado = manifestos.gerar()
+        self.assertEqual(len(resultado.gerados), telas)
+        self.assertEqual(self._gravado(), self._esperado(timezone.localdate()))
+
+        # nada mudou: nenhum arquivo regravado, mesmas queries para todas as telas
+        with self.assertNumQueries(3):
+            self.assertEqual(manifestos.gerar().gerados, [])
+
+        antes = dict(ManifestoLocal.objects.values_list("local_id", "gerado_em"))
+        video = Video.objects.filter(status=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            lote.ativar_videos([video.pk], timezone.localdate(), None)
+        depois = dict(ManifestoLocal.objects.values_list("local_id", "gerado_em"))
+        self.assertEqual([pk for pk, gerado_em in depois.items() if gerado_em != antes[pk]], [video.local_id])
+        self.assertEqual(self._gravado(), self._esperado(timezone.localdate()))
+
+        # vencimento sem evento: a geração diária tira os vídeos vencidos
+        dia = timezone.localdate() + timedelta(days=200)
+        self.assertTrue(manifestos.gerar(dia=dia).gerados)
+        self.assertEqual(self._gravado(), self._esperado(dia))
+
+        # regravação troca o arquivo no lugar: mesmo nome, sem temporários sobrando
+        manifestos.gerar(forcar=True)
+        self.assertEqual(
+            set(ManifestoLocal.objects.values_list("arquivo_json", flat=True)),
+            {manifestos.caminho(local_id, "json") for local_id in Local.objects.values_list("pk", flat=True)},
+        )
+        self.assertFalse([n for n in os.listdir(Path(MEDIA_TESTES) / manifestos.PASTA) if n.endswith(".tmp")])
+
+        self.client.force_login(User.objects.create_user("operador"))
+        resposta = self.client.get(reverse("manifesto_tela", kwargs={"pk": video.local_id, "formato": "csv"}))
+        conteudo = b"".join(resposta.streaming_content).decode("utf-8-sig")
+        self.assertTrue(conteudo.startswith("Ordem;Vídeo;Contrato;Cliente;Segundos"))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class CapacidadeTelasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(30)
+        cls.usuario = User.objects.create_superuser("comercial", "comercial@exemplo.com", "comercial")
+        cls.local = Local.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        carga = capacidade.carga_das_telas()[self.local.pk]["carga"]
+        Local.objects.filter(pk=self.local.pk).update(capacidade_segundos=carga + 60)
+        cache.clear()
+
+    def _formset(self, *videos):
+        dados = {"video-TOTAL_FORMS": len(videos), "video-INITIAL_FORMS": 0}
+        for i, (tempo, local) in enumerate(videos):
+            dados.update({f"video-{i}-tempo_video": tempo, f"video-{i}-local": local.pk})
+        return VideoFormSet(dados, prefix="video")
+
+    def test_formset_usa_carga_em_cache_e_recusa_excesso(self):
+        capacidade.carga_das_telas()
+        with CaptureQueriesContext(connection) as queries:
+            formset = self._formset(("00:00:40", self.local), ("00:00:30", self.local))
+            self.assertFalse(formset.is_valid())
+        # só a validação dos locais escolhidos: a carga vem do cache
+        self.assertFalse([q for q in queries.captured_queries if "core_video" in q["sql"]])
+        self.assertIn("70s pedidos, mas restam 60s", formset.non_form_errors()[0])
+        self.assertTrue(self._formset(("00:00:40", self.local)).is_valid())
+        self.assertIn("(restam 60s)", str(formset.forms[0]["local"]))
+
+    def test_video_novo_consome_capacidade(self):
+        contrato = Contrato.objects.filter(data_cancelamento_contrato__isnull=True).first()
+        self.client.force_login(self.usuario)
+        url = reverse("video_create_modal", kwargs={"contrato_id": contrato.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"tempo_video": 50, "local": self.local.pk})
+        self.assertEqual(capacidade.restante(capacidade.carga_das_telas()[self.local.pk]), 10)
+
+        videos_antes = Video.objects.count()
+        self.client.post(url, {"tempo_video": 20, "local": self.local.pk})
+        self.assertEqual(Video.objects.count(), videos_antes)
+        self.assertContains(self.client.get(reverse("contrato_detail", kwargs={"pk": contrato.pk})), "restam 10s")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class DocumentosPorConteudoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(5)
+        cls.contratos = list(Contrato.objects.order_by("pk")[:3])
+
+    def _anexar(self, contrato, nome, conteudo):
+        return DocumentoContrato.objects.create(contrato=contrato, arquivo=SimpleUploadedFile(nome, conteudo))
+
+    def test_mesmo_arquivo_e_gravado_uma_vez_e_apagado_com_a_ultima_referencia(self):
+        conteudo = os.urandom(200_000)
+        primeiro = self._anexar(self.contratos[0], "Contrato Assinado.PDF", conteudo)
+        segundo = self._anexar(self.contratos[1], "assinado (1).pdf", conteudo)
+        outro = self._anexar(self.contratos[2], "outro.pdf", os.urandom(1000))
+
+        self.assertEqual(primeiro.arquivo.name, segundo.arquivo.name)
+        self.assertTrue(primeiro.arquivo.name.startswith("documentos/") and primeiro.arquivo.name.endswith(".pdf"))
+        self.assertNotEqual(outro.arquivo.name, primeiro.arquivo.name)
+        self.assertEqual((primeiro.filename, segundo.filename), ("Contrato Assinado.PDF", "assinado (1).pdf"))
+        self.assertEqual(documentos.referencias(primeiro.arquivo.name), 2)
+        storage = primeiro.arquivo.storage
+        with storage.open(primeiro.arquivo.name) as arquivo:
+            self.assertEqual(arquivo.read(), conteudo)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primeiro.delete()
+        self.assertTrue(storage.exists(segundo.arquivo.name))
+        # exclusão em cascata (contrato) também solta a referência
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contratos[1].delete()
+        self.assertFalse(storage.exists(segundo.arquivo.name))
+        self.assertTrue(storage.exists(outro.arquivo.name))
+        # o bloqueio do arquivo apagado sai junto; o do arquivo em uso fica
+        self.assertEqual(list(BloqueioArquivo.objects.values_list("nome", flat=True)), [outro.arquivo.name])
+
+        # referência gravada sob o bloqueio: o conteúdo volta a ser gravado
+        terceiro = self._anexar(self.contratos[2], "de novo.pdf", conteudo)
+        self.assertEqual(terceiro.arquivo.name, segundo.arquivo.name)
+        with storage.open(terceiro.arquivo.name) as arquivo:
+            self.assertEqual(arquivo.read(), conteudo)
+
+    def test_upload_e_lido_e_hasheado_uma_vez(self):
+        with mock.patch("core.storage.hashlib.sha256", wraps=hashlib.sha256) as sha256:
+            documento = self._anexar(self.contratos[0], "novo.pdf", os.urandom(300_000))
+        self.assertEqual(sha256.call_count, 1)
+        self.assertTrue(documento.arquivo.storage.exists(documento.arquivo.name))
+
+    def test_download_autenticado_com_range_e_condicional(self):
+        conteudo = os.urandom(100_000)
+        documento = self._anexar(self.contratos[0], "escaneado.pdf", conteudo)
+        url = reverse("documento_download", kwargs={"pk": documento.pk})
+        self.assertEqual(self.client.get(url).status_code, 302)  # login
+
+        self.client.force_login(User.objects.create_user("financeiro"))
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b"".join(resposta.streaming_content), conteudo)
+        self.assertEqual(resposta["Content-Type"], "application/pdf")
+        self.assertEqual(resposta["Accept-Ranges"], "bytes")
+        etag = resposta["ETag"]
+        self.assertIn(etag.strip('"'), documento.arquivo.name)
+
+        parcial = self.client.get(url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b"".join(parcial.streaming_content), conteudo[10:20])
+        self.assertEqual(parcial["Content-Range"], "bytes 10-19/100000")
+        self.assertEqual(b"".join(self.client.get(url, HTTP_RANGE="bytes=-5").streaming_content), conteudo[-5:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=100000-").status_code, 416)
+        # If-Range de outra versão: vai o arquivo inteiro
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"outro"').status_code, 200)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta["Last-Modified"]).status_code, 304)
+
+        with override_settings(DOCUMENTOS_SENDFILE="x-accel-redirect"):
+            proxy = self.client.get(url)
+        self.assertEqual(proxy["X-Accel-Redirect"], "/media-protegida/" + documento.arquivo.name)
+        self.assertEqual(proxy.content, b"")
+
+    def test_deduplicar_documentos_antigos(self):
+        # arquivos do formato anterior (contratos/contrato_<id>/...), duas cópias iguais
+        storage = documentos.armazenamento_documentos
+        conteudo = os.urandom(5000)
+        antigos = [f"contratos/contrato_{contrato.pk}/contrato.pdf" for contrato in self.contratos[:2]]
+        for antigo in antigos:
+            Path(storage.path(antigo)).parent.mkdir(parents=True, exist_ok=True)
+            Path(storage.path(antigo)).write_bytes(conteudo)
+        legado = [
+            DocumentoContrato.objects.create(contrato=contrato, arquivo=antigo)
+            for contrato, antigo in zip(self.contratos, antigos)
+        ]
+
+        resultado = documentos.deduplicar(tamanho_lote=1)
+        self.assertEqual((resultado.migrados, resultado.removidos), (2, 2))
+        nomes = {d.arquivo.name for d in DocumentoContrato.objects.filter(pk__in=[d.pk for d in legado])}
+        self.assertEqual(len(nomes), 1)
+        self.assertTrue(nomes.pop().startswith("documentos/"))
+        self.assertFalse(any(storage.exists(antigo) for antigo in antigos))
+        self.assertEqual(DocumentoContrato.objects.get(pk=legado[0].pk).filename, "contrato.pdf")
+        self.assertEqual(documentos.deduplicar().migrados, 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class RetornoBancarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(30)
+        cls.usuario = User.objects.create_user("banco")
+
+    def _cnab(self, titulos):
+        linhas = ["0" * 240]  # header do arquivo (ignorado)
+        for contrato_id, valor, data in titulos:
+            linhas.append(_linha_cnab("T", {(59, 73): contrato_id}))
+            linhas.append(_linha_cnab("U", {(78, 92): int(valor * 100), (146, 153): data.strftime("%d%m%Y")}))
+        return io.BytesIO(("\r\n".join(linhas) + "\r\n").encode("latin-1"))
+
+    def test_cnab_conciliado_e_aplicado(self):
+        contrato = Contrato.objects.filter(primeiro_pagamento__isnull=True).first()
+        hoje = timezone.now().date()
+        arquivo = self._cnab([
+            (contrato.pk, contrato.valor_mensalidade, hoje),
+            (contrato.pk, contrato.valor_mensalidade, hoje),
+            (contrato.pk, contrato.valor_mensalidade, hoje),
+            (999999, 10, hoje),
+        ])
+
+        resultados = retorno_bancario.conciliar(retorno_bancario.ler_retorno(arquivo))
+        self.assertEqual(
+            [(item["situacao"], item["parcela"]) for item in resultados],
+            [(retorno_bancario.OK, 1), (retorno_bancario.OK, 2), (retorno_bancario.JA_PAGO, None),
+             (retorno_bancario.NAO_ENCONTRADO, None)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alterados = retorno_bancario.aplicar(retorno_bancario.pagamentos_a_aplicar(resultados), self.usuario)
+        contrato.refresh_from_db()
+        self.assertEqual(alterados, 1)
+        self.assertEqual((contrato.primeiro_pagamento, contrato.segundo_pagamento), (hoje, hoje))
+        self.assertEqual(ler_contadores(), contar_pendencias())
+
+    def test_csv_valor_menor(self):
+        contrato = Contrato.objects.filter(primeiro_pagamento__isnull=True).first()
+        arquivo = io.BytesIO(
+            f"Contrato;Valor Pago;Data Pagamento\n{contrato.pk};1,00;01/10/2026\nabc;;\n".encode("utf-8-sig")
+        )
+        resultados = retorno_bancario.conciliar(retorno_bancario.ler_retorno(arquivo))
+        self.assertEqual(
+            [item["situacao"] for item in resultados], [retorno_bancario.VALOR_MENOR, retorno_bancario.INVALIDA]
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class ExportacaoContratosTests(TestCase):
+    # mais contratos que um lote do iterator: o prefetch dos vídeos roda por lote
+    CONTRATOS = TAMANHO_LOTE + 20
+
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(cls.CONTRATOS)
+        cls.usuario = User.objects.create_user("exportador")
+        cls.sem_video = Contrato.objects.filter(videos__isnull=False).order_by("pk").first()
+        cls.sem_video.videos.all().delete()
+
+    def _esperado(self):
+        # cada contrato lido sozinho, sem prefetch, na ordem da exportação
+        return [
+            exportacao.linha_contrato(Contrato.objects.get(pk=pk))
+            for pk in exportacao.contratos_para_exportacao({}).values_list("pk", flat=True)
+        ]
+
+    def test_csv_em_streaming_agrega_videos_por_lote(self):
+        self.client.force_login(self.usuario)
+        with CaptureQueriesContext(connection) as queries:
+            resposta = self.client.get(reverse("contratos_export_direto"), {"formato": "csv"})
+            conteudo = b"".join(resposta.streaming_content).decode("utf-8")
+        self.assertEqual(resposta["Content-Type"], "text/csv; charset=utf-8")
+        self.assertTrue(conteudo.startswith("\ufeff"))
+
+        linhas = list(csv.reader(io.StringIO(conteudo.lstrip("\ufeff")), delimiter=";"))
+        self.assertEqual(linhas[0], exportacao.COLUNAS)
+        self.assertEqual(len(linhas) - 1, Contrato.objects.count())
+        self.assertEqual(conteudo, "".join(exportacao.gerar_csv(self._esperado())))
+
+        por_id = {linha[0]: dict(zip(exportacao.COLUNAS, linha)) for linha in linhas[1:]}
+        self.assertEqual(por_id[str(self.sem_video.id_contrato)]["Status Vídeos"], "Sem vídeo")
+        contrato = Contrato.objects.filter(videos__isnull=False).order_by("pk").first()
+        self.assertEqual(
+            len(por_id[str(contrato.id_contrato)]["Status Vídeos"].split(", ")), contrato.videos.count()
+        )
+
+        # um SELECT de vídeos por lote do iterator, não um para a tabela toda
+        videos = [q for q in queries.captured_queries if 'FROM "core_video"' in q["sql"]]
+        self.assertEqual(len(videos), math.ceil(Contrato.objects.count() / TAMANHO_LOTE))
+
+    def test_xlsx_direto(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse("contratos_export_direto"))
+        planilha = load_workbook(io.BytesIO(b"".join(resposta.streaming_content)), read_only=True)
+        linhas = [list(linha) for linha in planilha.active.iter_rows(values_only=True)]
+        self.assertEqual(linhas[0], exportacao.COLUNAS)
+        self.assertEqual(len(linhas) - 1, Contrato.objects.count())
+        esperado = self._esperado()
+        self.assertEqual([linha[0] for linha in linhas[1:]], [linha[0] for linha in esperado])
+        self.assertEqual(linhas[1][23:26], [valor or None for valor in esperado[0][23:26]])
+
+    def test_jobs_csv_e_xlsx_do_inicio_ao_fim(self):
+        total = Contrato.objects.count()
+        esperado = self._esperado()
+        for formato in ("csv", "xlsx"):
+            with self.subTest(formato=formato):
+                job = exportacao.enfileirar_exportacao({"formato": formato}, formato, self.usuario)
+                reservado = exportacao.reservar_proxima_exportacao()
+                self.assertEqual((reservado.pk, reservado.status), (job.pk, ExportacaoContratos.PROCESSANDO))
+                self.assertIsNone(exportacao.reservar_proxima_exportacao())
+
+                exportacao.processar_exportacao(reservado)
+                job.refresh_from_db()
+                self.assertEqual(job.status, ExportacaoContratos.CONCLUIDA, job.erro)
+                self.assertEqual((job.total, job.processados, job.percentual), (total, total, 100))
+                with job.arquivo.open("rb") as arquivo:
+                    conteudo = arquivo.read()
+                if formato == "csv":
+                    self.assertEqual(conteudo.decode("utf-8"), "".join(exportacao.gerar_csv(esperado)))
+                else:
+                    linhas = list(load_workbook(io.BytesIO(conteudo), read_only=True).active.iter_rows(values_only=True))
+                    self.assertEqual(list(linhas[0]), exportacao.COLUNAS)
+                    self.assertEqual([linha[0] for linha in linhas[1:]], [linha[0] for linha in esperado])
+
+                self.client.force_login(self.usuario)
+                resposta = self.client.get(reverse("exportacao_download", kwargs={"pk": job.pk}))
+                self.assertEqual(b"".join(resposta.streaming_content), conteudo)
+
+    def test_job_travado_volta_para_a_fila_e_arquivos_antigos_sao_apagados(self):
+        agora = timezone.now()
+        travado = exportacao.enfileirar_exportacao({}, "csv", self.usuario)
+        ativo = exportacao.enfileirar_exportacao({}, "csv", self.usuario)
+        ExportacaoContratos.objects.filter(pk=travado.pk).update(
+            status=ExportacaoContratos.PROCESSANDO, iniciado_em=agora - timedelta(hours=2),
+            updated_at=agora - timedelta(hours=1), processados=500,
+        )
+        ExportacaoContratos.objects.filter(pk=ativo.pk).update(
+            status=ExportacaoContratos.PROCESSANDO, iniciado_em=agora - timedelta(hours=2), updated_at=agora,
+        )
+        reservado = exportacao.reservar_proxima_exportacao()
+        self.assertEqual(reservado.pk, travado.pk)
+        self.assertEqual(reservado.processados, 0)
+        self.assertIsNone(exportacao.reservar_proxima_exportacao())
+
+        antiga, recente = reservado, exportacao.enfileirar_exportacao({}, "csv", self.usuario)
+        for job in (antiga, recente):
+            job.arquivo.save(f"exportacao_{job.pk}.csv", ContentFile(b"x"), save=False)
+            job.status, job.concluido_em = ExportacaoContratos.CONCLUIDA, agora
+            job.save()
+        ExportacaoContratos.objects.filter(pk=antiga.pk).update(
+            concluido_em=agora - timedelta(days=settings.EXPORTACAO_RETENCAO_DIAS + 1)
+        )
+        caminho_antigo = antiga.arquivo.path
+
+        self.assertEqual(exportacao.limpar_exportacoes_antigas(), 1)
+        self.assertFalse(os.path.exists(caminho_antigo))
+        antiga.refresh_from_db()
+        recente.refresh_from_db()
+        self.assertFalse(antiga.arquivo)
+        self.assertTrue(os.path.exists(recente.arquivo.path))
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse("exportacao_download", kwargs={"pk": antiga.pk})).status_code, 404)
+        self.assertIsNone(self.client.get(reverse("exportacao_status", kwargs={"pk": antiga.pk})).json()["download_url"])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class ImportacaoContratosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(30)
+        cls.usuario = User.objects.create_user("importador")
+
+    def _planilha(self, extras=()):
+        # o próprio relatório de exportação, mais as linhas extras
+        linhas = list(exportacao.linhas_contratos(exportacao.contratos_para_exportacao({})))
+        conteudo = "".join(exportacao.gerar_csv(linhas + list(extras)))
+        return io.BytesIO(conteudo.encode("utf-8")), linhas
+
+    def test_reimporta_exportacao_em_lotes(self):
+        videos_antes = Video.objects.count()
+        clientes_antes = Cliente.objects.count()
+        contrato = Contrato.objects.filter(videos__isnull=False).first()
+        modelo = list(exportacao.linha_contrato(contrato))
+        novo = modelo[:2] + ["123.456.789-09"] + modelo[3:]
+        invalida = modelo[:7] + ["Vendedor que não existe"] + modelo[8:]
+        arquivo, linhas = self._planilha([novo, invalida, novo])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = importacao.importar(importacao.ler_planilha(arquivo, "contratos.csv"), self.usuario, tamanho_lote=7)
+
+        self.assertEqual(resultado.linhas, len(linhas) + 3)
+        self.assertEqual(resultado.contratos, len(linhas) + 2)
+        # os CPFs exportados já existem; o novo aparece em dois lotes e vira um cliente só
+        self.assertEqual(resultado.clientes, 1)
+        self.assertEqual(Cliente.objects.count(), clientes_antes + 1)
+        self.assertEqual(Video.objects.count(), videos_antes * 2 + 2 * contrato.videos.count())
+        self.assertEqual([numero for numero, _, _ in resultado.erros], [len(linhas) + 3])
+        self.assertIn("Vendedor não cadastrado", resultado.erros[0][2][0])
+        self.assertEqual(ler_contadores(), contar_pendencias())
+
+        relatorio = io.StringIO()
+        importacao.escrever_relatorio(relatorio, resultado.erros)
+        cabecalho, linha = relatorio.getvalue().splitlines()
+        self.assertTrue(cabecalho.startswith("Linha;Erros;ID Contrato"))
+        self.assertIn("Vendedor que não existe", linha)
+
+    def test_job_le_a_planilha_uma_vez(self):
+        arquivo, linhas = self._planilha()
+        job = importacao.enfileirar_importacao(SimpleUploadedFile("contratos.csv", arquivo.getvalue()), self.usuario)
+        reservado = importacao.reservar_proxima_importacao()
+        self.assertEqual(reservado.pk, job.pk)
+
+        with mock.patch.object(importacao, "ler_planilha", wraps=importacao.ler_planilha) as ler_planilha, \
+                self.captureOnCommitCallbacks(execute=True):
+            importacao.processar_importacao(reservado)
+        self.assertEqual(ler_planilha.call_count, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportacaoContratos.CONCLUIDA, job.erro)
+        self.assertEqual((job.total, job.processados, job.contratos_criados), (len(linhas),) * 3)
+
+    def test_total_estimado_pela_posicao_no_arquivo(self):
+        job = ImportacaoContratos.objects.create(created_by=self.usuario, arquivo="importacoes/teste.csv")
+        arquivo = io.BytesIO(b"x" * 1000)
+        progresso = importacao._progresso_pela_posicao(job, arquivo, 1000)
+        arquivo.seek(250)
+        progresso(10)
+        job.refresh_from_db()
+        self.assertEqual((job.processados, job.total), (10, 40))
+        arquivo.seek(1000)
+        progresso(37)
+        job.refresh_from_db()
+        self.assertEqual((job.processados, job.total), (37, 37))
+
+    def test_cabecalho_invalido(self):
+        with self.assertRaises(importacao.ArquivoImportacaoInvalido):
+            list(importacao.ler_planilha(io.BytesIO(b"Contrato;Valor\n1;2\n"), "contratos.csv"))
@@ -3,23 +3,35 @@ from . import views
 
 urlpatterns = [
     path("contratos/novo/", views.contrato_create, name="contrato_create"),
+    path("clientes/autocomplete/", views.cliente_autocomplete, name="cliente_autocomplete"),
     path("contratos/", views.contrato_list, name="contratos_list"),
     path("contrato/<int:pk>/", views.contrato_detail, name="contrato_detail"),
     path("", views.contrato_list, name="home"),
     path("contratos/vencimentos/", views.contratos_vencendo, name="contratos_vencendo"),
+    path("contratos/vencimentos/<str:faixa>/mais/", views.vencimentos_fragmento, name="vencimentos_fragmento"),
     path("contratos/<int:pk>/renovar/", views.renovar_contrato, name="renovar_contrato"),
 
     # Pendências globais
     path("pendencias/video/", views.pendencias_video, name="pendencias_video"),
     path("pendencias/pagamento/", views.pendencias_pagamento, name="pendencias_pagamento"),
+    path("pendencias/<str:fila>/mais/", views.pendencias_fragmento, name="pendencias_fragmento"),
     path("cobranca/<int:contrato_id>/gerar/", views.marcar_cobranca_gerada, name="marcar_cobranca_gerada"),
+    path("cobranca/lote/", views.cobranca_em_lote, name="cobranca_em_lote"),
+    path("pagamento/lote/", views.pagamento_em_lote, name="pagamento_em_lote"),
+    path("pagamento/retorno/", views.retorno_importar, name="retorno_importar"),
+    path("pagamento/retorno/aplicar/", views.retorno_aplicar, name="retorno_aplicar"),
 
 
     # Ações
     path("contrato/<int:video_id>/ativar_video/", views.ativar_video, name="ativar_video"),
+    path("videos/ativar/lote/", views.ativar_videos_em_lote, name="ativar_videos_em_lote"),
+    path("telas/ocupacao/", views.ocupacao_telas, name="ocupacao_telas"),
+    path("telas/manifestos/", views.manifestos_telas, name="manifestos_telas"),
+    path("telas/<int:pk>/manifesto/<str:formato>/", views.manifesto_tela, name="manifesto_tela"),
     path("contrato/<int:contrato_id>/marcar_pagamento/<int:parcela>/", views.marcar_pagamento, name="marcar_pagamento"),
 
-    # Exclusão de documento
+    # Download e exclusão de documento
+    path("documento/<int:pk>/", views.documento_download, name="documento_download"),
     path("documento/<int:pk>/delete/", views.documento_delete, name="documento_delete"),
 
     #video novo
@@ -28,6 +40,14 @@ urlpatterns = [
     path("dashboard/", views.dashboard_view, name="dashboard"),
 
     path("contratos/exportar/", views.exportar_contratos_excel, name="contratos_export"),
+    path("contratos/exportar/direto/", views.exportar_contratos_direto, name="contratos_export_direto"),
+    path("exportacoes/<int:pk>/", views.exportacao_detail, name="exportacao_detail"),
+    path("exportacoes/<int:pk>/status/", views.exportacao_status, name="exportacao_status"),
+    path("exportacoes/<int:pk>/download/", views.exportacao_download, name="exportacao_download"),
+    path("contratos/importar/", views.contratos_importar, name="contratos_importar"),
+    path("importacoes/<int:pk>/", views.importacao_detail, name="importacao_detail"),
+    path("importacoes/<int:pk>/status/", views.importacao_status, name="importacao_status"),
+    path("importacoes/<int:pk>/relatorio/", views.importacao_relatorio, name="importacao_relatorio"),
     path("contratos/<int:contrato_id>/adicionar-registro/", views.criar_contrato_registro, name="criar_contrato_registro"),
 
 ]
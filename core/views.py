@@ -1,7 +1,8 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator
-from .models import Contrato, Vendedor, Local, Cliente, StatusContrato, DocumentoContrato, Video, Registro
-from .forms import ClienteForm, ContratoForm, DocumentoContratoForm, VideoFormSet, VideoForm, ContratoRegistroForm
+from .pagination import PaginadorCursor
+from .downloads import resposta_arquivo
+from .models import Contrato, Vendedor, Local, Cliente, StatusContrato, DocumentoContrato, Video, Registro, ExportacaoContratos, ImportacaoContratos, ManifestoLocal
+from .forms import ClienteForm, ContratoForm, DocumentoContratoForm, VideoFormSet, VideoForm, ContratoRegistroForm, ImportacaoContratosForm
 from django.contrib import messages
 from django.shortcuts import redirect
 from dateutil.relativedelta import relativedelta
@@ -9,13 +10,17 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
-from django.db.models import Q, Count
 from core.services import dashboard as dashboard_service
-from django.http import HttpResponse
-import pandas as pd
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.urls import reverse
+from core.services import exportacao, importacao, autocomplete, detalhe, pendencias, lote, retorno_bancario, vencimentos, ocupacao, capacidade, manifestos
+from core.services.filtros import filtrar_contratos
+from core.services.listagem import linhas_lista_contratos
+import tempfile
 from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.db.models import F
 
 
 @login_required
@@ -36,46 +41,18 @@ def contrato_list(request):
     except ValueError:
         itens_por_pagina = 10
 
-    # 🔄 Consulta principal
-    contratos = (
-        Contrato.objects
-        .select_related("cliente", "vendedor", "status")   # FK/OneToOne
-        .prefetch_related("videos__local")                 # ManyToMany / OneToMany
-        .all()
-    )
-
-    # Aplicando filtros
-    if query_nome:
-        contratos = contratos.filter(cliente__razao_social__icontains=query_nome)
-    if query_cnpj:
-        contratos = contratos.filter(cliente__cpf_cnpj__icontains=query_cnpj)
-    if query_vendedor:
-        contratos = contratos.filter(vendedor_id=query_vendedor)
-    if query_local:
-        contratos = contratos.filter(videos__local_id=query_local).distinct()
-
-    # Datas com validação
-    if query_data_inicio:
-        try:
-            data_inicio = datetime.strptime(query_data_inicio, "%Y-%m-%d").date()
-            contratos = contratos.filter(data_assinatura__gte=data_inicio)
-        except ValueError:
-            pass
-    if query_data_fim:
-        try:
-            data_fim = datetime.strptime(query_data_fim, "%Y-%m-%d").date()
-            contratos = contratos.filter(data_assinatura__lte=data_fim)
-        except ValueError:
-            pass
+    # 🔄 Consulta principal: filtros + projeção só com as colunas da tabela
+    # (datas inválidas são ignoradas)
+    contratos = linhas_lista_contratos(filtrar_contratos(Contrato.objects.all(), request.GET))
 
-    # 🔄 Paginação
-    paginator = Paginator(contratos, itens_por_pagina)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # 🔄 Paginação por cursor (sem COUNT/OFFSET; custo constante em qualquer página)
+    paginador = PaginadorCursor(contratos, ("-data_assinatura", "-id_contrato"), por_pagina=itens_por_pagina)
+    page_obj = paginador.pagina(apos=request.GET.get("apos"), antes=request.GET.get("antes"))
 
-    # 🔗 Preservando querystring (sem o parâmetro "page")
+    # 🔗 Preservando querystring (sem os parâmetros de cursor)
     params = request.GET.copy()
-    params.pop("page", None)
+    for chave in ("page", "apos", "antes"):
+        params.pop(chave, None)
     extra_query = "&" + params.urlencode() if params else ""
 
     context = {
@@ -227,18 +204,13 @@ def contrato_create(request):
 
 @login_required
 def contrato_detail(request, pk):
-    contrato = get_object_or_404(Contrato, pk=pk)
-    documentos = contrato.documentos.all()
-    videos = contrato.videos.all()
-    locais = Local.objects.all()  # Para popular o select no modal
+    # contrato + vídeos em poucas queries; documentos, registros e locais só
+    # são lidos se o fragmento em cache do template estiver desatualizado
+    dados = detalhe.carregar_detalhe(pk)
+    contrato = dados["contrato"]
     now = timezone.now()
 
-    # Preparar vídeos pendentes e ativos
-    videos_pendentes = videos.filter(status=False)
-    videos_ativos = videos.filter(status=True)
-
     # Flags para pendências
-    tem_video_pendente = videos_pendentes.exists()
     tem_cobranca_pendente = not contrato.cobranca_gerada
     tem_pagamento_pendente = contrato.cobranca_gerada and (
         not contrato.primeiro_pagamento or not contrato.segundo_pagamento
@@ -258,16 +230,10 @@ def contrato_detail(request, pk):
         form = DocumentoContratoForm()
 
     return render(request, "contratos/contrato_detail.html", {
-        "contrato": contrato,
-        "documentos": documentos,
+        **dados,
         "documento_form": form,
-        "videos": videos,
-        "videos_pendentes": videos_pendentes,
-        "videos_ativos": videos_ativos,
-        "tem_video_pendente": tem_video_pendente,
         "tem_cobranca_pendente": tem_cobranca_pendente,
         "tem_pagamento_pendente": tem_pagamento_pendente,
-        "locais": locais,
         "now": now,
     })
 
@@ -275,42 +241,31 @@ def contrato_detail(request, pk):
 
 @login_required
 def pendencias_video(request):
-    # Filtra contratos que têm pelo menos um vídeo OFF
-    # e que já possuem primeiro_pagamento
-    contratos = (
-        Contrato.objects.annotate(
-            videos_pendentes=Count("videos", filter=Q(videos__status=False))
-        )
-        .filter(videos_pendentes__gt=0, primeiro_pagamento__isnull=False)
-        .select_related("cliente")
-        .prefetch_related("videos")  # otimiza query dos vídeos
-    )
-
+    # Contratos que têm pelo menos um vídeo OFF e que já possuem primeiro_pagamento.
+    # Só o primeiro lote; os seguintes chegam por pendencias_fragmento (rolagem infinita)
+    contratos = pendencias.pagina_da_fila("video")
     return render(request, "pendencias/pendencias_video.html", {"contratos": contratos})
 
 
-# views.py
 @login_required
 def pendencias_pagamento(request):
-    # pendências de cobrança (cobrança ainda não gerada)
-    pendencias_cobranca = Contrato.objects.filter(
-        cobranca_gerada=False
-    ).select_related("cliente")
-
-    # pendências de pagamento (cobrança gerada, mas falta algum pagamento)
-    pendencias_pagamento = Contrato.objects.filter(
-        cobranca_gerada=True
-    ).filter(
-        Q(primeiro_pagamento__isnull=True) | Q(segundo_pagamento__isnull=True)
-    ).select_related("cliente")
-
     context = {
-        "pendencias_cobranca": pendencias_cobranca,
-        "pendencias_pagamento": pendencias_pagamento,
+        # pendências de cobrança (cobrança ainda não gerada)
+        "pendencias_cobranca": pendencias.pagina_da_fila("cobranca"),
+        # pendências de pagamento (cobrança gerada, mas falta algum pagamento)
+        "pendencias_pagamento": pendencias.pagina_da_fila("pagamento"),
     }
     return render(request, "pendencias/pendencias_pagamento.html", context)
 
 
+@login_required
+def pendencias_fragmento(request, fila):
+    # próximo lote de uma fila de pendência, em HTML, a partir do cursor ?apos=
+    if fila not in pendencias.FILAS:
+        raise Http404("Fila de pendência inexistente.")
+    pagina = pendencias.pagina_da_fila(fila, apos=request.GET.get("apos"))
+    return render(request, f"partials/_pendencias_{fila}.html", {"contratos": pagina, "pagina": pagina})
+
 
 @login_required
 def marcar_cobranca_gerada(request, contrato_id):
@@ -354,6 +309,125 @@ def marcar_pagamento(request, contrato_id, parcela):
 
 
 
+def _ids_selecionados(request, campo="contratos"):
+    ids = []
+    for valor in request.POST.getlist(campo):
+        if valor.isdigit():
+            ids.append(int(valor))
+    return ids
+
+
+def _mensagens_do_lote(request, resultados, acao, item="Contrato"):
+    # um resumo dos que foram alterados + uma linha para cada item que ficou de fora
+    marcados = [pk for pk, (situacao, _) in resultados.items() if situacao == lote.MARCADO]
+    if marcados:
+        messages.success(
+            request, f"✅ {acao} em {len(marcados)} {item.lower()}(s): " + ", ".join(f"#{pk:05d}" for pk in marcados)
+        )
+    for pk, (situacao, detalhe_lote) in resultados.items():
+        if situacao == lote.JA_FEITO:
+            quando = f" em {detalhe_lote:%d/%m/%Y}" if hasattr(detalhe_lote, "strftime") else ""
+            messages.warning(request, f"{item} #{pk:05d}: já estava registrado{quando}, não alterado.")
+        elif situacao == lote.NAO_ENCONTRADO:
+            messages.error(request, f"{item} #{pk:05d}: não encontrado.")
+
+
+@login_required
+@require_POST
+def cobranca_em_lote(request):
+    ids = _ids_selecionados(request)
+    if not ids:
+        messages.error(request, "❌ Selecione ao menos um contrato.")
+        return redirect("pendencias_pagamento")
+    resultados = lote.marcar_cobrancas_geradas(ids, request.user)
+    _mensagens_do_lote(request, resultados, "Cobrança marcada como gerada")
+    return redirect("pendencias_pagamento")
+
+
+@login_required
+@require_POST
+def pagamento_em_lote(request):
+    ids = _ids_selecionados(request)
+    try:
+        parcela = int(request.POST.get("parcela", ""))
+    except ValueError:
+        parcela = None
+    if not ids or parcela not in lote.CAMPOS_PARCELA:
+        messages.error(request, "❌ Selecione ao menos um contrato e a parcela.")
+        return redirect("pendencias_pagamento")
+
+    data = request.POST.get("data_pagamento")
+    try:
+        data_pagto = datetime.strptime(data, "%Y-%m-%d").date() if data else timezone.now().date()
+    except ValueError:
+        messages.error(request, "❌ Data de pagamento inválida.")
+        return redirect("pendencias_pagamento")
+
+    resultados = lote.registrar_pagamentos(ids, parcela, data_pagto, request.user)
+    _mensagens_do_lote(
+        request, resultados, f"{'Primeiro' if parcela == 1 else 'Segundo'} pagamento de {data_pagto:%d/%m/%Y} registrado"
+    )
+    return redirect("pendencias_pagamento")
+
+
+CHAVE_SESSAO_RETORNO = "retorno_bancario"
+LIMITE_PREVIA = 200  # linhas exibidas por tabela na prévia
+
+
+@login_required
+def retorno_importar(request):
+    # 1) upload do retorno -> prévia da conciliação (nada é gravado ainda)
+    contexto = {}
+    if request.method == "POST":
+        arquivo = request.FILES.get("arquivo")
+        if not arquivo:
+            messages.error(request, "❌ Selecione o arquivo de retorno.")
+            return redirect("retorno_importar")
+        try:
+            resultados = retorno_bancario.conciliar(retorno_bancario.ler_retorno(arquivo))
+        except retorno_bancario.ArquivoRetornoInvalido as exc:
+            messages.error(request, f"❌ {exc}")
+            return redirect("retorno_importar")
+
+        request.session[CHAVE_SESSAO_RETORNO] = {
+            "arquivo": arquivo.name,
+            "pagamentos": retorno_bancario.pagamentos_a_aplicar(resultados),
+        }
+        conciliados, problemas = [], []
+        for item in resultados:
+            if item["situacao"] == retorno_bancario.OK:
+                conciliados.append(item)
+            else:
+                item["motivo"] = retorno_bancario.SITUACOES[item["situacao"]]
+                problemas.append(item)
+        contexto = {
+            "arquivo": arquivo.name,
+            "resumo": [
+                (retorno_bancario.SITUACOES[situacao], total)
+                for situacao, total in retorno_bancario.resumo(resultados).items()
+            ],
+            "total_linhas": len(resultados),
+            "total_conciliados": len(conciliados),
+            "conciliados": conciliados[:LIMITE_PREVIA],
+            "total_problemas": len(problemas),
+            "problemas": problemas[:LIMITE_PREVIA],
+        }
+    return render(request, "pendencias/retorno_bancario.html", contexto)
+
+
+@login_required
+@require_POST
+def retorno_aplicar(request):
+    # 2) confirmação da prévia guardada na sessão
+    previa = request.session.pop(CHAVE_SESSAO_RETORNO, None)
+    if not previa or not previa["pagamentos"]:
+        messages.error(request, "❌ Nenhuma conciliação pendente. Envie o arquivo de retorno novamente.")
+        return redirect("retorno_importar")
+    alterados = retorno_bancario.aplicar(previa["pagamentos"], request.user)
+    messages.success(request, f"✅ Retorno {previa['arquivo']}: pagamentos registrados em {alterados} contrato(s).")
+    return redirect("pendencias_pagamento")
+
+
 @login_required
 def ativar_video(request, video_id):
     video = get_object_or_404(Video, pk=video_id)
@@ -381,6 +455,35 @@ def ativar_video(request, video_id):
 
 
 
+@login_required
+@require_POST
+def ativar_videos_em_lote(request):
+    ids = _ids_selecionados(request, "videos")
+    if not ids:
+        messages.error(request, "❌ Selecione ao menos um vídeo.")
+        return redirect("pendencias_video")
+
+    data = request.POST.get("data_subiu")
+    try:
+        data_subiu = datetime.strptime(data, "%Y-%m-%d").date() if data else timezone.now().date()
+    except ValueError:
+        messages.error(request, "❌ Data de upload inválida.")
+        return redirect("pendencias_video")
+
+    resultados = lote.ativar_videos(ids, data_subiu, request.user)
+    _mensagens_do_lote(request, resultados, f"Ativação (upload em {data_subiu:%d/%m/%Y})", item="Vídeo")
+    return redirect("pendencias_video")
+
+
+
+@login_required
+def documento_download(request, pk):
+    # ?download=1 baixa; sem ele, abre no navegador (o visualizador de PDF pede por Range)
+    documento = get_object_or_404(DocumentoContrato.objects.only("arquivo", "nome_original"), pk=pk)
+    return resposta_arquivo(
+        request, documento.arquivo, documento.filename, as_attachment=request.GET.get("download") == "1"
+    )
+
 
 @login_required
 def documento_delete(request, pk):
@@ -402,6 +505,10 @@ def video_create_modal(request, contrato_id):
 
         if tempo_segundos > 0 and local_id:
             local = get_object_or_404(Local, pk=local_id)
+            lotada = capacidade.excedentes({local.pk: tempo_segundos})
+            if lotada:
+                messages.error(request, "❌ " + " ".join(lotada))
+                return redirect("contrato_detail", pk=contrato.pk)
             video = Video.objects.create(
                 contrato=contrato,
                 tempo_video=timedelta(seconds=tempo_segundos),
@@ -418,16 +525,27 @@ def video_create_modal(request, contrato_id):
 
 @login_required
 def contratos_vencendo(request):
-    hoje = timezone.now().date()
-    # Pega contratos que têm data de vencimento e ainda não foram cancelados
-    contratos = (
-        Contrato.objects.filter(
-            data_vencimento_contrato__isnull=False,
-            data_cancelamento_contrato__isnull=True,
-        )
-        .order_by("data_vencimento_contrato")
-    )
-    return render(request, "contratos/contratos_vencendo.html", {"contratos": contratos, "hoje": hoje})
+    faixas = vencimentos.contar_faixas()
+    faixa = request.GET.get("faixa")
+    if faixa not in vencimentos.FAIXAS:
+        # abre na faixa mais urgente que tiver contratos
+        faixa = next((f["chave"] for f in faixas if f["total"]), "vencidos")
+    pagina = vencimentos.pagina_da_faixa(faixa, apos=request.GET.get("apos"))
+    return render(request, "contratos/contratos_vencendo.html", {
+        "faixas": faixas,
+        "faixa": faixa,
+        "contratos": pagina,
+        "pagina": pagina,
+    })
+
+
+@login_required
+def vencimentos_fragmento(request, faixa):
+    # próximo lote de uma faixa de vencimento, em HTML, a partir do cursor ?apos=
+    if faixa not in vencimentos.FAIXAS:
+        raise Http404("Faixa de vencimento inexistente.")
+    pagina = vencimentos.pagina_da_faixa(faixa, apos=request.GET.get("apos"))
+    return render(request, "partials/_vencimentos_linhas.html", {"contratos": pagina, "pagina": pagina, "faixa": faixa})
 
 
 @login_required
@@ -448,6 +566,63 @@ def renovar_contrato(request, pk):
     return redirect("contratos_vencendo")
 
 
+@login_required
+def ocupacao_telas(request):
+    # segundos reservados por tela e por dia (?inicio=AAAA-MM-DD&dias=365&local=ID...)
+    try:
+        inicio = datetime.strptime(request.GET["inicio"], "%Y-%m-%d").date() if request.GET.get("inicio") else None
+        dias = int(request.GET.get("dias", ocupacao.DIAS_PADRAO))
+        local_ids = [int(pk) for pk in request.GET.getlist("local")] or None
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetros inválidos."}, status=400)
+    dias = min(max(dias, 1), ocupacao.DIAS_MAXIMO)
+    inicio = inicio or timezone.localdate()
+
+    series = ocupacao.ocupacao_diaria(inicio, dias, local_ids)
+    locais = Local.objects.order_by("nome").values_list("id", "nome")
+    if local_ids is not None:
+        locais = locais.filter(id__in=local_ids)
+    vazia = [0] * dias
+    return JsonResponse({
+        "inicio": inicio.isoformat(),
+        "dias": dias,
+        "locais": [
+            {"id": pk, "nome": nome, "segundos": series.get(pk, vazia), "pico": max(series.get(pk, vazia))}
+            for pk, nome in locais
+        ],
+    })
+
+
+@login_required
+def manifestos_telas(request):
+    # manifestos gravados de cada tela (a geração fica com os sinais e com gerar_manifestos)
+    itens = ManifestoLocal.objects.order_by("local__nome").values(
+        "local_id", "hash_conteudo", "videos", "segundos", "gerado_em", nome=F("local__nome")
+    )
+    return JsonResponse({
+        "manifestos": [
+            dict(
+                item,
+                gerado_em=timezone.localtime(item["gerado_em"]).isoformat(),
+                json=reverse("manifesto_tela", args=[item["local_id"], "json"]),
+                csv=reverse("manifesto_tela", args=[item["local_id"], "csv"]),
+            )
+            for item in itens
+        ],
+    })
+
+
+@login_required
+def manifesto_tela(request, pk, formato):
+    if formato not in ("json", "csv"):
+        raise Http404
+    manifesto = get_object_or_404(ManifestoLocal.objects.only(f"arquivo_{formato}"), local_id=pk)
+    arquivo = getattr(manifesto, f"arquivo_{formato}")
+    if not arquivo or not arquivo.storage.exists(arquivo.name):
+        raise Http404
+    return FileResponse(arquivo.open("rb"), as_attachment=True, filename=f"tela_{pk}.{formato}")
+
+
 @login_required
 def dashboard_view(request):
     vendedor_id = request.GET.get("vendedor")  # filtro opcional por vendedor
@@ -477,87 +652,113 @@ def dashboard_view(request):
 
 @login_required
 def exportar_contratos_excel(request):
-    qs = Contrato.objects.select_related(
-        "cliente", "vendedor", "forma_pagamento", "status", "banco"
-    ).prefetch_related("videos__local")
-
-    # ----- FILTROS -----
-    nome = request.GET.get("nome")
-    if nome:
-        qs = qs.filter(cliente__razao_social__icontains=nome)
-
-    cnpj = request.GET.get("cnpj")
-    if cnpj:
-        qs = qs.filter(cliente__cpf_cnpj__icontains=cnpj)
-
-    vendedor = request.GET.get("vendedor")
-    if vendedor:
-        qs = qs.filter(vendedor_id=vendedor)
-
-    local = request.GET.get("local")
-    if local:
-        qs = qs.filter(videos__local_id=local)
-
-    data_inicio = request.GET.get("data_inicio")
-    data_fim = request.GET.get("data_fim")
-    if data_inicio and data_fim:
-        qs = qs.filter(data_assinatura__range=[data_inicio, data_fim])
-    elif data_inicio:
-        qs = qs.filter(data_assinatura__gte=data_inicio)
-    elif data_fim:
-        qs = qs.filter(data_assinatura__lte=data_fim)
-
-    # ----- DADOS -----
-    data = []
-    for contrato in qs:
-        locais = ", ".join([v.local.nome for v in contrato.videos.all() if v.local])
-        status_videos = ", ".join(["ON" if v.status else "OFF" for v in contrato.videos.all()]) or "Sem vídeo"
-        tempos_videos = ", ".join([str(v.tempo_video) for v in contrato.videos.all()])
-        datas_subida = ", ".join([v.data_subiu.strftime("%d/%m/%Y") for v in contrato.videos.all() if v.data_subiu])
-
-        data.append({
-            "ID Contrato": contrato.id_contrato,
-            "Cliente": contrato.cliente.razao_social,
-            "CPF/CNPJ": contrato.cliente.cpf_cnpj,
-            "Email Cliente": contrato.cliente.email,
-            "Telefone Cliente": contrato.cliente.telefone,
-            "Telefone Financeiro": contrato.cliente.telefone_financeiro,
-            "Email Financeiro": contrato.cliente.email_financeiro,
-            "Vendedor": contrato.vendedor.nome if contrato.vendedor else "",
-            "Banco": contrato.banco.nome if contrato.banco else "",
-            "Cobrança Gerada": "Sim" if contrato.cobranca_gerada else "Não",
-            "Primeiro Pagamento": contrato.primeiro_pagamento.strftime("%d/%m/%Y") if contrato.primeiro_pagamento else "",
-            "Segundo Pagamento": contrato.segundo_pagamento.strftime("%d/%m/%Y") if contrato.segundo_pagamento else "",
-            "Data Assinatura": contrato.data_assinatura.strftime("%d/%m/%Y") if contrato.data_assinatura else "",
-            "Data Vencimento Contrato": contrato.data_vencimento_contrato.strftime("%d/%m/%Y") if contrato.data_vencimento_contrato else "",
-            "Data Cancelamento": contrato.data_cancelamento_contrato.strftime("%d/%m/%Y") if contrato.data_cancelamento_contrato else "",
-            "Data Vencimento 1ª Parcela": contrato.data_vencimento_primeira_parcela.strftime("%d/%m/%Y") if contrato.data_vencimento_primeira_parcela else "",
-            "Data Última Parcela": contrato.data_ultima_parcela.strftime("%d/%m/%Y") if contrato.data_ultima_parcela else "",
-            "Valor Mensalidade": contrato.valor_mensalidade,
-            "Vigência (meses)": contrato.vigencia_meses,
-            "Valor Total": contrato.valor_total,
-            "Forma de Pagamento": contrato.forma_pagamento.nome if contrato.forma_pagamento else "",
-            "Status Contrato": contrato.status.nome_status if contrato.status else "",
-            "Telões": locais or "Sem local",
-            "Status Vídeos": status_videos,
-            "Tempo Vídeos": tempos_videos,
-            "Datas Subida Vídeos": datas_subida,
-            "Observações": contrato.observacoes or "",
-        })
-
-    # Criar DataFrame
-    df = pd.DataFrame(data)
-
-    # Gerar Excel em memória
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    # A exportação vai para a fila e é gerada pelo worker (processar_exportacoes)
+    job = exportacao.enfileirar_exportacao(request.GET, request.GET.get("formato"), request.user)
+    return redirect("exportacao_detail", pk=job.pk)
+
+
+@login_required
+def exportar_contratos_direto(request):
+    qs = exportacao.contratos_para_exportacao(request.GET)
+    linhas = exportacao.linhas_contratos(qs)
+
+    if request.GET.get("formato") == "csv":
+        response = StreamingHttpResponse(exportacao.gerar_csv(linhas), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = 'attachment; filename="contratos.csv"'
+        return response
+
+    # O xlsx é um zip: é montado em arquivo temporário (write-only, memória
+    # constante) e enviado em blocos pelo FileResponse
+    arquivo = tempfile.TemporaryFile()
+    exportacao.escrever_xlsx(arquivo, linhas)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename="contratos.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
-    response["Content-Disposition"] = 'attachment; filename="contratos.xlsx"'
 
-    with pd.ExcelWriter(response, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Contratos")
 
-    return response
+def _exportacao_do_usuario(request, pk):
+    job = get_object_or_404(ExportacaoContratos, pk=pk)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise Http404
+    return job
+
+
+@login_required
+def exportacao_detail(request, pk):
+    job = _exportacao_do_usuario(request, pk)
+    return render(request, "exportacoes/exportacao_detail.html", {"job": job})
+
+
+@login_required
+def exportacao_status(request, pk):
+    job = _exportacao_do_usuario(request, pk)
+    return JsonResponse({
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "processados": job.processados,
+        "total": job.total,
+        "percentual": job.percentual,
+        "download_url": reverse("exportacao_download", args=[job.pk]) if job.status == job.CONCLUIDA and job.arquivo else None,
+    })
+
+
+@login_required
+def exportacao_download(request, pk):
+    job = _exportacao_do_usuario(request, pk)
+    if job.status != job.CONCLUIDA or not job.arquivo:
+        raise Http404
+    return FileResponse(job.arquivo.open("rb"), as_attachment=True, filename=f"contratos.{job.formato}")
+
+
+@login_required
+def contratos_importar(request):
+    # O arquivo é salvo e processado pelo worker (processar_importacoes)
+    form = ImportacaoContratosForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        job = importacao.enfileirar_importacao(form.cleaned_data["arquivo"], request.user)
+        return redirect("importacao_detail", pk=job.pk)
+    return render(request, "importacoes/importacao_form.html", {"form": form, "colunas": exportacao.COLUNAS})
+
+
+def _importacao_do_usuario(request, pk):
+    job = get_object_or_404(ImportacaoContratos, pk=pk)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise Http404
+    return job
+
+
+@login_required
+def importacao_detail(request, pk):
+    job = _importacao_do_usuario(request, pk)
+    return render(request, "importacoes/importacao_detail.html", {"job": job})
+
+
+@login_required
+def importacao_status(request, pk):
+    job = _importacao_do_usuario(request, pk)
+    return JsonResponse({
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "processados": job.processados,
+        "total": job.total,
+        "percentual": job.percentual,
+        "contratos_criados": job.contratos_criados,
+        "clientes_criados": job.clientes_criados,
+        "linhas_com_erro": job.linhas_com_erro,
+        "relatorio_url": reverse("importacao_relatorio", args=[job.pk]) if job.relatorio else None,
+    })
+
+
+@login_required
+def importacao_relatorio(request, pk):
+    job = _importacao_do_usuario(request, pk)
+    if not job.relatorio:
+        raise Http404
+    return FileResponse(job.relatorio.open("rb"), as_attachment=True, filename=f"importacao_{job.pk}_erros.csv")
 
 
 @login_required
@@ -572,5 +773,13 @@ def criar_contrato_registro(request, contrato_id):
             registro.updated_by = request.user
             registro.save()
             return redirect('contrato_detail', pk=contrato.pk)
-    else:
-        form = ContratoRegistroForm()
\ No newline at end of file
+        messages.error(request, "❌ Preencha o registro corretamente.")
+    return redirect('contrato_detail', pk=contrato.pk)
+
+
+@login_required
+def cliente_autocomplete(request):
+    # servido pelo índice em memória do worker: não consulta o banco a cada tecla
+    termo = request.GET.get("q", "")
+    clientes = autocomplete.buscar(termo, limite=10) if len(termo.strip()) >= 2 else []
+    return JsonResponse({"resultados": clientes})